@@ -1,14 +1,20 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
-from io import BytesIO
+from datetime import datetime
 import time
 import os
-import calendar
 
-# For local development, use OneDrive path
-# For online hosting, use local file
-EXCEL_FILE = 'scheduling_recent.xlsx'  # For online hosting
+import calendar_view
+import conflicts
+import event_model
+import event_store
+import exports
+import feeds
+import filters
+import perf
+import search
+import watcher
+from event_model import generate_titles, span_label
 
 st.set_page_config(page_title="EQS Event Scheduling", layout="wide")
 
@@ -189,6 +195,8 @@ if not check_authentication():
     login_page()
     st.stop()
 
+perf.start_rerun(st.session_state, st.session_state.user_email)
+
 # Add logout button in sidebar
 with st.sidebar:
     st.write(f"👤 Logged in as: **{st.session_state.user_email}**")
@@ -215,103 +223,137 @@ st.markdown("---")
 
 # ---------- Utility ----------
 def load_data():
-    """Load data WITHOUT caching so it always reflects the latest saved state"""
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            # Check if file exists, if not create it
-            if not os.path.exists(EXCEL_FILE):
-                df = pd.DataFrame(columns=[
-                    "Title", "Date", "Type", "Status", "Source",
-                    "Client", "Course/Description", "Trainer Calendar", "Medium", "Location",
-                    "Billing", "Invoiced", "Notes", "Date Modified", "Action Type", "Modified By"
-                ])
-                df.to_excel(EXCEL_FILE, index=False, engine='openpyxl')
-                return df
-            
-            df = pd.read_excel(EXCEL_FILE, engine='openpyxl')
-            
-            # Remove Start Time, End Time, All Day columns if they exist
-            columns_to_drop = ['Start Time', 'End Time', 'All Day']
-            df = df.drop(columns=[col for col in columns_to_drop if col in df.columns], errors='ignore')
-            
-            # Add Modified By column if it doesn't exist
-            if 'Modified By' not in df.columns:
-                df['Modified By'] = ''
-            
-            # Ensure Date column is datetime
-            if len(df) > 0 and 'Date' in df.columns:
-                df["Date"] = pd.to_datetime(df["Date"])
-            
-            # Reorder columns to put Title first
-            cols = df.columns.tolist()
-            if "Title" in cols:
-                cols.remove("Title")
-                cols = ["Title"] + cols
-                df = df[cols]
-            return df
-        except PermissionError:
-            if attempt < max_retries - 1:
-                time.sleep(1)
-                continue
-            else:
-                st.error("⚠️ Cannot access the file. Please close the Excel file if it's open and refresh the page.")
-                st.stop()
-        except Exception as e:
-            if attempt < max_retries - 1:
-                time.sleep(1)
-                continue
-            else:
-                st.error(f"⚠️ Error loading data: {str(e)}")
-                df = pd.DataFrame(columns=[
-                    "Title", "Date", "Type", "Status", "Source",
-                    "Client", "Course/Description", "Trainer Calendar", "Medium", "Location",
-                    "Billing", "Invoiced", "Notes", "Date Modified", "Action Type", "Modified By"
-                ])
-                return df
-    return pd.DataFrame()
+    """Load data through the shared cache; the store is re-read whenever it changes on disk"""
+    try:
+        return event_store.load_data()
+    except event_store.StoreBusyError as e:
+        st.error(f"⚠️ {e}")
+        st.stop()
+    except PermissionError:
+        st.error("⚠️ Cannot access the file. Please close the Excel file if it's open and refresh the page.")
+        st.stop()
+    except Exception as e:
+        st.error(f"⚠️ Error loading data: {str(e)}")
+        return event_store.empty_frame()
 
-def save_data(df):
-    """Save data with retry logic"""
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            cols = df.columns.tolist()
-            if "Title" in cols:
-                cols.remove("Title")
-                cols = ["Title"] + cols
-                df = df[cols]
-            
-            df.to_excel(EXCEL_FILE, index=False, engine='openpyxl')
-            return True
-        except PermissionError:
-            if attempt < max_retries - 1:
-                time.sleep(1)
-                continue
-            else:
-                st.error("⚠️ Cannot save to file. Please close the Excel file if it's open and try again.")
-                return False
+def save_changes(inserts=None, updates=None, deletes=None):
+    """Save row-level changes (see event_store.write_changes) on top of the version the user was shown.
+
+    updates and deletes name events by Event ID.
+
+    Changes that would double-book a trainer are refused unless an admin has
+    ticked "Allow double-booking".
+    """
+    clashes = conflicts.find_conflicts(df, data_version, inserts=inserts, updates=updates, deletes=deletes)
+    if len(clashes) > 0 and not st.session_state.get("allow_double_booking", False):
+        st.error(f"❌ This change would double-book {', '.join(clashes['Trainer'].unique())}. Nothing was saved.")
+        st.dataframe(clashes, hide_index=True, use_container_width=True)
+        return False
+    try:
+        with perf.span("save") as s:
+            s.rows = sum(len(rows) for rows in (inserts, updates, deletes) if rows is not None)
+            event_store.write_changes(inserts=inserts, updates=updates, deletes=deletes,
+                                      base_version=shown_version, user=st.session_state.user_email)
+        return True
+    except event_store.StaleDataError as e:
+        st.error(f"⚠️ {e} Your changes were not saved. Please review the latest data and try again.")
+    except event_store.StoreBusyError as e:
+        st.error(f"⚠️ {e}")
+    except PermissionError:
+        st.error("⚠️ Cannot save to file. Please close the Excel file if it's open and try again.")
     return False
 
-def generate_title(row):
-    base = f"{row['Status']}-{row['Source']}-{row['Client']} {row['Course/Description']}"
-    if row["Type"] == "W":
-        base += f" ({row['Medium']}) {row['Trainer Calendar']} {row['Location']}"
-    elif row["Type"] == "M":
-        base += f" {row['Trainer Calendar']} {row['Location']}"
-    else:
-        base += f" {row['Trainer Calendar']}"
-    return base.strip()
+def timed_export(events, fmt, **kwargs):
+    """exports.get_export(), recorded as an export span"""
+    with perf.span("export") as s:
+        data = exports.get_export(events, fmt, **kwargs)
+        s.rows, s.bytes = len(events), len(data)
+    return data
+
+def save_operations(*operations):
+    """Save batched operations (see event_model.plan_changes) as one write"""
+    inserts, updates, deletes = event_model.plan_changes(df, operations, st.session_state.user_email)
+    return save_changes(inserts=inserts, updates=updates, deletes=deletes)
+
+def event_selection_grid(labels):
+    """Show one page of the events with the given index labels in a grid with a Select column; return the selected labels.
+
+    Only the current page is sent to the browser. Selection is kept in session
+    state by Event ID, so it survives page changes, filter changes, reruns and
+    saves that renumber the rows; events deleted since drop out of it.
+    """
+    selected = st.session_state.setdefault("selected_events", set())
+    ids = event_store.id_index(df)
+    selected.intersection_update(df.loc[ids.labels(selected), event_model.ID_COLUMN])
+    st.session_state.setdefault("selection_generation", 0)
+
+    col1, col2, col3, col4 = st.columns(4)
+    page_size = col1.selectbox("Rows per page", PAGE_SIZES, key="events_page_size")
+    pages = max(1, -(-len(labels) // page_size))
+    if st.session_state.get("events_page", 1) > pages:
+        st.session_state["events_page"] = pages
+    page = col2.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key="events_page")
+    if col3.button("☑️ Select All Filtered", use_container_width=True):
+        selected.update(df.loc[labels, event_model.ID_COLUMN])
+        st.session_state.selection_generation += 1
+    if col4.button("✖️ Clear Selection", use_container_width=True):
+        selected.clear()
+        st.session_state.selection_generation += 1
+
+    page_rows = df.loc[labels[(page - 1) * page_size:page * page_size]]
+    page_ids = page_rows[event_model.ID_COLUMN]
+    grid = page_rows.copy()
+    grid.insert(0, "Select", page_ids.isin(selected).to_numpy())
+    # A new key whenever the page shows different events, so checkbox edits
+    # made on one set of events are never replayed onto another
+    edited = st.data_editor(
+        grid, key=f"events_grid_{st.session_state.selection_generation}_{hash(tuple(page_ids))}",
+        hide_index=True, use_container_width=True, disabled=list(page_rows.columns),
+        column_config={"Select": st.column_config.CheckboxColumn("Select"), event_model.ID_COLUMN: None}
+    )
+    for event_id, checked in zip(page_ids, edited["Select"]):
+        if checked:
+            selected.add(event_id)
+        else:
+            selected.discard(event_id)
+    return labels[labels.isin(ids.labels(selected))].tolist()
+
+def shown_event(form, event):
+    """The event as this session last rendered it in form (event itself the first time)
+
+    Edits are worked out against it rather than the current row, so a form
+    that was reset by someone else's save still counts as a change and is
+    refused by the version check instead of being lost.
+    """
+    shown = st.session_state.setdefault("shown_events", {})
+    before = shown.get(form)
+    shown[form] = event
+    if before is None or before[event_model.ID_COLUMN] != event[event_model.ID_COLUMN]:
+        return event
+    return before
+
+def option_choices(options, value):
+    """(options, index) for a selectbox preselecting value
+
+    A stored value outside options (say a trainer who has left) is listed as
+    an extra option, so saving the form keeps it instead of silently
+    replacing it with the first option.
+    """
+    if value not in options:
+        options = options + [value]
+    return options, options.index(value)
 
 # ---------- Constants ----------
-TRAINERS = ["Dom", "Andrew", "Dale", "Jack"]
-LOCATIONS = ["Syd", "Mel", "Bne", "SG", "Msia", "Global"]
+TRAINERS = event_model.TRAINERS
+LOCATIONS = event_model.LOCATIONS
 MONTHS = [
     "All months", "January", "February", "March", "April", "May", "June",
     "July", "August", "September", "October", "November", "December"
 ]
-STATUSES = ["All", "Offered", "Tentative", "Confirmed", "Blocked"]
-SOURCES = ["All", "EQS", "CCE", "CTD"]
+STATUSES = ["All"] + event_model.STATUSES
+SOURCES = ["All"] + event_model.SOURCES
+PAGE_SIZES = [25, 50, 100, 250]
+HISTORY_ROWS = 1000
 
 # Trainer colors
 TRAINER_COLORS = {
@@ -322,12 +364,124 @@ TRAINER_COLORS = {
 }
 
 # ---------- Load Data ----------
-df = load_data()
+# Calendar feeds follow the store from the watcher's thread, not from reruns
+feeds.keep_updated()
+# Changes seen from here on make the live-update check below refresh the page
+seen_generation = watcher.generation()
+with perf.span("load") as s:
+    df = load_data()
+    s.rows = len(df)
+data_version = df.attrs.get("version")
+# A click or form submit acts on what the previous rerun showed, so saves are
+# checked against the version that rerun loaded rather than this one's (see
+# save_changes); a change someone else made in between is then caught. Saves
+# name events by Event ID, which means the same event in both versions.
+shown_version = st.session_state.get("shown_version", data_version)
+st.session_state["shown_version"] = data_version
 
 # Get user role
 user_role = get_user_role(st.session_state.user_email)
 trainer_name = get_trainer_name(st.session_state.user_email)
 
+# ---------- Live Updates ----------
+# A tiny fragment re-runs every few seconds and reruns the whole page only
+# when someone has changed the schedule since this page loaded it. Off by
+# default for admins, whose forms and selections a refresh would interrupt.
+if watcher.AUTO_REFRESH_SECONDS > 0:
+    with st.sidebar:
+        live_updates = st.toggle("🔄 Live updates", value=user_role != "admin", key="live_updates",
+                                 help="Show changes made by others as soon as they are saved")
+
+    @st.fragment(run_every=watcher.AUTO_REFRESH_SECONDS if live_updates else None)
+    def refresh_on_change():
+        # Only the fragment's own reruns check: the page's run may be handling
+        # a click, which a rerun started here would drop
+        if st.session_state.pop("page_run", False):
+            return
+        if watcher.generation() != seen_generation:
+            st.rerun()
+
+    st.session_state["page_run"] = True
+    refresh_on_change()
+
+if user_role == "admin":
+    with st.sidebar:
+        for column, values in df.attrs.get("unknown_values", {}).items():
+            st.warning(f"⚠️ {column} has values outside the allowed list: {', '.join(values)}")
+        st.checkbox("Allow double-booking", key="allow_double_booking",
+                    help="Save events even when they overlap another Confirmed or Blocked event of the same trainer")
+        feeds_error = feeds.last_error()
+        if feeds_error:
+            st.warning(f"⚠️ Calendar feeds could not be written: {feeds_error}")
+        else:
+            st.caption(f"📆 Calendar feeds: {os.path.abspath(feeds.FEEDS_DIR)}")
+        for orphaned in event_store.orphaned_journals():
+            name = os.path.basename(orphaned)
+            st.warning(f"⚠️ The workbook was saved outside the app before these changes reached it: {name}")
+            reapply_col, discard_col = st.columns(2)
+            if reapply_col.button("♻️ Re-apply", key=f"reapply_{name}",
+                                  help="Apply the changes again to the events they were made to, by Event ID"):
+                try:
+                    applied, skipped = event_store.reapply_orphaned(orphaned, user=st.session_state.user_email)
+                    st.success(f"✅ Re-applied {applied} change(s), skipped {skipped} to events no longer there!")
+                    st.rerun()
+                except event_store.StoreBusyError as e:
+                    st.error(f"⚠️ {e}")
+            if discard_col.button("🗑️ Discard", key=f"discard_{name}"):
+                event_store.discard_orphaned(orphaned)
+                st.rerun()
+        stats = event_store.cache_stats()
+        st.caption(f"🗄️ Data cache: {stats['hits']} hits / {stats['misses']} misses")
+        if st.button("🗜️ Compact Change Journal"):
+            event_store.compact()
+            st.rerun()
+        if st.button("🧩 Merge Daily Rows Into Events"):
+            try:
+                before, after = event_store.coalesce_days()
+                st.success(f"✅ Merged {before} row(s) into {after} event(s)!")
+            except event_store.StoreBusyError as e:
+                st.error(f"⚠️ {e}")
+        archive_year = datetime.now().year - 1
+        if st.button(f"🗄️ Archive Events Before {archive_year}",
+                     help="Move older events out of the schedule into one workbook per year; "
+                          "they stay searchable and downloadable from Manage Events"):
+            try:
+                moved = event_store.archive_before(archive_year)
+                st.success(f"✅ Archived {moved} event(s)!")
+            except (event_store.StoreBusyError, event_store.StaleDataError) as e:
+                st.error(f"⚠️ {e}")
+        archived_years = event_store.archived_years()
+        if archived_years:
+            st.caption(f"🗄️ Archived years: {', '.join(map(str, archived_years))}")
+        if st.button("🔤 Regenerate All Titles"):
+            titles = generate_titles(df)
+            changed = titles[titles != df["Title"]]
+            changed_ids = df.loc[changed.index, event_model.ID_COLUMN]
+            if save_changes(updates={event_id: {"Title": title} for event_id, title in zip(changed_ids, changed)}):
+                st.success(f"✅ Regenerated {len(changed)} title(s)!")
+                st.rerun()
+        with st.expander("⏱️ Performance"):
+            if not perf.ENABLED:
+                st.caption("Timing is off (EQS_PERF=0).")
+            else:
+                count = st.number_input("Reruns shown", min_value=1, max_value=perf.RERUNS_KEPT, value=20,
+                                        key="perf_reruns_shown")
+                reruns = perf.recent_reruns(count)
+                if reruns:
+                    # One row per rerun, one column of milliseconds per phase
+                    table = pd.DataFrame([
+                        {"At": r["at"], "User": r["user"], "Total ms": r["ms"], "Complete": r["complete"],
+                         **{f"{name} ms": ms for name, ms in perf.phase_totals(r).items()}}
+                        for r in reruns
+                    ])
+                    st.dataframe(table, hide_index=True, use_container_width=True)
+                    st.caption("Latest rerun's phases")
+                    st.dataframe(pd.DataFrame(reruns[0]["spans"]), hide_index=True, use_container_width=True)
+                else:
+                    st.caption("No reruns recorded yet.")
+                if perf.PERF_LOG:
+                    st.caption(f"📝 Also logged to {os.path.abspath(perf.PERF_LOG)}")
+
 # ---------- Admin View ----------
 if user_role == "admin":
     tab1, tab2, tab3 = st.tabs(["➕ New Event", "🔍 Manage Events", "📅 Calendar View"])
@@ -342,65 +496,83 @@ if user_role == "admin":
                 st.info("💡 For single-day events, set End Date same as Start Date")
             
             with c2:
-                type_ = st.selectbox("Type", ["W", "C", "M"])
-                status = st.selectbox("Status", ["Offered", "Tentative", "Confirmed", "Blocked"])
-                source = st.selectbox("Source", ["EQS", "CCE", "CTD"])
+                type_ = st.selectbox("Type", event_model.TYPES)
+                status = st.selectbox("Status", event_model.STATUSES)
+                source = st.selectbox("Source", event_model.SOURCES)
             
             with c3:
                 client = st.text_input("Client")
                 course = st.text_input("Course / Description")
                 trainer = st.selectbox("Trainer Calendar", TRAINERS)
-                medium = st.selectbox("Medium", ["F2F", "Online"])
+                medium = st.selectbox("Medium", event_model.MEDIUMS)
 
             location = st.selectbox("Location", LOCATIONS)
             billing = st.text_area("Billing Notes")
-            invoiced = st.selectbox("Invoiced", ["No", "Yes"])
+            invoiced = st.selectbox("Invoiced", event_model.INVOICED)
             notes = st.text_area("Additional Notes")
 
             submitted = st.form_submit_button("Save Event", use_container_width=True)
             if submitted:
-                if end_date < start_date:
-                    st.error("❌ End Date cannot be before Start Date!")
+                new_event = pd.DataFrame([{
+                    "Date": pd.Timestamp(start_date),
+                    "End Date": pd.Timestamp(end_date),
+                    "Type": type_,
+                    "Status": status,
+                    "Source": source,
+                    "Client": client,
+                    "Course/Description": course,
+                    "Trainer Calendar": trainer,
+                    "Medium": medium,
+                    "Location": location,
+                    "Billing": billing,
+                    "Invoiced": invoiced,
+                    "Notes": notes,
+                }])
+                problems = event_model.validate_events(new_event)
+                if problems.iloc[0]:
+                    st.error(f"❌ {problems.iloc[0]}!")
                 else:
-                    events_to_add = []
-                    current_date = start_date
-                    
-                    while current_date <= end_date:
-                        new_row = {
-                            "Date": current_date,
-                            "Type": type_,
-                            "Status": status,
-                            "Source": source,
-                            "Client": client,
-                            "Course/Description": course,
-                            "Trainer Calendar": trainer,
-                            "Medium": medium,
-                            "Location": location,
-                            "Billing": billing,
-                            "Invoiced": invoiced,
-                            "Notes": notes,
-                            "Date Modified": datetime.now().strftime("%Y-%m-%d %H:%M"),
-                            "Action Type": "Created",
-                            "Modified By": st.session_state.user_email
-                        }
-                        new_row["Title"] = generate_title(new_row)
-                        events_to_add.append(new_row)
-                        current_date += timedelta(days=1)
-                    
-                    df = pd.concat([df, pd.DataFrame(events_to_add)], ignore_index=True)
-                    save_data(df)
-                    
-                    num_days = len(events_to_add)
-                    if num_days == 1:
-                        st.success("✅ Event added successfully! Form cleared for new entry.")
-                    else:
-                        st.success(f"✅ {num_days} events added successfully (one for each day)! Form cleared for new entry.")
-                    st.rerun()
+                    if save_operations(event_model.insert(new_event)):
+                        num_days = (end_date - start_date).days + 1
+                        if num_days == 1:
+                            st.success("✅ Event added successfully! Form cleared for new entry.")
+                        else:
+                            st.success(f"✅ {num_days}-day event added successfully! Form cleared for new entry.")
+                        st.rerun()
     
     with tab2:
         st.header("Manage Events")
 
+        double_bookings = conflicts.conflict_report(df, data_version)
+        if len(double_bookings) > 0:
+            with st.expander(f"⚠️ {len(double_bookings)} double booking(s)"):
+                st.dataframe(double_bookings, hide_index=True, use_container_width=True)
+
+        # The audit log is only read while this is switched on
+        if st.toggle("🕘 Change history", key="show_history"):
+            today = pd.Timestamp.today().normalize()
+            h1, h2, h3 = st.columns(3)
+            changed_from = h1.date_input("Changed from", value=(today - pd.Timedelta(days=7)).date(), key="history_from")
+            changed_to = h2.date_input("Changed to", value=today.date(), key="history_to")
+            log = event_store.audit_log()
+            changes = log.changes(changed_from, pd.Timestamp(changed_to) + pd.Timedelta(days=1, seconds=-1),
+                                  limit=HISTORY_ROWS)
+            st.dataframe(changes.drop(columns=[event_model.ID_COLUMN]), hide_index=True, use_container_width=True)
+            if len(changes) == HISTORY_ROWS:
+                st.caption(f"Showing the latest {HISTORY_ROWS} changes; narrow the dates to see earlier ones.")
+            as_of = h3.date_input("Schedule as of (end of day)", value=today.date(), key="history_as_of")
+            h3.download_button("⬇️ Download Schedule As Of",
+                               data=lambda: timed_export(
+                                   event_store.schedule_as_of(pd.Timestamp(as_of) + pd.Timedelta(days=1, seconds=-1)),
+                                   "xlsx", columns=event_store.DAILY_COLUMNS),
+                               file_name=f"Schedule_As_Of_{as_of}.xlsx", mime=exports.FORMATS["xlsx"][1])
+            started = log.started()
+            if started:
+                h3.caption(f"History is recorded from {started}.")
+
         st.subheader("🔍 Filter Events")
+        search_query = st.text_input("Search", key="search_text",
+                                     placeholder="Words from the title, client, course, notes or billing...")
         col1, col2, col3, col4, col5 = st.columns(5)
         
         with col1:
@@ -413,52 +585,86 @@ if user_role == "admin":
         status_filter = col3.selectbox("Status", STATUSES, key="search_status")
         source_filter = col4.selectbox("Source", SOURCES, key="search_source")
         client_search = col5.text_input("Client", key="search_client", placeholder="Search client...")
+        # Archived years are only read when asked for
+        include_archive = bool(event_store.archived_years()) and st.checkbox(
+            "Include archived years", key="include_archive",
+            help="Also list matching events from archived years (read-only)")
 
-        result = df.copy()
-
+        date_window = (None, None)
         if use_date_range:
             if date_to < date_from:
                 st.warning("⚠️ 'To Date' cannot be before 'From Date'")
             else:
-                result = result[
-                    (pd.to_datetime(result["Date"]).dt.date >= date_from) & 
-                    (pd.to_datetime(result["Date"]).dt.date <= date_to)
-                ]
-        
-        if trainer_filter != "All":
-            result = result[result["Trainer Calendar"] == trainer_filter]
-        if status_filter != "All":
-            result = result[result["Status"] == status_filter]
-        if source_filter != "All":
-            result = result[result["Source"] == source_filter]
-        if client_search:
-            result = result[result["Client"].str.contains(client_search, case=False, na=False)]
+                date_window = (date_from, date_to)
+
+        # Index labels of the matching events; rows are only taken from df
+        # for the page on screen and for downloads
+        with perf.span("filter") as s:
+            result = filters.filter_events(
+                df, data_version, date_window[0], date_window[1],
+                trainer=None if trainer_filter == "All" else trainer_filter,
+                status=None if status_filter == "All" else status_filter,
+                source=None if source_filter == "All" else source_filter,
+                client=client_search or None
+            )
+            if search_query:
+                # Best matches first
+                ranked = search.search_events(df, data_version, search_query)
+                result = ranked[ranked.isin(result)]
+            s.rows = len(result)
 
         st.write(f"**Showing {len(result)} events**")
+
+        if include_archive:
+            with perf.span("archive") as s:
+                archived = event_store.load_archive(date_window[0], date_window[1])
+                archived_result = filters.filter_events(
+                    archived, None, date_window[0], date_window[1],
+                    trainer=None if trainer_filter == "All" else trainer_filter,
+                    status=None if status_filter == "All" else status_filter,
+                    source=None if source_filter == "All" else source_filter,
+                    client=client_search or None
+                )
+                if search_query:
+                    ranked = search.search_archive(archived, search_query)
+                    archived_result = ranked[ranked.isin(archived_result)]
+                s.rows = len(archived_result)
+            with st.expander(f"🗄️ {len(archived_result)} archived event(s)"):
+                st.dataframe(archived.loc[archived_result, event_model.COLUMNS], hide_index=True,
+                             use_container_width=True)
+                if len(archived_result) > 0:
+                    archive_format = st.selectbox("Download format", list(exports.FORMATS),
+                                                  format_func=lambda fmt: exports.FORMATS[fmt][0],
+                                                  key="archive_export_format")
+                    st.download_button("⬇️ Download Archived Events",
+                                       data=lambda: timed_export(archived.loc[archived_result], archive_format,
+                                                                 start=date_window[0], end=date_window[1],
+                                                                 columns=event_store.DAILY_COLUMNS),
+                                       file_name=f"Archived_Events.{archive_format}",
+                                       mime=exports.FORMATS[archive_format][1])
         
         if len(result) == 0:
             st.info("No events found with current filters.")
         else:
             st.write("### Select Events for Bulk Operations")
             
-            selected_events = []
-            for idx in result.index:
-                col1, col2 = st.columns([0.1, 0.9])
-                with col1:
-                    if st.checkbox("", key=f"check_{idx}"):
-                        selected_events.append(idx)
-                with col2:
-                    st.write(f"**{result.loc[idx, 'Title']}** - {result.loc[idx, 'Date'].strftime('%Y-%m-%d')}")
-            
-            st.divider()
+            with perf.span("render") as s:
+                selected_events = event_selection_grid(result)
+                selected_ids = df.loc[selected_events, event_model.ID_COLUMN].tolist()
+                s.rows = len(result)
             
-            st.dataframe(result, use_container_width=True)
-            
-            towrite = BytesIO()
-            result.to_excel(towrite, index=False, engine="openpyxl")
-            towrite.seek(0)
-            st.download_button("⬇️ Download Filtered Data", data=towrite,
-                               file_name="Filtered_Events.xlsx", mime="application/vnd.ms-excel")
+            # The file (one row per day, limited to the filtered date range) is
+            # only generated when the button is clicked
+            export_key = (data_version, date_window, trainer_filter, status_filter, source_filter, client_search,
+                          search_query)
+            export_format = st.selectbox("Download format", list(exports.FORMATS),
+                                         format_func=lambda fmt: exports.FORMATS[fmt][0], key="export_format")
+            st.download_button("⬇️ Download Filtered Data",
+                               data=lambda: timed_export(df.loc[result], export_format, key=export_key,
+                                                         start=date_window[0], end=date_window[1],
+                                                         columns=event_store.DAILY_COLUMNS),
+                               file_name=f"Filtered_Events.{export_format}",
+                               mime=exports.FORMATS[export_format][1])
             
             st.divider()
             
@@ -466,11 +672,21 @@ if user_role == "admin":
                 st.write(f"### 🎯 {len(selected_events)} Event(s) Selected")
                 
                 if len(selected_events) == 1:
-                    op_tab1, op_tab2, op_tab3 = st.tabs(["✏️ Edit Event", "📋 Duplicate", "🗑️ Delete"])
+                    op_tab1, op_tab2, op_tab3, op_tab4 = st.tabs(["✏️ Edit Event", "📋 Duplicate", "🗑️ Delete",
+                                                                  "🕘 History"])
+
+                    with op_tab4:
+                        history = event_store.audit_log().history(selected_ids[0])
+                        if len(history) > 0:
+                            st.dataframe(history.drop(columns=[event_model.ID_COLUMN]), hide_index=True,
+                                         use_container_width=True)
+                        else:
+                            st.info("No changes recorded for this event yet.")
                     
                     with op_tab1:
                         selected_idx = selected_events[0]
-                        selected_event = df.loc[selected_idx]
+                        selected_event = df.loc[selected_idx].fillna("")
+                        shown = shown_event("single_edit_form", selected_event)
                         
                         st.write(f"**Editing:** {selected_event['Title']}")
                         st.divider()
@@ -481,67 +697,49 @@ if user_role == "admin":
                             c1, c2, c3 = st.columns(3)
                             with c1:
                                 edit_start_date = st.date_input("Start Date", value=pd.to_datetime(selected_event["Date"]).date())
-                                edit_end_date = st.date_input("End Date", value=pd.to_datetime(selected_event["Date"]).date())
-                                st.info("💡 Changing dates will create separate events for each day")
+                                edit_end_date = st.date_input("End Date", value=pd.to_datetime(selected_event["End Date"]).date())
+                                st.info("💡 For single-day events, set End Date same as Start Date")
                             
                             with c2:
-                                edit_type = st.selectbox("Type", ["W", "C", "M"], 
-                                                        index=["W", "C", "M"].index(selected_event["Type"]))
-                                edit_status = st.selectbox("Status", ["Offered", "Tentative", "Confirmed", "Blocked"],
-                                                          index=["Offered", "Tentative", "Confirmed", "Blocked"].index(selected_event["Status"]))
-                                edit_source = st.selectbox("Source", ["EQS", "CCE", "CTD"],
-                                                          index=["EQS", "CCE", "CTD"].index(selected_event["Source"]))
+                                edit_type = st.selectbox("Type", *option_choices(event_model.TYPES, selected_event["Type"]))
+                                edit_status = st.selectbox("Status", *option_choices(event_model.STATUSES, selected_event["Status"]))
+                                edit_source = st.selectbox("Source", *option_choices(event_model.SOURCES, selected_event["Source"]))
                             
                             with c3:
                                 edit_client = st.text_input("Client", value=selected_event["Client"])
                                 edit_course = st.text_input("Course / Description", value=selected_event["Course/Description"])
-                                edit_trainer = st.selectbox("Trainer Calendar", TRAINERS,
-                                                           index=TRAINERS.index(selected_event["Trainer Calendar"]))
-                                edit_medium = st.selectbox("Medium", ["F2F", "Online"],
-                                                          index=0 if selected_event["Medium"] == "F2F" else 1)
+                                edit_trainer = st.selectbox("Trainer Calendar", *option_choices(TRAINERS, selected_event["Trainer Calendar"]))
+                                edit_medium = st.selectbox("Medium", *option_choices(event_model.MEDIUMS, selected_event["Medium"]))
 
-                            edit_location = st.selectbox("Location", LOCATIONS,
-                                                        index=LOCATIONS.index(selected_event["Location"]))
+                            edit_location = st.selectbox("Location", *option_choices(LOCATIONS, selected_event["Location"]))
                             edit_billing = st.text_area("Billing Notes", value=selected_event["Billing"])
-                            edit_invoiced = st.selectbox("Invoiced", ["No", "Yes"],
-                                                        index=0 if selected_event["Invoiced"] == "No" else 1)
+                            edit_invoiced = st.selectbox("Invoiced", *option_choices(event_model.INVOICED, selected_event["Invoiced"]))
                             edit_notes = st.text_area("Additional Notes", value=selected_event["Notes"])
                             
                             if st.form_submit_button("💾 Save Changes", use_container_width=True):
                                 if edit_end_date < edit_start_date:
                                     st.error("❌ End Date cannot be before Start Date!")
                                 else:
-                                    df = df.drop(selected_idx).reset_index(drop=True)
-                                    
-                                    events_to_add = []
-                                    current_date = edit_start_date
-                                    
-                                    while current_date <= edit_end_date:
-                                        updated_row = {
-                                            "Date": current_date,
-                                            "Type": edit_type,
-                                            "Status": edit_status,
-                                            "Source": edit_source,
-                                            "Client": edit_client,
-                                            "Course/Description": edit_course,
-                                            "Trainer Calendar": edit_trainer,
-                                            "Medium": edit_medium,
-                                            "Location": edit_location,
-                                            "Billing": edit_billing,
-                                            "Invoiced": edit_invoiced,
-                                            "Notes": edit_notes,
-                                            "Date Modified": datetime.now().strftime("%Y-%m-%d %H:%M"),
-                                            "Action Type": "Modified",
-                                            "Modified By": st.session_state.user_email
-                                        }
-                                        updated_row["Title"] = generate_title(updated_row)
-                                        events_to_add.append(updated_row)
-                                        current_date += timedelta(days=1)
-                                    
-                                    df = pd.concat([df, pd.DataFrame(events_to_add)], ignore_index=True)
-                                    save_data(df)
-                                    st.success("✅ Event updated successfully!")
-                                    st.rerun()
+                                    changes = event_model.changed_fields(shown, {
+                                        "Date": pd.Timestamp(edit_start_date),
+                                        "End Date": pd.Timestamp(edit_end_date),
+                                        "Type": edit_type,
+                                        "Status": edit_status,
+                                        "Source": edit_source,
+                                        "Client": edit_client,
+                                        "Course/Description": edit_course,
+                                        "Trainer Calendar": edit_trainer,
+                                        "Medium": edit_medium,
+                                        "Location": edit_location,
+                                        "Billing": edit_billing,
+                                        "Invoiced": edit_invoiced,
+                                        "Notes": edit_notes,
+                                    })
+                                    if not changes:
+                                        st.info("Nothing was changed.")
+                                    elif save_operations(event_model.set_fields(selected_ids[:1], changes, action="Modified")):
+                                        st.success("✅ Event updated successfully!")
+                                        st.rerun()
                 
                 else:
                     op_tab1, op_tab2, op_tab3 = st.tabs(["✏️ Bulk Edit", "📋 Duplicate", "🗑️ Delete"])
@@ -551,7 +749,7 @@ if user_role == "admin":
                         
                         st.write("**Events to be updated:**")
                         for idx in selected_events:
-                            st.write(f"- {df.loc[idx, 'Title']} ({df.loc[idx, 'Date'].strftime('%Y-%m-%d')})")
+                            st.write(f"- {df.loc[idx, 'Title']} ({span_label(df.loc[idx, 'Date'], df.loc[idx, 'End Date'], '%Y-%m-%d')})")
                         
                         st.divider()
                         
@@ -567,37 +765,29 @@ if user_role == "admin":
                             col1, col2 = st.columns(2)
                             with col1:
                                 if "Status" in update_options:
-                                    bulk_updates["Status"] = st.selectbox("New Status", ["Offered", "Tentative", "Confirmed", "Blocked"], key="bulk_status_new")
+                                    bulk_updates["Status"] = st.selectbox("New Status", event_model.STATUSES, key="bulk_status_new")
                                 if "Trainer Calendar" in update_options:
                                     bulk_updates["Trainer Calendar"] = st.selectbox("New Trainer", TRAINERS, key="bulk_trainer_new")
                                 if "Location" in update_options:
                                     bulk_updates["Location"] = st.selectbox("New Location", LOCATIONS, key="bulk_location_new")
                                 if "Type" in update_options:
-                                    bulk_updates["Type"] = st.selectbox("New Type", ["W", "C", "M"], key="bulk_type_new")
+                                    bulk_updates["Type"] = st.selectbox("New Type", event_model.TYPES, key="bulk_type_new")
                             
                             with col2:
                                 if "Medium" in update_options:
-                                    bulk_updates["Medium"] = st.selectbox("New Medium", ["F2F", "Online"], key="bulk_medium_new")
+                                    bulk_updates["Medium"] = st.selectbox("New Medium", event_model.MEDIUMS, key="bulk_medium_new")
                                 if "Invoiced" in update_options:
-                                    bulk_updates["Invoiced"] = st.selectbox("New Invoiced", ["No", "Yes"], key="bulk_invoiced_new")
+                                    bulk_updates["Invoiced"] = st.selectbox("New Invoiced", event_model.INVOICED, key="bulk_invoiced_new")
                                 if "Source" in update_options:
-                                    bulk_updates["Source"] = st.selectbox("New Source", ["EQS", "CCE", "CTD"], key="bulk_source_new")
+                                    bulk_updates["Source"] = st.selectbox("New Source", event_model.SOURCES, key="bulk_source_new")
                             
                             if st.form_submit_button(f"💾 Update {len(selected_events)} Event(s)", use_container_width=True):
                                 if len(update_options) == 0:
                                     st.warning("Please select at least one field to update!")
                                 else:
-                                    for idx in selected_events:
-                                        for field, value in bulk_updates.items():
-                                            df.at[idx, field] = value
-                                        df.at[idx, "Date Modified"] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                                        df.at[idx, "Action Type"] = "Bulk Modified"
-                                        df.at[idx, "Modified By"] = st.session_state.user_email
-                                        df.at[idx, "Title"] = generate_title(df.loc[idx])
-                                    
-                                    save_data(df)
-                                    st.success(f"✅ Updated {len(selected_events)} event(s)!")
-                                    st.rerun()
+                                    if save_operations(event_model.set_fields(selected_ids, bulk_updates)):
+                                        st.success(f"✅ Updated {len(selected_events)} event(s)!")
+                                        st.rerun()
                 
                 with op_tab2:
                     st.write(f"**Duplicate {len(selected_events)} selected event(s)**")
@@ -613,20 +803,10 @@ if user_role == "admin":
                             dup_date = st.date_input("Duplicate to this date")
                             
                             if st.form_submit_button(f"🔄 Duplicate {len(selected_events)} Event(s)", use_container_width=True):
-                                new_events = []
-                                for idx in selected_events:
-                                    original = df.loc[idx].copy()
-                                    original["Date"] = pd.Timestamp(dup_date)
-                                    original["Date Modified"] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                                    original["Action Type"] = "Duplicated"
-                                    original["Modified By"] = st.session_state.user_email
-                                    original["Title"] = generate_title(original)
-                                    new_events.append(original)
-                                
-                                df_new = pd.concat([df, pd.DataFrame(new_events)], ignore_index=True)
-                                save_data(df_new)
-                                st.success(f"✅ Created {len(new_events)} duplicate(s)!")
-                                st.rerun()
+                                # Multi-day events keep their length, starting on the new date
+                                if save_operations(event_model.duplicate(selected_ids, dates=[dup_date])):
+                                    st.success(f"✅ Created {len(selected_events)} duplicate(s)!")
+                                    st.rerun()
                         
                         else:
                             col1, col2 = st.columns(2)
@@ -635,31 +815,15 @@ if user_role == "admin":
                             with col2:
                                 range_end = st.date_input("End Date")
                             
-                            st.info(f"This will create duplicates for each day from {range_start} to {range_end}")
+                            st.info(f"This will create a copy of each event running from {range_start} to {range_end}")
                             
                             if st.form_submit_button(f"🔄 Duplicate Across Date Range", use_container_width=True):
                                 if range_end < range_start:
                                     st.error("End date must be after start date!")
                                 else:
-                                    new_events = []
-                                    for idx in selected_events:
-                                        original = df.loc[idx].copy()
-                                        
-                                        current_date = range_start
-                                        while current_date <= range_end:
-                                            new_event = original.copy()
-                                            new_event["Date"] = pd.Timestamp(current_date)
-                                            new_event["Date Modified"] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                                            new_event["Action Type"] = "Duplicated"
-                                            new_event["Modified By"] = st.session_state.user_email
-                                            new_event["Title"] = generate_title(new_event)
-                                            new_events.append(new_event)
-                                            current_date += timedelta(days=1)
-                                    
-                                    df_new = pd.concat([df, pd.DataFrame(new_events)], ignore_index=True)
-                                    save_data(df_new)
-                                    st.success(f"✅ Created {len(new_events)} duplicate(s)!")
-                                    st.rerun()
+                                    if save_operations(event_model.duplicate(selected_ids, start=range_start, end=range_end)):
+                                        st.success(f"✅ Created {len(selected_events)} duplicate(s)!")
+                                        st.rerun()
                 
                 with op_tab3:
                     st.warning(f"⚠️ You are about to delete {len(selected_events)} event(s)")
@@ -668,24 +832,16 @@ if user_role == "admin":
                         st.write(f"- {df.loc[idx, 'Title']}")
                     
                     if st.button(f"🗑️ Delete {len(selected_events)} Event(s)", type="primary", use_container_width=True):
-                        for idx in selected_events:
-                            df.at[idx, "Action Type"] = "Deleted"
-                            df.at[idx, "Modified By"] = st.session_state.user_email
-                            df.at[idx, "Date Modified"] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                        
-                        df = df.drop(selected_events).reset_index(drop=True)
-                        save_data(df)
-                        st.success(f"✅ Deleted {len(selected_events)} event(s)!")
-                        st.rerun()
+                        if save_operations(event_model.delete(selected_ids)):
+                            st.success(f"✅ Deleted {len(selected_events)} event(s)!")
+                            st.rerun()
             
             else:
-                st.info("👆 Select events using the checkboxes above to perform bulk operations")
+                st.info("👆 Select events in the grid above to perform bulk operations")
     
     with tab3:
         st.header("📅 Calendar View")
         
-        df_filtered = df.copy()
-        
         col1, col2 = st.columns([1, 3])
         with col1:
             current_year = datetime.now().year
@@ -703,53 +859,15 @@ if user_role == "admin":
         
         st.divider()
         
-        month_events = df_filtered[
-            (pd.to_datetime(df_filtered["Date"]).dt.month == selected_month) & 
-            (pd.to_datetime(df_filtered["Date"]).dt.year == selected_year)
-        ].copy()
+        with perf.span("calendar") as s:
+            month_index = calendar_view.get_month_index(df, data_version, selected_year, selected_month)
+            month_events = df.iloc[month_index.positions()]
+            s.rows = len(month_events)
         
-        cal = calendar.monthcalendar(selected_year, selected_month)
-        
-        days_of_week = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-        header_cols = st.columns(7)
-        for idx, day in enumerate(days_of_week):
-            with header_cols[idx]:
-                st.markdown(f"<div style='text-align: center; font-weight: bold; padding: 5px;'>{day}</div>", unsafe_allow_html=True)
-        
-        for week in cal:
-            week_cols = st.columns(7)
-            for idx, day in enumerate(week):
-                with week_cols[idx]:
-                    if day == 0:
-                        st.markdown("<div style='height: 100px; border: 1px solid #ddd; border-radius: 5px;'></div>", unsafe_allow_html=True)
-                    else:
-                        day_date = datetime(selected_year, selected_month, day)
-                        day_events = month_events[pd.to_datetime(month_events["Date"]).dt.date == day_date.date()]
-                        
-                        if len(day_events) > 0:
-                            trainer_counts = day_events["Trainer Calendar"].value_counts()
-                            color_bars = ""
-                            for trainer in TRAINERS:
-                                if trainer in trainer_counts:
-                                    color_bars += f"<div style='background-color: {TRAINER_COLORS[trainer]}; height: 8px; margin: 2px 0;'></div>"
-                            
-                            cell_html = f"""
-                            <div style='border: 2px solid #333; border-radius: 5px; padding: 5px; height: 100px; background-color: #f9f9f9;'>
-                                <div style='text-align: center; font-weight: bold; font-size: 18px; color: #000;'>{day}</div>
-                                {color_bars}
-                                <div style='text-align: center; font-size: 12px; margin-top: 5px; color: #000;'>{len(day_events)} event(s)</div>
-                            </div>
-                            """
-                            st.markdown(cell_html, unsafe_allow_html=True)
-                            
-                            if st.button(f"View Details", key=f"day_{day}", use_container_width=True):
-                                st.session_state[f"selected_day"] = day_date
-                        else:
-                            st.markdown(f"""
-                            <div style='border: 1px solid #ddd; border-radius: 5px; padding: 5px; height: 100px; background-color: #fff;'>
-                                <div style='text-align: center; font-weight: bold; font-size: 18px; color: #999;'>{day}</div>
-                            </div>
-                            """, unsafe_allow_html=True)
+        with perf.span("render") as s:
+            grid_html = calendar_view.render_month(df, data_version, selected_year, selected_month, TRAINER_COLORS)
+            st.markdown(grid_html, unsafe_allow_html=True)
+            s.rows, s.bytes = len(month_events), len(grid_html)
         
         st.divider()
         
@@ -762,7 +880,7 @@ if user_role == "admin":
             for idx, (event_idx, event) in enumerate(month_events_sorted.iterrows()):
                 trainer_color = TRAINER_COLORS.get(event["Trainer Calendar"], "#CCCCCC")
                 
-                with st.expander(f"📅 {event['Date'].strftime('%b %d')} - **{event['Title']}**"):
+                with st.expander(f"📅 {span_label(event['Date'], event['End Date'], '%b %d')} - **{event['Title']}**"):
                     st.markdown(f"<div style='background-color: {trainer_color}; padding: 10px; border-radius: 5px; margin-bottom: 10px;'>", unsafe_allow_html=True)
                     
                     col1, col2, col3 = st.columns(3)
@@ -791,18 +909,19 @@ if user_role == "admin":
                     st.write(f"**Last Modified:** {event['Date Modified']} | **Action:** {event['Action Type']} | **By:** {modified_by}")
                     st.markdown("</div>", unsafe_allow_html=True)
                     
-                    if st.button(f"✏️ Edit This Event", key=f"edit_cal_{event_idx}"):
-                        st.session_state[f"edit_event_idx"] = event_idx
+                    if st.button(f"✏️ Edit This Event", key=f"edit_cal_{event[event_model.ID_COLUMN]}"):
+                        st.session_state["edit_event_id"] = event[event_model.ID_COLUMN]
                         st.rerun()
             
-            if "edit_event_idx" in st.session_state:
+            if "edit_event_id" in st.session_state:
                 st.divider()
                 st.subheader("✏️ Edit Event")
                 
-                edit_idx = st.session_state["edit_event_idx"]
+                edit_idx = event_store.id_index(df).label(st.session_state["edit_event_id"])
                 
-                if edit_idx in df.index:
-                    selected_event = df.loc[edit_idx]
+                if edit_idx is not None:
+                    selected_event = df.loc[edit_idx].fillna("")
+                    shown = shown_event("calendar_edit_form", selected_event)
                     
                     with st.form("calendar_edit_form"):
                         st.write(f"**Editing:** {selected_event['Title']}")
@@ -810,81 +929,63 @@ if user_role == "admin":
                         c1, c2, c3 = st.columns(3)
                         with c1:
                             edit_start_date = st.date_input("Start Date", value=pd.to_datetime(selected_event["Date"]).date())
-                            edit_end_date = st.date_input("End Date", value=pd.to_datetime(selected_event["Date"]).date())
-                            st.info("💡 Changing dates will create separate events for each day")
+                            edit_end_date = st.date_input("End Date", value=pd.to_datetime(selected_event["End Date"]).date())
+                            st.info("💡 For single-day events, set End Date same as Start Date")
                         
                         with c2:
-                            edit_type = st.selectbox("Type", ["W", "C", "M"], 
-                                                    index=["W", "C", "M"].index(selected_event["Type"]))
-                            edit_status = st.selectbox("Status", ["Offered", "Tentative", "Confirmed", "Blocked"],
-                                                      index=["Offered", "Tentative", "Confirmed", "Blocked"].index(selected_event["Status"]))
-                            edit_source = st.selectbox("Source", ["EQS", "CCE", "CTD"],
-                                                      index=["EQS", "CCE", "CTD"].index(selected_event["Source"]))
+                            edit_type = st.selectbox("Type", *option_choices(event_model.TYPES, selected_event["Type"]))
+                            edit_status = st.selectbox("Status", *option_choices(event_model.STATUSES, selected_event["Status"]))
+                            edit_source = st.selectbox("Source", *option_choices(event_model.SOURCES, selected_event["Source"]))
                         
                         with c3:
                             edit_client = st.text_input("Client", value=selected_event["Client"])
                             edit_course = st.text_input("Course / Description", value=selected_event["Course/Description"])
-                            edit_trainer = st.selectbox("Trainer Calendar", TRAINERS,
-                                                       index=TRAINERS.index(selected_event["Trainer Calendar"]))
-                            edit_medium = st.selectbox("Medium", ["F2F", "Online"],
-                                                      index=0 if selected_event["Medium"] == "F2F" else 1)
+                            edit_trainer = st.selectbox("Trainer Calendar", *option_choices(TRAINERS, selected_event["Trainer Calendar"]))
+                            edit_medium = st.selectbox("Medium", *option_choices(event_model.MEDIUMS, selected_event["Medium"]))
 
-                        edit_location = st.selectbox("Location", LOCATIONS,
-                                                    index=LOCATIONS.index(selected_event["Location"]))
+                        edit_location = st.selectbox("Location", *option_choices(LOCATIONS, selected_event["Location"]))
                         edit_billing = st.text_area("Billing Notes", value=selected_event["Billing"])
-                        edit_invoiced = st.selectbox("Invoiced", ["No", "Yes"],
-                                                    index=0 if selected_event["Invoiced"] == "No" else 1)
+                        edit_invoiced = st.selectbox("Invoiced", *option_choices(event_model.INVOICED, selected_event["Invoiced"]))
                         edit_notes = st.text_area("Additional Notes", value=selected_event["Notes"])
                         
                         col_a, col_b = st.columns(2)
                         with col_a:
-                            save_changes = st.form_submit_button("💾 Save Changes", use_container_width=True)
+                            submit_edit = st.form_submit_button("💾 Save Changes", use_container_width=True)
                         with col_b:
                             cancel_edit = st.form_submit_button("❌ Cancel", use_container_width=True)
                         
-                        if save_changes:
+                        if submit_edit:
                             if edit_end_date < edit_start_date:
                                 st.error("❌ End Date cannot be before Start Date!")
                             else:
-                                df = df.drop(edit_idx).reset_index(drop=True)
-                                
-                                events_to_add = []
-                                current_date = edit_start_date
-                                
-                                while current_date <= edit_end_date:
-                                    updated_row = {
-                                        "Date": current_date,
-                                        "Type": edit_type,
-                                        "Status": edit_status,
-                                        "Source": edit_source,
-                                        "Client": edit_client,
-                                        "Course/Description": edit_course,
-                                        "Trainer Calendar": edit_trainer,
-                                        "Medium": edit_medium,
-                                        "Location": edit_location,
-                                        "Billing": edit_billing,
-                                        "Invoiced": edit_invoiced,
-                                        "Notes": edit_notes,
-                                        "Date Modified": datetime.now().strftime("%Y-%m-%d %H:%M"),
-                                        "Action Type": "Modified",
-                                        "Modified By": st.session_state.user_email
-                                    }
-                                    updated_row["Title"] = generate_title(updated_row)
-                                    events_to_add.append(updated_row)
-                                    current_date += timedelta(days=1)
-                                
-                                df = pd.concat([df, pd.DataFrame(events_to_add)], ignore_index=True)
-                                save_data(df)
-                                del st.session_state["edit_event_idx"]
-                                st.success("✅ Event updated successfully!")
-                                st.rerun()
+                                changes = event_model.changed_fields(shown, {
+                                    "Date": pd.Timestamp(edit_start_date),
+                                    "End Date": pd.Timestamp(edit_end_date),
+                                    "Type": edit_type,
+                                    "Status": edit_status,
+                                    "Source": edit_source,
+                                    "Client": edit_client,
+                                    "Course/Description": edit_course,
+                                    "Trainer Calendar": edit_trainer,
+                                    "Medium": edit_medium,
+                                    "Location": edit_location,
+                                    "Billing": edit_billing,
+                                    "Invoiced": edit_invoiced,
+                                    "Notes": edit_notes,
+                                })
+                                if not changes:
+                                    st.info("Nothing was changed.")
+                                elif save_operations(event_model.set_fields([st.session_state["edit_event_id"]], changes, action="Modified")):
+                                    del st.session_state["edit_event_id"]
+                                    st.success("✅ Event updated successfully!")
+                                    st.rerun()
                         
                         if cancel_edit:
-                            del st.session_state["edit_event_idx"]
+                            del st.session_state["edit_event_id"]
                             st.rerun()
                 else:
                     st.error("Event not found. It may have been deleted.")
-                    del st.session_state["edit_event_idx"]
+                    del st.session_state["edit_event_id"]
                     st.rerun()
         else:
             st.info("No events found for this month.")
@@ -894,8 +995,6 @@ elif user_role == "view_only":
     st.info("👁️ You have view-only access. You can view the calendar but cannot add or edit events.")
     st.header("📅 Calendar View")
     
-    df_filtered = df.copy()
-    
     col1, col2 = st.columns([1, 3])
     with col1:
         current_year = datetime.now().year
@@ -913,53 +1012,15 @@ elif user_role == "view_only":
     
     st.divider()
     
-    month_events = df_filtered[
-        (pd.to_datetime(df_filtered["Date"]).dt.month == selected_month) & 
-        (pd.to_datetime(df_filtered["Date"]).dt.year == selected_year)
-    ].copy()
-    
-    cal = calendar.monthcalendar(selected_year, selected_month)
+    with perf.span("calendar") as s:
+        month_index = calendar_view.get_month_index(df, data_version, selected_year, selected_month)
+        month_events = df.iloc[month_index.positions()]
+        s.rows = len(month_events)
     
-    days_of_week = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-    header_cols = st.columns(7)
-    for idx, day in enumerate(days_of_week):
-        with header_cols[idx]:
-            st.markdown(f"<div style='text-align: center; font-weight: bold; padding: 5px;'>{day}</div>", unsafe_allow_html=True)
-    
-    for week in cal:
-        week_cols = st.columns(7)
-        for idx, day in enumerate(week):
-            with week_cols[idx]:
-                if day == 0:
-                    st.markdown("<div style='height: 100px; border: 1px solid #ddd; border-radius: 5px;'></div>", unsafe_allow_html=True)
-                else:
-                    day_date = datetime(selected_year, selected_month, day)
-                    day_events = month_events[pd.to_datetime(month_events["Date"]).dt.date == day_date.date()]
-                    
-                    if len(day_events) > 0:
-                        trainer_counts = day_events["Trainer Calendar"].value_counts()
-                        color_bars = ""
-                        for trainer in TRAINERS:
-                            if trainer in trainer_counts:
-                                color_bars += f"<div style='background-color: {TRAINER_COLORS[trainer]}; height: 8px; margin: 2px 0;'></div>"
-                        
-                        cell_html = f"""
-                        <div style='border: 2px solid #333; border-radius: 5px; padding: 5px; height: 100px; background-color: #f9f9f9;'>
-                            <div style='text-align: center; font-weight: bold; font-size: 18px; color: #000;'>{day}</div>
-                            {color_bars}
-                            <div style='text-align: center; font-size: 12px; margin-top: 5px; color: #000;'>{len(day_events)} event(s)</div>
-                        </div>
-                        """
-                        st.markdown(cell_html, unsafe_allow_html=True)
-                        
-                        if st.button(f"View Details", key=f"day_{day}", use_container_width=True):
-                            st.session_state[f"selected_day"] = day_date
-                    else:
-                        st.markdown(f"""
-                        <div style='border: 1px solid #ddd; border-radius: 5px; padding: 5px; height: 100px; background-color: #fff;'>
-                            <div style='text-align: center; font-weight: bold; font-size: 18px; color: #999;'>{day}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+    with perf.span("render") as s:
+        grid_html = calendar_view.render_month(df, data_version, selected_year, selected_month, TRAINER_COLORS)
+        st.markdown(grid_html, unsafe_allow_html=True)
+        s.rows, s.bytes = len(month_events), len(grid_html)
     
     st.divider()
     
@@ -972,7 +1033,7 @@ elif user_role == "view_only":
         for idx, (event_idx, event) in enumerate(month_events_sorted.iterrows()):
             trainer_color = TRAINER_COLORS.get(event["Trainer Calendar"], "#CCCCCC")
             
-            with st.expander(f"📅 {event['Date'].strftime('%b %d')} - **{event['Title']}**"):
+            with st.expander(f"📅 {span_label(event['Date'], event['End Date'], '%b %d')} - **{event['Title']}**"):
                 st.markdown(f"<div style='background-color: {trainer_color}; padding: 10px; border-radius: 5px; margin-bottom: 10px;'>", unsafe_allow_html=True)
                 
                 col1, col2, col3 = st.columns(3)
@@ -1008,8 +1069,6 @@ elif user_role == "trainer":
     st.info(f"🎓 Welcome {trainer_name}! You can view your personal calendar below.")
     st.header("📅 My Calendar")
     
-    df_filtered = df[df["Trainer Calendar"] == trainer_name].copy()
-    
     col1, col2 = st.columns([1, 3])
     with col1:
         current_year = datetime.now().year
@@ -1024,46 +1083,15 @@ elif user_role == "trainer":
     
     st.divider()
     
-    month_events = df_filtered[
-        (pd.to_datetime(df_filtered["Date"]).dt.month == selected_month) & 
-        (pd.to_datetime(df_filtered["Date"]).dt.year == selected_year)
-    ].copy()
-    
-    cal = calendar.monthcalendar(selected_year, selected_month)
+    with perf.span("calendar") as s:
+        month_index = calendar_view.get_month_index(df, data_version, selected_year, selected_month)
+        month_events = df.iloc[month_index.positions(trainer=trainer_name)]
+        s.rows = len(month_events)
     
-    days_of_week = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-    header_cols = st.columns(7)
-    for idx, day in enumerate(days_of_week):
-        with header_cols[idx]:
-            st.markdown(f"<div style='text-align: center; font-weight: bold; padding: 5px;'>{day}</div>", unsafe_allow_html=True)
-    
-    for week in cal:
-        week_cols = st.columns(7)
-        for idx, day in enumerate(week):
-            with week_cols[idx]:
-                if day == 0:
-                    st.markdown("<div style='height: 100px; border: 1px solid #ddd; border-radius: 5px;'></div>", unsafe_allow_html=True)
-                else:
-                    day_date = datetime(selected_year, selected_month, day)
-                    day_events = month_events[pd.to_datetime(month_events["Date"]).dt.date == day_date.date()]
-                    
-                    if len(day_events) > 0:
-                        cell_html = f"""
-                        <div style='border: 2px solid #333; border-radius: 5px; padding: 5px; height: 100px; background-color: {TRAINER_COLORS[trainer_name]};'>
-                            <div style='text-align: center; font-weight: bold; font-size: 18px; color: #000;'>{day}</div>
-                            <div style='text-align: center; font-size: 12px; margin-top: 5px; color: #000;'>{len(day_events)} event(s)</div>
-                        </div>
-                        """
-                        st.markdown(cell_html, unsafe_allow_html=True)
-                        
-                        if st.button(f"View Details", key=f"day_{day}", use_container_width=True):
-                            st.session_state[f"selected_day"] = day_date
-                    else:
-                        st.markdown(f"""
-                        <div style='border: 1px solid #ddd; border-radius: 5px; padding: 5px; height: 100px; background-color: #fff;'>
-                            <div style='text-align: center; font-weight: bold; font-size: 18px; color: #999;'>{day}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+    with perf.span("render") as s:
+        grid_html = calendar_view.render_month(df, data_version, selected_year, selected_month, TRAINER_COLORS, trainer=trainer_name)
+        st.markdown(grid_html, unsafe_allow_html=True)
+        s.rows, s.bytes = len(month_events), len(grid_html)
     
     st.divider()
     
@@ -1076,7 +1104,7 @@ elif user_role == "trainer":
         for idx, (event_idx, event) in enumerate(month_events_sorted.iterrows()):
             trainer_color = TRAINER_COLORS.get(event["Trainer Calendar"], "#CCCCCC")
             
-            with st.expander(f"📅 {event['Date'].strftime('%b %d')} - **{event['Title']}**"):
+            with st.expander(f"📅 {span_label(event['Date'], event['End Date'], '%b %d')} - **{event['Title']}**"):
                 st.markdown(f"<div style='background-color: {trainer_color}; padding: 10px; border-radius: 5px; margin-bottom: 10px;'>", unsafe_allow_html=True)
                 
                 col1, col2, col3 = st.columns(3)
@@ -1094,3 +1122,5 @@ elif user_role == "trainer":
                 st.markdown("</div>", unsafe_allow_html=True)
     else:
         st.info("No events found for this month.")
+
+perf.finish_rerun(st.session_state)
@@ -0,0 +1,166 @@
+"""Append-only history of every change to the events, kept in SQLite beside the store.
+
+Each row of the log is one change to one event: who made it and when, the
+action ("Created", "Modified", "Deleted", ...), and the event's values
+before and after, as JSON. Inserts keep the whole new row, deletes the whole
+removed row, and updates only the fields they changed. The log is indexed
+by Event ID and by time, and triggers refuse to update or delete its rows.
+
+event_store writes to it (see event_store.write_changes) and rebuilds past
+versions of the schedule from it (see event_store.schedule_as_of).
+"""
+import json
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+import event_model
+
+# Actions that move events between the store and the archive; the events
+# stayed on the schedule, so rebuilding a past schedule skips them
+MOVES = ("Archived", "Restored")
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        at TEXT NOT NULL,
+        user TEXT,
+        action TEXT NOT NULL,
+        change TEXT NOT NULL CHECK (change IN ('insert', 'update', 'delete')),
+        event_id TEXT NOT NULL,
+        title TEXT,
+        version INTEGER,
+        before TEXT,
+        after TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_changes_event ON changes (event_id, seq);
+    CREATE INDEX IF NOT EXISTS idx_changes_at ON changes (at);
+    CREATE TRIGGER IF NOT EXISTS changes_no_update BEFORE UPDATE ON changes
+        BEGIN SELECT RAISE(ABORT, 'the audit log is append-only'); END;
+    CREATE TRIGGER IF NOT EXISTS changes_no_delete BEFORE DELETE ON changes
+        BEGIN SELECT RAISE(ABORT, 'the audit log is append-only'); END;
+"""
+
+_FIELDS = ("at", "user", "action", "change", "event_id", "title", "version", "before", "after")
+
+
+def now():
+    """The current time in the log's format"""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _time(value):
+    return pd.Timestamp(value).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class AuditLog:
+    """The change log in one SQLite file"""
+
+    def __init__(self, path, timeout=10):
+        self.path = path
+        self.timeout = timeout
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+        # In WAL mode readers never hold up a commit, so entries written
+        # while a change is saved commit as soon as it is
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def begin(self, entries):
+        """Start appending changes: dicts with the keys of _FIELDS, before/after as dicts (or None).
+
+        Returns the connection holding them in an open transaction, for the
+        caller to commit once the change they describe is saved, or to roll
+        back when it is not. Waits up to timeout for another writer.
+        """
+        rows = [(entry["at"], entry.get("user"), entry["action"], entry["change"], entry["event_id"],
+                 entry.get("title"), entry.get("version"),
+                 None if entry.get("before") is None else json.dumps(entry["before"]),
+                 None if entry.get("after") is None else json.dumps(entry["after"]))
+                for entry in entries]
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(f"INSERT INTO changes ({', '.join(_FIELDS)}) "
+                             f"VALUES ({', '.join('?' for _ in _FIELDS)})", rows)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def record(self, entries):
+        """Append changes at once (see begin)"""
+        conn = self.begin(entries)
+        try:
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _query(self, where="", params=(), order="seq", limit=None):
+        conn = self._connect()
+        try:
+            sql = f"SELECT seq, {', '.join(_FIELDS)} FROM changes {where} ORDER BY {order}"
+            if limit:
+                sql += f" LIMIT {int(limit)}"
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        return [dict(zip(("seq",) + _FIELDS, row), before=_loads(row[8]), after=_loads(row[9])) for row in rows]
+
+    def history(self, event_id):
+        """Every change to one event, newest first"""
+        return _table(self._query("WHERE event_id = ?", (event_id,), order="seq DESC"))
+
+    def changes(self, start=None, end=None, limit=None):
+        """Changes made in [start, end] (None means open-ended), newest first"""
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("at >= ?")
+            params.append(_time(start))
+        if end is not None:
+            conditions.append("at <= ?")
+            params.append(_time(end))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return _table(self._query(where, params, order="seq DESC", limit=limit))
+
+    def since(self, when):
+        """The changes made after when, oldest first, as dicts with before/after decoded"""
+        return self._query("WHERE at > ?", (_time(when),))
+
+    def started(self):
+        """Time of the first change logged, or None"""
+        rows = self._query(limit=1)
+        return rows[0]["at"] if rows else None
+
+
+def _loads(text):
+    return None if text is None else json.loads(text)
+
+
+def _describe(record):
+    if record["change"] == "insert":
+        return "added"
+    if record["change"] == "delete":
+        return "removed"
+    before, after = record["before"] or {}, record["after"] or {}
+    return "; ".join(f"{field}: {_shown(before.get(field))} → {_shown(after.get(field))}"
+                     for field in after if field not in ("Date Modified", "Action Type", "Modified By"))
+
+
+def _shown(value):
+    return "(empty)" if value is None or value == "" else str(value).replace("T00:00:00", "")
+
+
+def _table(records):
+    """Records as a table for display"""
+    return pd.DataFrame({
+        "At": [record["at"] for record in records],
+        "User": [record["user"] for record in records],
+        "Action": [record["action"] for record in records],
+        "Event": [record["title"] for record in records],
+        "Changes": [_describe(record) for record in records],
+        event_model.ID_COLUMN: [record["event_id"] for record in records],
+    })
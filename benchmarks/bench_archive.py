@@ -0,0 +1,70 @@
+"""Time load_data() over a full history and over the active years once older years are archived.
+
+Also times search_archive() over the archived years, built once and then cached.
+
+Usage: python benchmarks/bench_archive.py [--rows 100000] [--years 6] [--keep 2] [--seed 0]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import event_store  # noqa: E402
+import search  # noqa: E402
+from generator import synthetic_events  # noqa: E402
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def cold_load(repeat=3):
+    """load_data() as in a fresh process, median of repeat loads"""
+    timings = []
+    for _ in range(repeat):
+        event_store.forget_store()
+        df, seconds = timed(event_store.load_data)
+        timings.append(seconds)
+    return df, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--years", type=int, default=6)
+    parser.add_argument("--keep", type=int, default=2, help="most recent years left in the store")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    first_year = 2020
+    cutoff = first_year + args.years - args.keep
+    with tempfile.TemporaryDirectory() as tmp:
+        event_store.STORAGE_BACKEND = "excel"
+        event_store.EXCEL_FILE = os.path.join(tmp, "events.xlsx")
+        event_store.ARCHIVE_DIR = os.path.join(tmp, "archive")
+        event_store.save_data(synthetic_events(args.rows, args.seed, start=date(first_year, 1, 1), years=args.years))
+
+        df, full = cold_load()
+        print(f"{len(df)} rows over {args.years} years: load_data {full:.3f}s, "
+              f"{df.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+        moved, seconds = timed(lambda: event_store.archive_before(cutoff))
+        print(f"archive_before({cutoff}): {moved} events in {seconds:.2f}s")
+        df, active = cold_load()
+        print(f"{len(df)} active rows: load_data {active:.3f}s, {df.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+        history, seconds = timed(lambda: event_store.load_archive(date(cutoff - 1, 1, 1), date(cutoff - 1, 12, 31)))
+        print(f"load_archive of {cutoff - 1}: {len(history)} rows in {seconds:.3f}s")
+        archived = event_store.load_archive(date(first_year, 1, 1), date(cutoff - 1, 12, 31))
+        for run in ("first", "repeat"):
+            ranked, seconds = timed(lambda: search.search_archive(archived, "leadership westpac"))
+            print(f"search_archive over {len(archived)} rows, {run}: {len(ranked)} hits in {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Check the double-booking report against a brute-force scan and time it.
+
+Usage: python benchmarks/bench_conflicts.py [--rows 100000] [--check-rows 2000] [--seed 0]
+
+Exits non-zero if the report and the brute-force scan disagree on the first
+--check-rows events.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import conflicts  # noqa: E402
+import event_store  # noqa: E402
+from generator import synthetic_events  # noqa: E402
+
+
+def brute_force(df):
+    """(first label, second label) of every overlapping firm pair, by comparing all pairs"""
+    firm = conflicts._firm(df).to_dict("records")
+    pairs = set()
+    for i, a in enumerate(firm):
+        for b in firm[i + 1:]:
+            if a["trainer"] == b["trainer"] and a["start"] <= b["end"] and b["start"] <= a["end"]:
+                pairs.add(frozenset((a["label"], b["label"])))
+    return pairs
+
+
+def reported(df):
+    bookings = conflicts._firm(df).sort_values(["trainer", "start"], kind="stable").reset_index(drop=True)
+    first, second = conflicts._overlapping_pairs(bookings)
+    labels = bookings["label"].to_numpy()
+    return {frozenset((labels[i], labels[j])) for i, j in zip(first, second)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--check-rows", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sample = event_store.normalize(synthetic_events(args.check_rows, args.seed))
+    expected, actual = brute_force(sample), reported(sample)
+    print(f"{args.check_rows} rows: {len(expected)} overlapping pair(s) by brute force, {len(actual)} reported")
+    if expected != actual:
+        print(f"missing: {len(expected - actual)}, extra: {len(actual - expected)}")
+        sys.exit(1)
+
+    df = event_store.normalize(synthetic_events(args.rows, args.seed))
+
+    started = time.perf_counter()
+    report = conflicts.conflict_report(df, None)
+    full = time.perf_counter() - started
+
+    started = time.perf_counter()
+    conflicts.get_booking_index(df, "bench")
+    build = time.perf_counter() - started
+
+    new_event = df.iloc[[0]].assign(Status="Confirmed")
+    started = time.perf_counter()
+    clashes = conflicts.find_conflicts(df, "bench", inserts=new_event)
+    check = time.perf_counter() - started
+
+    print(f"{args.rows} rows: report {full:.3f}s ({len(report)} double booking(s)), "
+          f"index build {build:.3f}s, one-event check {check * 1000:.1f}ms ({len(clashes)} clash(es))")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Time writing the trainer calendar feeds from scratch and after one edit.
+
+Usage: python benchmarks/bench_feeds.py [--rows 100000] [--seed 0]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import event_model  # noqa: E402
+import event_store  # noqa: E402
+import feeds  # noqa: E402
+from generator import synthetic_events  # noqa: E402
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = event_model.apply_schema(event_store.normalize(synthetic_events(args.rows, args.seed)))
+    edited = df.copy()
+    edited.loc[edited.index[0], "Client"] = "NAB"
+
+    with tempfile.TemporaryDirectory() as directory:
+        writer = feeds.FeedWriter(directory)
+        written, cold = timed(lambda: writer.update(df, 1))
+        print(f"{args.rows} rows: all feeds {cold:.3f}s ({', '.join(written)})")
+        written, warm = timed(lambda: writer.update(edited, 2))
+        print(f"one edited event: {warm:.3f}s ({', '.join(written)})")
+        written, restart = timed(lambda: feeds.FeedWriter(directory).update(edited, 2))
+        print(f"new process, nothing changed: {restart:.3f}s ({len(written)} feed(s) written)")
+
+
+if __name__ == "__main__":
+    main()
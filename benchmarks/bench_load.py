@@ -0,0 +1,46 @@
+"""Compare cold load time of the workbook (openpyxl) and its Parquet sidecar.
+
+Usage: python benchmarks/bench_load.py [--sizes 1000 10000 100000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import event_store  # noqa: E402
+from generator import synthetic_events  # noqa: E402
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'xlsx (s)':>10} {'parquet (s)':>12} {'speed-up':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.sizes:
+            path = os.path.join(tmp, f"events_{rows}.xlsx")
+            event_store._write_workbook(synthetic_events(rows), path)
+            key = event_store._file_identity(path)
+            event_store._write_sidecar(event_store._read_workbook(path), path, key)
+
+            xlsx = best_of(args.repeat, lambda: event_store._read_workbook(path))
+            parquet = best_of(args.repeat, lambda: event_store._read_sidecar(path, key))
+            print(f"{rows:>8} {xlsx:>10.3f} {parquet:>12.3f} {xlsx / parquet:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Time bulk edit and duplicate planned with event_model.plan_changes against the per-row way.
+
+Usage: python benchmarks/bench_mutations.py [--rows 10000] [--events 50] [--days 60]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import event_model  # noqa: E402
+import event_store  # noqa: E402
+from generator import synthetic_events  # noqa: E402
+
+
+def per_row_duplicate(df, labels, days):
+    """Duplicate across a date range the way Manage Events used to: one Series per event per day"""
+    new_events = []
+    for idx in labels:
+        original = df.loc[idx].copy()
+        for day in days:
+            new_event = original.copy()
+            new_event["Date"] = pd.Timestamp(day)
+            new_event["Date Modified"] = "2025-01-01 00:00"
+            new_event["Action Type"] = "Duplicated"
+            new_event["Modified By"] = "bench"
+            new_event["Title"] = event_model.generate_title(new_event)
+            new_events.append(new_event)
+    return pd.DataFrame(new_events)
+
+
+def per_row_edit(df, labels, fields):
+    """Bulk edit the way Manage Events used to: df.at per field per row, one title per row"""
+    df = df.copy()
+    for idx in labels:
+        for field, value in fields.items():
+            df.at[idx, field] = value
+        df.at[idx, "Title"] = event_model.generate_title(df.loc[idx])
+    return df
+
+
+def timed(label, run):
+    started = time.perf_counter()
+    result = run()
+    print(f"  {label}: {(time.perf_counter() - started) * 1000:.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--days", type=int, default=60)
+    args = parser.parse_args()
+
+    plain = event_store.normalize(synthetic_events(args.rows))
+    df = event_model.apply_schema(plain)
+    labels = list(df.index[:args.events])
+    days = [date(2026, 1, 1) + timedelta(days=i) for i in range(args.days)]
+
+    print(f"Duplicate {args.events} events to {args.days} dates:")
+    old = timed("per row", lambda: per_row_duplicate(plain, labels, days))
+    new, _, _ = timed("plan_changes", lambda: event_model.plan_changes(
+        df, [event_model.duplicate(df.loc[labels, "Event ID"], dates=days)], "bench"))
+    print(f"  {len(old)} vs {len(new)} rows")
+
+    edited = df.index[:1000]
+    fields = {"Status": "Confirmed", "Trainer Calendar": "Dale"}
+    print(f"Bulk edit {len(edited)} events:")
+    timed("per row", lambda: per_row_edit(plain, edited, fields))
+    ids = df.loc[edited, "Event ID"]
+    timed("plan_changes", lambda: event_model.plan_changes(df, [event_model.set_fields(ids, fields)], "bench"))
+
+
+if __name__ == "__main__":
+    main()
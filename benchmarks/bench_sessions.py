@@ -0,0 +1,58 @@
+"""Measure the memory held by concurrent sessions that each load the events table.
+
+Usage: python benchmarks/bench_sessions.py [--rows 100000] [--sessions 3 30] [--seed 0]
+
+Every simulated session keeps what a rerun of app.py keeps alive (the frame
+from load_data(), plus a filtered selection) until all have loaded, as
+Streamlit sessions do through their widgets' callbacks.
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+from datetime import date
+
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import event_store  # noqa: E402
+import filters  # noqa: E402
+from generator import synthetic_events  # noqa: E402
+
+
+def allocated():
+    """Bytes held by numpy/Python objects plus Arrow buffers (pandas' string columns)"""
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0] + pa.total_allocated_bytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[3, 30])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        event_store.STORAGE_BACKEND = "excel"
+        event_store.EXCEL_FILE = os.path.join(tmp, "events.xlsx")
+        event_store.save_data(synthetic_events(args.rows, args.seed))
+        tracemalloc.start()
+        event_store.load_data()  # the process-wide snapshot
+        base = allocated()
+        print(f"{args.rows} rows, snapshot and store state: {base / 1e6:.1f} MB")
+        for count in args.sessions:
+            sessions = []
+            for _ in range(count):
+                df = event_store.load_data()
+                labels = filters.filter_events(df, df.attrs["version"], date(2023, 1, 1), date(2023, 3, 31))
+                sessions.append((df, df.loc[labels[:50]]))
+            print(f"{count:>4} sessions: +{(allocated() - base) / 1e6:.1f} MB")
+            del sessions, df
+
+
+if __name__ == "__main__":
+    main()
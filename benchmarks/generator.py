@@ -0,0 +1,72 @@
+"""Synthetic events for the benchmarks, in the events layout, at any size.
+
+Rows cover every Type, Status, Source, Trainer, Medium and Location, about
+one event in five runs over several days, and notes are free text of varied
+length. Generation is column-wise, so a million rows take a few seconds.
+"""
+import os
+import sys
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import event_model  # noqa: E402
+
+CLIENTS = ["SSIA", "Joesolve", "Certitude", "FCC", "Westpac", "NAB", "ANZ", "Telstra", "Qantas", "Optus",
+           "Deloitte", "KPMG", "Medibank", "Coles", "Woolworths", "DBS", "Maybank", "Petronas", "Singtel", "AIA"]
+COURSES = ["Leadership Workshop", "Customer Care", "EQ Coaching", "Resilience Essentials", "Team Dynamics",
+           "Managing Change", "Influencing Skills", "EQ (Advanced)", "Difficult Conversations", "Debrief"]
+BILLING = ["AUD", "USD", "SG USD", "MYR", "Invoice on completion", "50% deposit, balance after delivery"]
+WORDS = ("client confirm numbers venue booked catering parking projector room level floor materials printed "
+         "couriered arrive early pre-reads sent survey participants manager debrief follow-up session zoom link "
+         "teams invite rescheduled from last month hold pending purchase order approval budget sign-off").split()
+USERS = ["sues@eqstrategist.com", "joec@eqstrategist.com", "doms@eqstrategist.com", "bernardl@eqstrategist.com"]
+
+# Share of events lasting 1 (single day), 2, 3, 4 and 5 days
+LENGTH_WEIGHTS = [0.8, 0.08, 0.06, 0.03, 0.03]
+
+
+def _notes(rng, count, pool_size=2000):
+    """count free-text notes drawn from a pool of sentences of 0 to 24 words (about a third empty)"""
+    pool = [" ".join(rng.choice(WORDS, size=rng.integers(3, 25))).capitalize() for _ in range(pool_size)]
+    notes = np.array(pool, dtype=object)[rng.integers(0, pool_size, size=count)]
+    notes[rng.random(count) < 0.35] = np.nan
+    return notes
+
+
+def synthetic_events(rows, seed=0, start=date(2020, 1, 1), years=6):
+    """Return rows of plausible events spread over years from start, titled like the app titles them"""
+    rng = np.random.default_rng(seed)
+
+    def pick(values, weights=None):
+        return np.array(values, dtype=object)[rng.choice(len(values), size=rows, p=weights)]
+
+    days = rng.integers(0, 365 * years, size=rows)
+    lengths = rng.choice(len(LENGTH_WEIGHTS), size=rows, p=LENGTH_WEIGHTS)
+    first = pd.Timestamp(start) + pd.to_timedelta(days, unit="D")
+    modified = first - pd.to_timedelta(rng.integers(1, 90 * 24 * 60, size=rows), unit="min")
+
+    df = pd.DataFrame({
+        "Date": first,
+        "End Date": first + pd.to_timedelta(lengths, unit="D"),
+        "Type": pick(event_model.TYPES, [0.6, 0.25, 0.15]),
+        "Status": pick(event_model.STATUSES, [0.2, 0.25, 0.45, 0.1]),
+        "Source": pick(event_model.SOURCES),
+        "Client": pick(CLIENTS),
+        "Course/Description": pick(COURSES),
+        "Trainer Calendar": pick(event_model.TRAINERS),
+        "Medium": pick(event_model.MEDIUMS, [0.65, 0.35]),
+        "Location": pick(event_model.LOCATIONS),
+        "Billing": pick(BILLING),
+        "Invoiced": pick(event_model.INVOICED, [0.7, 0.3]),
+        "Notes": _notes(rng, rows),
+        "Date Modified": np.char.replace(np.datetime_as_string(modified.to_numpy(), unit="m"), "T", " "),
+        "Action Type": pick(["Created", "Modified", "Bulk Modified", "Duplicated"], [0.6, 0.25, 0.1, 0.05]),
+        "Modified By": pick(USERS),
+        "Event ID": event_model.new_ids(rows),
+    })
+    df["Title"] = event_model.generate_titles(df)
+    return df[event_model.COLUMNS]
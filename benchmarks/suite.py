@@ -0,0 +1,230 @@
+"""Time the app's hot paths on synthetic data and compare them with a stored baseline.
+
+Usage: python benchmarks/suite.py [--sizes 1000 10000 100000] [--repeat 5] [--only load_data filters ...]
+                                  [--output results.json] [--baseline benchmarks/baseline.json]
+                                  [--tolerance 0.25] [--update-baseline]
+
+Every metric is the median of --repeat runs, in seconds, recorded with its
+spread (the median absolute deviation, as a fraction of the median).
+Results are printed as a table and written as JSON to --output, together
+with the time a fixed reference workload took before and after them (the
+calibration), which tracks how fast the machine is running at the moment.
+
+Baseline timings are first scaled by this run's calibration over the
+baseline's, so a machine that is slower or busier than when the baseline
+was recorded does not read as a regression. Exits non-zero when a metric
+is slower than that by more than --tolerance plus three times its spread
+(the larger of the baseline's and this run's, so metrics that vary from
+run to run, like the disk-bound save_data, get the room they need) and by
+at least --min-delta seconds; --update-baseline stores the results as the
+new baseline instead.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import calendar_view  # noqa: E402
+import event_model  # noqa: E402
+import event_store  # noqa: E402
+import exports  # noqa: E402
+import filters  # noqa: E402
+from generator import synthetic_events  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+COLORS = {"Dom": "#E74E25", "Andrew": "#4ECDC4", "Dale": "#4A90E2", "Jack": "#FFD93D"}
+
+
+# Spreads beyond this many times the median absolute deviation are taken as a slow-down
+NOISE_WIDTH = 3
+
+
+def timed(repeat, fn, setup=None):
+    """(median seconds, spread) of repeat runs of fn"""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    median = statistics.median(timings)
+    spread = statistics.median(abs(t - median) for t in timings) / median if median else 0.0
+    return median, spread
+
+
+def calibrate(repeat):
+    """Median seconds of a fixed workload of interpreter and pandas work, independent of the app"""
+    frame = pd.DataFrame({"key": np.arange(200_000) % 97, "value": np.arange(200_000, dtype=float)})
+
+    def work():
+        sum(i * i for i in range(300_000))
+        frame.groupby("key")["value"].sum()
+        frame.sort_values("value", ascending=False)
+    return timed(repeat, work)[0]
+
+
+# ---------- Metrics ----------
+# Each takes (the events as load_data returns them, repeat, working
+# directory) and returns timed()'s (seconds, spread). Data versions are None throughout, so the
+# module caches are bypassed and every run does the full work.
+def bench_load_data(df, repeat, tmp):
+    """Cold load_data(), as in a fresh process: workbook hash, Parquet sidecar read, journal replay, schema"""
+    return timed(repeat, event_store.load_data, setup=event_store.forget_store)
+
+
+def bench_save_data(df, repeat, tmp):
+    """save_data() of the whole table: workbook plus sidecar"""
+    return timed(repeat, lambda: event_store.save_data(df))
+
+
+def bench_generate_titles(df, repeat, tmp):
+    """generate_titles() over the whole table"""
+    return timed(repeat, lambda: event_model.generate_titles(df))
+
+
+def _quarter(df):
+    return filters.filter_events(df, None, date(2023, 1, 1), date(2023, 3, 31), "Dale", "Confirmed", None, "a")
+
+
+def bench_filters(df, repeat, tmp):
+    """Manage Events filters (a quarter, one trainer, one status, a client search), columns prepared afresh"""
+    return timed(repeat, lambda: _quarter(df))
+
+
+def bench_month_calendar(df, repeat, tmp):
+    """Month grid aggregation and HTML for all trainers and for one"""
+    def run():
+        calendar_view.render_month(df, None, 2023, 6, COLORS)
+        calendar_view.render_month(df, None, 2023, 6, COLORS, trainer="Dom")
+    return timed(repeat, run)
+
+
+def bench_export_csv(df, repeat, tmp):
+    """Download of the whole table as CSV in the one-row-per-day layout"""
+    return timed(repeat, lambda: exports.get_export(df, "csv", columns=event_model.DAILY_COLUMNS))
+
+
+def bench_export_xlsx(df, repeat, tmp):
+    """Download of one quarter's filtered events as xlsx"""
+    events = df.loc[filters.filter_events(df, None, date(2023, 1, 1), date(2023, 3, 31))]
+    return timed(repeat, lambda: exports.get_export(events, "xlsx", start=date(2023, 1, 1), end=date(2023, 3, 31),
+                                                      columns=event_model.DAILY_COLUMNS))
+
+
+METRICS = {
+    "load_data": bench_load_data,
+    "save_data": bench_save_data,
+    "generate_titles": bench_generate_titles,
+    "filters": bench_filters,
+    "month_calendar": bench_month_calendar,
+    "export_csv": bench_export_csv,
+    "export_xlsx": bench_export_xlsx,
+}
+
+
+def run(sizes, repeat, only):
+    """Return [{"metric", "rows", "seconds", "spread"}] for every metric at every size"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        event_store.STORAGE_BACKEND = "excel"
+        for rows in sizes:
+            event_store.EXCEL_FILE = os.path.join(tmp, f"events_{rows}.xlsx")
+            event_store.save_data(synthetic_events(rows))
+            df = event_store.load_data()
+            for metric, bench in METRICS.items():
+                if only and metric not in only:
+                    continue
+                seconds, spread = bench(df, repeat, tmp)
+                results.append({"metric": metric, "rows": rows, "seconds": round(seconds, 6),
+                                "spread": round(spread, 4)})
+                print(f"{metric:>16} {rows:>9} {seconds:>10.4f}s {spread:>7.1%}", flush=True)
+    return results
+
+
+def environment():
+    return {"python": platform.python_version(), "pandas": pd.__version__, "platform": platform.platform(),
+            "cpus": os.cpu_count()}
+
+
+def speed_ratio(report, baseline):
+    """This run's calibration over the baseline's (1 when either was not calibrated)"""
+    if not report.get("calibration") or not baseline.get("calibration"):
+        return 1.0
+    return report["calibration"] / baseline["calibration"]
+
+
+def regressions(results, baseline, tolerance, min_delta, ratio=1.0):
+    """(metric, rows, expected seconds, seconds, allowed slow-down) for every result slower than allowed.
+
+    Expected seconds are the baseline's times ratio (see speed_ratio).
+    """
+    expected = {(entry["metric"], entry["rows"]): entry for entry in baseline["results"]}
+    slower = []
+    for entry in results:
+        before = expected.get((entry["metric"], entry["rows"]))
+        if before is None:
+            continue
+        seconds = before["seconds"] * ratio
+        noise = max(before.get("spread", 0.0), entry.get("spread", 0.0))
+        allowed = tolerance + NOISE_WIDTH * noise
+        if entry["seconds"] > seconds * (1 + allowed) and entry["seconds"] - seconds > min_delta:
+            slower.append((entry["metric"], entry["rows"], seconds, entry["seconds"], allowed))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", choices=list(METRICS))
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slow-down, as a fraction")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="slow-downs below this many seconds are ignored")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'metric':>16} {'rows':>9} {'median':>11} {'spread':>7}")
+    before = calibrate(args.repeat)
+    results = run(args.sizes, args.repeat, args.only)
+    report = {"environment": environment(), "repeat": args.repeat,
+              "calibration": round((before + calibrate(args.repeat)) / 2, 6), "results": results}
+    print(f"{'calibration':>16} {'':>9} {report['calibration']:>10.4f}s")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"Baseline saved to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one")
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    ratio = speed_ratio(report, baseline)
+    print(f"Machine speed: the reference workload took {ratio:.2f}x as long as for the baseline")
+    slower = regressions(report["results"], baseline, args.tolerance, args.min_delta, ratio)
+    for metric, rows, expected, seconds, allowed in slower:
+        print(f"REGRESSION {metric} at {rows} rows: expected {expected:.4f}s, took {seconds:.4f}s "
+              f"(+{seconds / expected - 1:.0%}, allowed +{allowed:.0%})")
+    if slower:
+        sys.exit(1)
+    print(f"No metric slower than its baseline by more than {args.tolerance:.0%} plus its noise")
+
+
+if __name__ == "__main__":
+    main()
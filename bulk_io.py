@@ -0,0 +1,208 @@
+"""Import and export events from the command line, without starting Streamlit.
+
+Usage:
+    python bulk_io.py import FILE --user EMAIL [--allow-double-booking] [--chunk-rows 5000]
+    python bulk_io.py export FILE [--from DATE] [--to DATE] [--trainer NAME] [--archived]
+
+FILE may be .csv, .xlsx or .ics (export also writes .parquet). Imports add
+the file's events to the schedule in one write; rows are checked and stamped
+exactly as the New Event form does, and nothing is saved if any row fails.
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+from openpyxl import load_workbook
+
+import conflicts
+import event_model
+import event_store
+import exports
+import filters
+import ics
+from event_model import COLUMNS, DAILY_COLUMNS
+
+# Rows read, checked and stamped at a time
+CHUNK_ROWS = 5000
+
+FORMATS = ("csv", "xlsx", "ics", "parquet")
+
+
+class ImportRejected(Exception):
+    """The file was not imported; rows holds the offending rows or clashes"""
+
+    def __init__(self, message, rows):
+        super().__init__(message)
+        self.rows = rows
+
+
+def file_format(path):
+    fmt = os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported file type: {path} (use {', '.join(FORMATS)})")
+    return fmt
+
+
+# ---------- Readers ----------
+# Each yields DataFrames of at most chunk_rows raw rows, with file row
+# numbers (counting the header as row 1) as the index.
+def _read_csv(path, chunk_rows):
+    first = 2
+    for chunk in pd.read_csv(path, chunksize=chunk_rows, dtype=str, keep_default_na=False, na_values=[""]):
+        chunk.index = range(first, first + len(chunk))
+        first += len(chunk)
+        yield chunk
+
+
+def _read_xlsx(path, chunk_rows):
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(name) for name in next(rows, ())]
+        batch, first = [], 2
+        for values in rows:
+            # Trailing empty cells may be left out of a row
+            batch.append(values + (None,) * (len(header) - len(values)))
+            if len(batch) == chunk_rows:
+                yield pd.DataFrame(batch, columns=header, index=range(first, first + len(batch)))
+                first += len(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header, index=range(first, first + len(batch)))
+    finally:
+        wb.close()
+
+
+def _read_ics(path, chunk_rows):
+    events = ics.read_ics(path)
+    events.index = range(1, len(events) + 1)  # numbered by VEVENT
+    for start in range(0, len(events), chunk_rows):
+        yield events.iloc[start:start + chunk_rows]
+
+
+READERS = {"csv": _read_csv, "xlsx": _read_xlsx, "ics": _read_ics}
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yield the rows of a csv, xlsx or ics file chunk_rows at a time"""
+    fmt = file_format(path)
+    if fmt not in READERS:
+        raise ValueError(f"Cannot import {fmt} files")
+    return READERS[fmt](path, chunk_rows)
+
+
+# ---------- Import / Export ----------
+def _prepare(chunk):
+    """Raw rows -> events layout; other columns are dropped and unreadable dates left for validate_events"""
+    chunk = chunk.dropna(how="all")
+    chunk = chunk.reindex(columns=COLUMNS)
+    for col in ("Date", "End Date"):
+        if col in chunk.columns:
+            chunk[col] = pd.to_datetime(chunk[col], errors="coerce")
+    return event_store.normalize(chunk)
+
+
+def import_events(path, user, chunk_rows=CHUNK_ROWS, allow_double_booking=False):
+    """Add the events in path to the schedule in one write and return how many were added.
+
+    Files in the one-row-per-day layout (no End Date column) have their
+    consecutive identical days merged into multi-day events, as
+    event_store.import_excel does. Raises ImportRejected, saving nothing,
+    when a row is invalid or (unless allowed) double-books a trainer.
+    """
+    df = event_store.load_data()
+    batches, problems, daily = [], [], False
+    for chunk in read_chunks(path, chunk_rows):
+        daily = daily or "End Date" not in chunk.columns
+        rows = _prepare(chunk)
+        messages = event_model.validate_events(rows)
+        problems.append(messages[messages != ""])
+        batches.append(rows)
+
+    problems = pd.concat(problems) if problems else pd.Series(dtype=object)
+    if len(problems) > 0:
+        raise ImportRejected(f"{len(problems)} row(s) of {path} cannot be imported", problems.rename("Problem"))
+    if not batches or sum(len(rows) for rows in batches) == 0:
+        return 0
+
+    rows = pd.concat(batches)
+    if daily:
+        rows = event_model.coalesce_days(rows)
+    inserts, _, _ = event_model.plan_changes(df, [event_model.insert(rows, action="Imported")], user)
+
+    if not allow_double_booking:
+        clashes = conflicts.find_conflicts(df, df.attrs.get("version"), inserts=inserts)
+        if len(clashes) > 0:
+            raise ImportRejected(f"{path} would double-book {', '.join(clashes['Trainer'].unique())}", clashes)
+
+    event_store.write_changes(inserts=inserts, base_version=df.attrs.get("version"), user=user)
+    return len(inserts)
+
+
+def export_events(path, date_from=None, date_to=None, trainer=None, archived=False):
+    """Write the events (optionally limited to a date range and trainer) to path; return rows written.
+
+    csv, xlsx and parquet files use the one-row-per-day layout; ics files
+    have one all-day VEVENT per event. archived adds the matching events of
+    archived years.
+    """
+    fmt = file_format(path)
+    df = event_store.load_data()
+    version = df.attrs.get("version")
+    if archived:
+        df, version = pd.concat([event_store.load_archive(date_from, date_to), df], ignore_index=True), None
+    labels = filters.filter_events(df, version, date_from, date_to, trainer)
+    events = df.loc[labels]
+    if fmt == "ics":
+        data, count = ics.to_ics(events, name=f"EQS Events - {trainer}" if trainer else "EQS Events"), len(events)
+    else:
+        daily = event_model.expand_days(events, date_from, date_to)
+        data, count = exports.render(daily[DAILY_COLUMNS], fmt), len(daily)
+    with open(path, "wb") as f:
+        f.write(data)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="add the events in a csv, xlsx or ics file")
+    importer.add_argument("file")
+    importer.add_argument("--user", required=True, help="email recorded as Modified By")
+    importer.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    importer.add_argument("--allow-double-booking", action="store_true")
+
+    exporter = commands.add_parser("export", help="write the events to a csv, xlsx, parquet or ics file")
+    exporter.add_argument("file")
+    exporter.add_argument("--from", dest="date_from", type=pd.Timestamp)
+    exporter.add_argument("--to", dest="date_to", type=pd.Timestamp)
+    exporter.add_argument("--trainer", choices=event_model.TRAINERS)
+    exporter.add_argument("--archived", action="store_true", help="include archived years")
+
+    args = parser.parse_args()
+    started = time.perf_counter()
+    try:
+        if args.command == "import":
+            count = import_events(args.file, args.user, args.chunk_rows, args.allow_double_booking)
+            verb = f"Imported {count} events from"
+        else:
+            count = export_events(args.file, args.date_from, args.date_to, args.trainer, args.archived)
+            verb = f"Exported {count} rows to"
+    except ImportRejected as e:
+        print(f"{e}. Nothing was saved.", file=sys.stderr)
+        with pd.option_context("display.max_colwidth", None):
+            print(e.rows.head(20).to_string(), file=sys.stderr)
+        sys.exit(1)
+    except (ValueError, OSError, event_store.StoreBusyError, event_store.StaleDataError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+    print(f"{verb} {args.file} in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} rows/s, "
+          f"{event_store.STORAGE_BACKEND} backend)")
+
+
+if __name__ == "__main__":
+    main()
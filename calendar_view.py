@@ -0,0 +1,113 @@
+import calendar
+from collections import defaultdict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import event_model
+from version_cache import VersionCache
+
+# ---------- Month index ----------
+# The calendar views need "which events fall on this day" and "how many per
+# trainer" for every cell of a month. Events are stored once with a start and
+# end date, so only the month on screen is expanded into days. The result is
+# built once per (data version, month) and shared by every session and all
+# three calendar views.
+_month_indexes = VersionCache()
+
+
+class MonthIndex:
+    """Row positions and per-trainer counts for every day of one month"""
+
+    def __init__(self, df, year, month):
+        _, days_in_month = calendar.monthrange(year, month)
+        positions, days = event_model.day_spans(df, date(year, month, 1), date(year, month, days_in_month))
+        trainers = df["Trainer Calendar"].to_numpy()[positions]
+        keys = pd.DataFrame({"day": days.date, "trainer": trainers})
+
+        self._positions = np.unique(positions)
+        self._day_positions = positions
+        self._day_trainers = trainers
+        self._rows = {day: positions[idx] for day, idx in keys.groupby("day").indices.items()}
+        self._rows_by_trainer = {key: positions[idx]
+                                 for key, idx in keys.groupby(["day", "trainer"], dropna=False).indices.items()}
+        self._trainer_counts = defaultdict(dict)
+        for (day, trainer), pos in self._rows_by_trainer.items():
+            self._trainer_counts[day][trainer] = len(pos)
+
+    def positions(self, trainer=None):
+        """Row positions (for df.iloc) of the events that fall in the month"""
+        if trainer is None:
+            return self._positions
+        return np.unique(self._day_positions[self._day_trainers == trainer])
+
+    def day_positions(self, day, trainer=None):
+        """Row positions of the events on day"""
+        empty = np.empty(0, dtype=np.intp)
+        if trainer is None:
+            return self._rows.get(day, empty)
+        return self._rows_by_trainer.get((day, trainer), empty)
+
+    def count(self, day, trainer=None):
+        """Number of events on day, optionally for one trainer"""
+        return len(self.day_positions(day, trainer))
+
+    def trainer_counts(self, day):
+        """{trainer: number of events} for day"""
+        return self._trainer_counts.get(day, {})
+
+
+def get_month_index(df, version, year, month):
+    """Return the MonthIndex for one month of df, reusing the one built for the same data version"""
+    return _month_indexes.get(version, lambda: MonthIndex(df, year, month), (year, month))
+
+
+# ---------- Month grid ----------
+# The whole month is rendered as one HTML block, cached per (data version,
+# month, trainer), so reruns and switching back to a month cost one lookup.
+_grids = VersionCache()
+
+DAYS_OF_WEEK = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def _day_cell(day, count, color_bars="", background="#f9f9f9"):
+    if count == 0:
+        return ("<div style='border: 1px solid #ddd; border-radius: 5px; padding: 5px; height: 100px; background-color: #fff;'>"
+                f"<div style='text-align: center; font-weight: bold; font-size: 18px; color: #999;'>{day}</div></div>")
+    return (f"<div style='border: 2px solid #333; border-radius: 5px; padding: 5px; height: 100px; background-color: {background};'>"
+            f"<div style='text-align: center; font-weight: bold; font-size: 18px; color: #000;'>{day}</div>"
+            f"{color_bars}"
+            f"<div style='text-align: center; font-size: 12px; margin-top: 5px; color: #000;'>{count} event(s)</div></div>")
+
+
+def render_month(df, version, year, month, colors, trainer=None):
+    """Return the month grid as HTML: one cell per day with its event count.
+
+    colors maps each trainer to their colour, in legend order. Busy days show
+    a bar per trainer; with trainer, only that trainer's events are counted
+    and busy days take their colour.
+    """
+    return _grids.get(version, lambda: _month_grid(df, version, year, month, colors, trainer),
+                      (year, month, trainer, tuple(colors.items())))
+
+
+def _month_grid(df, version, year, month, colors, trainer):
+    index = get_month_index(df, version, year, month)
+    cells = [f"<div style='text-align: center; font-weight: bold; padding: 5px;'>{name}</div>"
+             for name in DAYS_OF_WEEK]
+    for week in calendar.monthcalendar(year, month):
+        for day in week:
+            if day == 0:
+                cells.append("<div style='height: 100px; border: 1px solid #ddd; border-radius: 5px;'></div>")
+                continue
+            day_date = date(year, month, day)
+            if trainer is not None:
+                cells.append(_day_cell(day, index.count(day_date, trainer), background=colors.get(trainer, "#f9f9f9")))
+                continue
+            trainer_counts = index.trainer_counts(day_date)
+            color_bars = "".join(f"<div style='background-color: {color}; height: 8px; margin: 2px 0;'></div>"
+                                 for name, color in colors.items() if name in trainer_counts)
+            cells.append(_day_cell(day, index.count(day_date), color_bars))
+    return ("<div style='display: grid; grid-template-columns: repeat(7, 1fr); gap: 8px;'>"
+            + "".join(cells) + "</div>")
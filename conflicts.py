@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+
+import event_model
+from version_cache import VersionCache
+
+# A trainer is double-booked when two events with these statuses overlap.
+# Offered and Tentative events are provisional and may overlap freely.
+FIRM_STATUSES = ["Confirmed", "Blocked"]
+
+# Fields whose change can create or resolve a double booking
+BOOKING_FIELDS = {"Date", "End Date", "Trainer Calendar", "Status"}
+
+# ---------- Booking index ----------
+# Per trainer, the firm bookings sorted by start date, plus the longest
+# booking. Events overlapping [start, end] must start within
+# [start - longest, end], which two binary searches find without scanning.
+_booking_indexes = VersionCache()
+_reports = VersionCache()
+
+
+def _firm(df):
+    """Label, trainer, first and last day of the firm bookings in df"""
+    firm = df[df["Status"].isin(FIRM_STATUSES).to_numpy() & df["Trainer Calendar"].notna().to_numpy()]
+    return pd.DataFrame({
+        "label": firm.index,
+        "trainer": firm["Trainer Calendar"].astype(object).to_numpy(),
+        "start": pd.to_datetime(firm["Date"], errors="coerce").dt.normalize().to_numpy(),
+        "end": event_model.end_dates(firm).dt.normalize().to_numpy(),
+    }).dropna(subset=["start"])
+
+
+class BookingIndex:
+    """Firm bookings per trainer, sorted by start date"""
+
+    def __init__(self, df):
+        self._trainers = {}
+        for trainer, rows in _firm(df).groupby("trainer", sort=False):
+            rows = rows.sort_values("start", kind="stable")
+            longest = (rows["end"] - rows["start"]).max()
+            self._trainers[trainer] = (rows["start"].to_numpy(), rows["end"].to_numpy(),
+                                       rows["label"].to_numpy(), longest)
+
+    def overlapping(self, bookings):
+        """Stored bookings overlapping any of bookings (a frame like _firm's).
+
+        Returns (positions in bookings, labels, starts, ends), one entry per
+        overlapping pair.
+        """
+        positions, labels, starts, ends = [], [], [], []
+        for trainer, block in bookings.groupby("trainer", sort=False).indices.items():
+            if trainer not in self._trainers:
+                continue
+            stored_starts, stored_ends, stored_labels, longest = self._trainers[trainer]
+            query_starts = bookings["start"].to_numpy()[block]
+            query_ends = bookings["end"].to_numpy()[block]
+            lo = np.searchsorted(stored_starts, query_starts - longest, side="left")
+            hi = np.searchsorted(stored_starts, query_ends, side="right")
+            counts = hi - lo
+            query = np.repeat(np.arange(len(block)), counts)
+            candidate = np.repeat(lo, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            hits = stored_ends[candidate] >= query_starts[query]
+            query, candidate = query[hits], candidate[hits]
+            positions.append(block[query])
+            labels.append(stored_labels[candidate])
+            starts.append(stored_starts[candidate])
+            ends.append(stored_ends[candidate])
+        if not positions:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=object), np.empty(0, "M8[ns]"), np.empty(0, "M8[ns]")
+        return np.concatenate(positions), np.concatenate(labels), np.concatenate(starts), np.concatenate(ends)
+
+
+def get_booking_index(df, version):
+    """Return the BookingIndex for df, reusing the one built for the same data version"""
+    return _booking_indexes.get(version, lambda: BookingIndex(df))
+
+
+def _overlapping_pairs(bookings):
+    """Position pairs (i, j), i < j, of overlapping bookings of the same trainer.
+
+    bookings must be sorted by trainer, then start. Within a trainer, a
+    booking overlaps every later one that starts on or before its end.
+    """
+    all_starts = bookings["start"].to_numpy()
+    all_ends = bookings["end"].to_numpy()
+    left, right = [np.empty(0, dtype=np.intp)], [np.empty(0, dtype=np.intp)]
+    for block in bookings.groupby("trainer", sort=False).indices.values():
+        starts, ends = all_starts[block], all_ends[block]
+        stop = np.searchsorted(starts, ends, side="right")
+        counts = np.maximum(stop - np.arange(len(block)) - 1, 0)
+        first = np.repeat(np.arange(len(block)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        left.append(block[first])
+        right.append(block[first + 1 + offsets])
+    return np.concatenate(left), np.concatenate(right)
+
+
+def _clashes(first, second_starts, second_ends, first_titles, second_titles):
+    """Report rows for bookings first (rows of a _firm frame) overlapping the second ones"""
+    return pd.DataFrame({
+        "Trainer": first["trainer"].to_numpy(),
+        "From": np.maximum(first["start"].to_numpy(), second_starts),
+        "To": np.minimum(first["end"].to_numpy(), second_ends),
+        "Event": first_titles,
+        "Clashes With": second_titles,
+    })
+
+
+def conflict_report(df, version):
+    """Every pair of overlapping firm bookings of the same trainer in df, earliest first"""
+    return _reports.get(version, lambda: _conflict_report(df))
+
+
+def _conflict_report(df):
+    bookings = _firm(df).sort_values(["trainer", "start"], kind="stable").reset_index(drop=True)
+    first, second = _overlapping_pairs(bookings)
+    a, b = bookings.iloc[first], bookings.iloc[second]
+    titles = df["Title"]
+    report = _clashes(a, b["start"].to_numpy(), b["end"].to_numpy(),
+                      titles.loc[a["label"]].to_numpy(), titles.loc[b["label"]].to_numpy())
+    return report.sort_values(["From", "Trainer"], kind="stable").reset_index(drop=True)
+
+
+def find_conflicts(df, version, inserts=None, updates=None, deletes=None):
+    """Double bookings a change (as passed to event_store.write_changes) would create.
+
+    updates and deletes are keyed by Event ID. Returns a DataFrame with one
+    row per clash, empty when there are none. Updates that touch none of
+    BOOKING_FIELDS are not checked, so unrelated edits are not held up by
+    clashes that already exist.
+    """
+    updates = updates or {}
+    moved = [event_id for event_id, fields in updates.items() if BOOKING_FIELDS & set(fields)]
+    parts = []
+    if moved:
+        parts.append(event_model.with_updates(df, moved, updates))
+    if inserts is not None and len(inserts) > 0:
+        parts.append(inserts.set_axis([None] * len(inserts)))
+    if not parts:
+        return pd.DataFrame(columns=["Trainer", "From", "To", "Event", "Clashes With"])
+    proposed = pd.concat(parts)
+    titles = proposed["Title"].astype(object).to_numpy()
+    bookings = _firm(proposed.set_axis(range(len(proposed))))
+    bookings = bookings.sort_values(["trainer", "start"], kind="stable").reset_index(drop=True)
+
+    # Against the stored bookings, leaving out the old versions of the rows
+    # being moved and deleted; rows updated otherwise keep their booking
+    positions, labels, starts, ends = get_booking_index(df, version).overlapping(bookings)
+    kept = ~df[event_model.ID_COLUMN].loc[labels].isin(list(set(moved) | set(deletes or []))).to_numpy()
+    positions, labels, starts, ends = positions[kept], labels[kept], starts[kept], ends[kept]
+    against_stored = _clashes(bookings.iloc[positions], starts, ends,
+                              titles[bookings["label"].to_numpy()[positions]], df["Title"].loc[labels].to_numpy())
+
+    # Among the new and changed rows themselves
+    first, second = _overlapping_pairs(bookings)
+    a, b = bookings.iloc[first], bookings.iloc[second]
+    among_proposed = _clashes(a, b["start"].to_numpy(), b["end"].to_numpy(),
+                              titles[a["label"].to_numpy()], titles[b["label"].to_numpy()])
+    return pd.concat([against_stored, among_proposed], ignore_index=True)
@@ -0,0 +1,360 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# ---------- Schema ----------
+COLUMNS = [
+    "Title", "Date", "End Date", "Type", "Status", "Source",
+    "Client", "Course/Description", "Trainer Calendar", "Medium", "Location",
+    "Billing", "Invoiced", "Notes", "Date Modified", "Action Type", "Modified By", "Event ID"
+]
+DATE_COLUMNS = ("Date", "End Date")
+
+# Assigned when an event is created and never changed; the audit log
+# (see audit.py) follows events by it
+ID_COLUMN = "Event ID"
+
+# Layout of workbooks exported for (and imported from) other tools: one row
+# per day, without End Date
+DAILY_COLUMNS = [col for col in COLUMNS if col not in ("End Date", ID_COLUMN)]
+
+TYPES = ["W", "C", "M"]
+STATUSES = ["Offered", "Tentative", "Confirmed", "Blocked"]
+SOURCES = ["EQS", "CCE", "CTD"]
+TRAINERS = ["Dom", "Andrew", "Dale", "Jack"]
+MEDIUMS = ["F2F", "Online"]
+LOCATIONS = ["Syd", "Mel", "Bne", "SG", "Msia", "Global"]
+INVOICED = ["No", "Yes"]
+
+# Columns restricted to a fixed vocabulary; they are loaded as categoricals
+VOCABULARIES = {
+    "Type": TYPES,
+    "Status": STATUSES,
+    "Source": SOURCES,
+    "Trainer Calendar": TRAINERS,
+    "Medium": MEDIUMS,
+    "Location": LOCATIONS,
+    "Invoiced": INVOICED,
+}
+
+
+def apply_schema(df):
+    """Return a copy of df with the vocabulary columns as categoricals.
+
+    The other columns share df's data. Values outside a column's vocabulary
+    are kept as extra categories and listed in df.attrs["unknown_values"]
+    as {column: [values]}.
+    """
+    df = df.copy(deep=False)
+    unknown = {}
+    for col, vocabulary in VOCABULARIES.items():
+        if col not in df.columns:
+            continue
+        values = df[col].astype(object)
+        extra = sorted({str(v) for v in values.dropna().unique()} - set(vocabulary))
+        if extra:
+            unknown[col] = extra
+        df[col] = pd.Categorical(values.where(values.isna(), values.astype(str)), categories=vocabulary + extra)
+    df.attrs["unknown_values"] = unknown
+    return df
+
+
+
+def new_ids(count):
+    """count new random event IDs (32 hex digits)"""
+    digits = os.urandom(16 * count).hex()
+    return [digits[i:i + 32] for i in range(0, 32 * count, 32)]
+
+
+def with_ids(df):
+    """df with an Event ID for every row that has none"""
+    ids = df[ID_COLUMN] if ID_COLUMN in df.columns else pd.Series(np.nan, index=df.index, dtype=object)
+    missing = ids.isna().to_numpy()
+    if not missing.any():
+        return df
+    ids = ids.astype(object).copy()
+    ids[missing] = new_ids(int(missing.sum()))
+    return df.assign(**{ID_COLUMN: ids})
+
+
+def validate_events(df):
+    """Why each row of df cannot be saved, as "; "-joined messages ("" for rows that are fine).
+
+    Every VOCABULARIES column is required, as on the New Event form.
+    """
+    start = pd.to_datetime(df["Date"], errors="coerce") if "Date" in df.columns else pd.Series(pd.NaT, index=df.index)
+    end = pd.to_datetime(df["End Date"], errors="coerce").fillna(start) if "End Date" in df.columns else start
+    checks = [
+        pd.Series(np.where(start.isna(), "Date is missing or not a date", ""), index=df.index),
+        pd.Series(np.where(end < start, "End Date cannot be before Start Date", ""), index=df.index),
+    ]
+    for col, vocabulary in VOCABULARIES.items():
+        values = df[col].astype(object) if col in df.columns else pd.Series(np.nan, index=df.index, dtype=object)
+        missing = values.isna()
+        bad = ~missing & ~values.isin(vocabulary)
+        message = pd.Series(np.where(missing, f"{col} is missing", ""), index=df.index, dtype=object)
+        if bad.any():
+            message[bad] = f"{col} '" + values[bad].astype(str) + f"' is not one of {', '.join(vocabulary)}"
+        checks.append(message)
+    problems = checks[0]
+    for check in checks[1:]:
+        if (check != "").any():
+            problems = problems + np.where((problems != "") & (check != ""), "; ", "") + check
+    return problems
+
+
+# ---------- Titles ----------
+def _text(value):
+    """value as a title shows it; missing values are left blank"""
+    return "" if pd.isna(value) else str(value)
+
+
+def generate_title(row):
+    row = {col: _text(value) for col, value in row.items()}
+    base = f"{row['Status']}-{row['Source']}-{row['Client']} {row['Course/Description']}"
+    if row["Type"] == "W":
+        base += f" ({row['Medium']}) {row['Trainer Calendar']} {row['Location']}"
+    elif row["Type"] == "M":
+        base += f" {row['Trainer Calendar']} {row['Location']}"
+    else:
+        base += f" {row['Trainer Calendar']}"
+    return base.strip()
+
+
+def _as_text(df, column):
+    """Column values formatted as _text formats them"""
+    values = df[column].to_numpy(dtype=object)
+    missing = pd.isna(values)
+    if missing.any():
+        values = values.copy()
+        values[missing] = ""
+    return pd.Series(values.astype(str), index=df.index, dtype=object)
+
+
+def generate_titles(df):
+    """generate_title() for every row of df at once, using column-wise string operations"""
+    if len(df) == 0:
+        return pd.Series([], index=df.index, dtype=object)
+    trainer = _as_text(df, "Trainer Calendar")
+    location = _as_text(df, "Location")
+    base = (_as_text(df, "Status") + "-" + _as_text(df, "Source") + "-"
+            + _as_text(df, "Client") + " " + _as_text(df, "Course/Description"))
+    workshop = base + " (" + _as_text(df, "Medium") + ") " + trainer + " " + location
+    meeting = base + " " + trainer + " " + location
+    other = base + " " + trainer
+
+    type_ = df["Type"].to_numpy(dtype=object)
+    titles = np.where(type_ == "W", workshop, np.where(type_ == "M", meeting, other))
+    return pd.Series(titles, index=df.index, dtype=object).str.strip()
+
+
+# ---------- Multi-day events ----------
+# Each row is one event running from "Date" to "End Date" inclusive. Views
+# that work per day (calendar cells, date filters, exports) expand only the
+# window they show.
+def end_dates(df):
+    """End Date of every row, falling back to Date for single-day rows"""
+    dates = pd.to_datetime(df["Date"], errors="coerce")
+    if "End Date" not in df.columns:
+        return dates
+    return pd.to_datetime(df["End Date"], errors="coerce").fillna(dates)
+
+
+def day_spans(df, start=None, end=None):
+    """(row positions, days): one entry for every day each row covers within [start, end]"""
+    first = pd.to_datetime(df["Date"], errors="coerce").dt.normalize()
+    last = end_dates(df).dt.normalize()
+    if start is not None:
+        first = first.clip(lower=pd.Timestamp(start))
+    if end is not None:
+        last = last.clip(upper=pd.Timestamp(end))
+    lengths = np.maximum((last - first).dt.days.fillna(-1).to_numpy(dtype=np.int64) + 1, 0)
+    positions = np.repeat(np.arange(len(df)), lengths)
+    offsets = np.arange(len(positions)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    days = first.to_numpy()[positions] + offsets.astype("timedelta64[D]")
+    return positions, pd.DatetimeIndex(days)
+
+
+def expand_days(df, start=None, end=None):
+    """One row per day of every event within [start, end], labelled with the event's index"""
+    positions, days = day_spans(df, start, end)
+    expanded = df.iloc[positions].copy()
+    expanded["Date"] = days
+    if "End Date" in expanded.columns:
+        expanded["End Date"] = days
+    return expanded
+
+
+def overlaps(df, start=None, end=None):
+    """Boolean mask of the rows whose dates overlap [start, end]"""
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= end_dates(df).dt.normalize() >= pd.Timestamp(start)
+    if end is not None:
+        mask &= pd.to_datetime(df["Date"], errors="coerce").dt.normalize() <= pd.Timestamp(end)
+    return mask
+
+
+def coalesce_days(df):
+    """Merge runs of rows that are identical apart from falling on consecutive days.
+
+    This turns the one-row-per-day layout into one row per event, which keeps
+    the Event ID of its first row. The result is renumbered from 0 in the
+    order of each event's first row.
+    """
+    if len(df) == 0:
+        return df
+    daily = expand_days(df).reset_index(drop=True)
+    if "End Date" not in daily.columns:
+        daily["End Date"] = daily["Date"]
+    fields = [col for col in daily.columns if col not in ("Date", "End Date", ID_COLUMN)]
+    key = pd.util.hash_pandas_object(daily[fields].astype(object), index=False).to_numpy()
+    day = daily["Date"].to_numpy()
+
+    # Identical events booked more than once over the same days form one run
+    # per copy: the n-th copy of a day continues the n-th copy of the day before
+    copy = daily.groupby([key, day]).cumcount().to_numpy()
+    order = np.lexsort((day, copy, key))
+    key, copy, day = key[order], copy[order], day[order]
+    new_run = np.ones(len(order), dtype=bool)
+    new_run[1:] = (key[1:] != key[:-1]) | (copy[1:] != copy[:-1]) | (day[1:] != day[:-1] + np.timedelta64(1, "D"))
+    run = np.cumsum(new_run)
+
+    first = order[new_run]
+    merged = daily.iloc[first].copy()
+    merged["End Date"] = pd.Series(day).groupby(run).max().to_numpy()
+    merged = merged.iloc[np.argsort(first, kind="stable")]
+    return merged.reset_index(drop=True)
+
+
+def span_label(start, end, fmt):
+    """start formatted with fmt, plus the end date when the event spans several days"""
+    if pd.isna(end) or pd.Timestamp(end).normalize() == pd.Timestamp(start).normalize():
+        return start.strftime(fmt)
+    return f"{start.strftime(fmt)} – {end.strftime(fmt)}"
+
+
+# ---------- Batched changes ----------
+# Add, bulk edit, duplicate and delete are described as a list of operations
+# and turned into the inserts/updates/deletes of a single
+# event_store.write_changes call. Every operation is worked out column-wise over all of its rows.
+# Events are referred to by Event ID, which stays with an event however the
+# store numbers its rows.
+def insert(rows, action="Created"):
+    """Operation adding rows (a DataFrame in the events layout) as new events"""
+    return {"op": "insert", "rows": rows, "action": action}
+
+
+def set_fields(ids, fields, action="Bulk Modified"):
+    """Operation setting the same field values on every event with the given Event IDs"""
+    return {"op": "set", "ids": list(ids), "fields": dict(fields), "action": action}
+
+
+def _blank(value):
+    return value is None or (np.ndim(value) == 0 and pd.isna(value)) or (isinstance(value, str) and value == "")
+
+
+def changed_fields(event, fields):
+    """The entries of fields whose value differs from the event's (a row), a blank matching a blank"""
+    changed = {}
+    for field, value in fields.items():
+        old = event.get(field)
+        if _blank(old) and _blank(value):
+            continue
+        if _blank(old) or _blank(value) or old != value:
+            changed[field] = value
+    return changed
+
+
+def duplicate(ids, dates=None, start=None, end=None, action="Duplicated"):
+    """Operation copying the events with the given Event IDs.
+
+    With dates, every event is copied to start on every date, keeping its
+    length; with start and end, every event is copied once to span them.
+    """
+    return {"op": "duplicate", "ids": list(ids), "dates": None if dates is None else list(dates),
+            "start": start, "end": end, "action": action}
+
+
+def delete(ids):
+    """Operation removing the events with the given Event IDs"""
+    return {"op": "delete", "ids": list(ids)}
+
+
+def _stamp(rows, action, user, now):
+    return rows.assign(**{"Date Modified": now, "Action Type": action, "Modified By": user})
+
+
+def rows_by_id(df, ids):
+    """The rows of df with the given Event IDs, in the same order and indexed by them; IDs not in df are skipped"""
+    positions = pd.Index(df[ID_COLUMN].astype(object).to_numpy()).get_indexer(list(ids))
+    rows = df.iloc[positions[positions >= 0]]
+    return rows.set_axis(rows[ID_COLUMN].astype(object).to_numpy())
+
+
+def with_updates(df, ids, updates):
+    """rows_by_id(df, ids) with the updates planned so far ({Event ID: fields}) applied"""
+    rows = rows_by_id(df, ids)
+    touched = [event_id for event_id in rows.index if event_id in updates]
+    if touched:
+        rows = rows.astype(object)
+        for event_id in touched:
+            for field, value in updates[event_id].items():
+                rows.at[event_id, field] = value
+    return rows
+
+
+def plan_changes(df, operations, user, now=None):
+    """Return (inserts, updates, deletes) applying operations to df in one write.
+
+    Operations apply in order, each seeing the changes made by the ones
+    before it; deleted events are not updated. Changed and new rows are
+    stamped with the time, action and user, and their titles regenerated;
+    new rows get new Event IDs. updates and deletes are keyed by Event ID,
+    as event_store.write_changes takes them.
+    """
+    now = now or datetime.now().strftime("%Y-%m-%d %H:%M")
+    inserts, updates, deletes = [], {}, []
+    for operation in operations:
+        ids = operation.get("ids")
+        if len(operation["rows"] if ids is None else ids) == 0:
+            continue
+        if operation["op"] == "insert":
+            rows = _stamp(operation["rows"].reset_index(drop=True), operation["action"], user, now)
+            rows["Title"] = generate_titles(rows)
+            rows[ID_COLUMN] = new_ids(len(rows))
+            inserts.append(rows)
+        elif operation["op"] == "delete":
+            deletes.extend(ids)
+        elif operation["op"] == "set":
+            fields = {key: value for key, value in operation["fields"].items() if key not in ("Title", ID_COLUMN)}
+            changed = _stamp(with_updates(df, ids, updates).assign(**fields), operation["action"], user, now)
+            changed["Title"] = generate_titles(changed)
+            columns = list(fields) + ["Date Modified", "Action Type", "Modified By", "Title"]
+            for event_id, values in changed[columns].to_dict("index").items():
+                updates.setdefault(event_id, {}).update(values)
+        elif operation["op"] == "duplicate":
+            originals = with_updates(df, ids, updates).reset_index(drop=True)
+            if operation["dates"] is not None:
+                # Cross join: one copy of every event for every date
+                starts = pd.DataFrame({"_start": pd.to_datetime(pd.Series(operation["dates"]))})
+                copies = originals.merge(starts, how="cross")
+                length = end_dates(copies) - pd.to_datetime(copies["Date"])
+                copies["Date"] = copies.pop("_start")
+                copies["End Date"] = copies["Date"] + length
+            else:
+                copies = originals.assign(**{"Date": pd.Timestamp(operation["start"]),
+                                             "End Date": pd.Timestamp(operation["end"])})
+            copies = _stamp(copies, operation["action"], user, now)
+            copies["Title"] = generate_titles(copies)
+            copies[ID_COLUMN] = new_ids(len(copies))
+            inserts.append(copies)
+        else:
+            raise ValueError(f"Unknown operation: {operation['op']}")
+
+    for event_id in deletes:
+        updates.pop(event_id, None)
+    inserts = pd.concat(inserts, ignore_index=True) if inserts else None
+    return inserts, updates, deletes
@@ -0,0 +1,1486 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager, nullcontext
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from filelock import FileLock, Timeout
+
+import audit
+import event_model
+import exports
+from event_model import COLUMNS, DAILY_COLUMNS, DATE_COLUMNS, ID_COLUMN
+from version_cache import VersionCache
+
+# For local development, use OneDrive path
+# For online hosting, use local file
+EXCEL_FILE = 'scheduling_recent.xlsx'  # For online hosting
+SQLITE_FILE = 'scheduling.db'
+
+# One workbook per archived year (see archive_before)
+ARCHIVE_DIR = os.environ.get("EQS_ARCHIVE_DIR", "archive")
+
+# "excel" keeps the workbook as the store; "sqlite" keeps events in SQLITE_FILE
+# and uses the workbook only for import/export
+STORAGE_BACKEND = os.environ.get("EQS_STORAGE_BACKEND", "excel")
+
+# Longest a writer waits for another process to finish before giving up
+LOCK_TIMEOUT = 10
+
+
+class StoreBusyError(Exception):
+    """Another writer held the store lock for longer than LOCK_TIMEOUT"""
+
+
+class StaleDataError(Exception):
+    """A change was based on a version of the data that has since been modified"""
+
+
+class AuditLogError(StoreBusyError):
+    """The audit log could not record a change (e.g. it stayed locked for LOCK_TIMEOUT)"""
+
+
+# ---------- Locking ----------
+# One lock per store file: a thread lock for sessions in this process plus a
+# lock file for other processes. Both waits are bounded by LOCK_TIMEOUT.
+_locks_guard = threading.Lock()
+_locks = {}
+
+
+@contextmanager
+def _store_lock(path):
+    with _locks_guard:
+        if path not in _locks:
+            _locks[path] = (threading.RLock(), FileLock(path + ".lock", thread_local=False))
+        thread_lock, file_lock = _locks[path]
+    if not thread_lock.acquire(timeout=LOCK_TIMEOUT):
+        raise StoreBusyError("The schedule is being saved by someone else. Please try again.")
+    try:
+        try:
+            file_lock.acquire(timeout=LOCK_TIMEOUT)
+        except Timeout:
+            raise StoreBusyError("The schedule is being saved by someone else. Please try again.")
+        try:
+            yield
+        finally:
+            file_lock.release()
+    finally:
+        thread_lock.release()
+
+
+# The process umask, read once: reading it means setting it, which would race
+# with other threads creating files
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _file_mode(path):
+    """Permissions for a rewrite of path: the file's own, or the umask's default for a new file"""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def _write_temp(path, write):
+    """Call write(tmp_path) on a new file beside path, given path's permissions; return tmp_path"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=os.path.splitext(path)[1], dir=directory)
+    os.close(fd)
+    try:
+        write(tmp_path)
+        # mkstemp creates the file readable by its owner only
+        os.chmod(tmp_path, _file_mode(path))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def atomic_write(path, write):
+    """Call write(tmp_path) and move the result over path in one step, keeping path's permissions"""
+    tmp_path = _write_temp(path, write)
+    try:
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _atomic_write_text(path, text):
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+    atomic_write(path, write)
+
+# ---------- Cache ----------
+# Streamlit re-executes app.py on every rerun, but imported modules stay in
+# memory, so this cache is shared by every rerun and every session of the
+# process. It is keyed on the store's identity, so an edit made outside the
+# app (e.g. in Excel) is picked up on the next load.
+#
+# The cached frame is the process's one snapshot of the table: load_data()
+# hands out shallow copies that share its columns, and Copy-on-Write makes
+# a caller that modifies its frame copy only the columns it touches. One
+# rerun at a time builds the snapshot of a new version; the others wait
+# for it rather than each reading the store.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)  # always on from pandas 3
+
+_cache_lock = threading.Lock()
+_build_lock = threading.Lock()
+_cache = {"key": None, "df": None}
+_cache_stats = {"hits": 0, "misses": 0}
+
+# Identities worked out so far, per path: (stat key, identity). Checking a
+# file that has not changed since costs one stat call instead of a re-hash.
+_identities = {}
+
+
+def _stat_key(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def _file_identity(path):
+    """Return (mtime, size, content hash) identifying the file's current contents"""
+    key = _stat_key(path)
+    cached = _identities.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    identity = (key[0], key[1], digest.hexdigest())
+    _identities[path] = (key, identity)
+    return identity
+
+
+def invalidate_cache():
+    """Drop the cached DataFrame so the next load re-reads the store"""
+    with _cache_lock:
+        _cache["key"] = None
+        _cache["df"] = None
+
+
+def forget_store():
+    """Forget everything this process has read from the store, as a fresh process would start.
+
+    Beyond invalidate_cache(), this drops the parsed snapshots, the journal
+    replayed so far and the file hashes, so the next load reads the files
+    again. Used to time cold loads.
+    """
+    invalidate_cache()
+    with _replay_guard:
+        _replay_state.clear()
+    _identities.clear()
+
+
+def cache_stats():
+    """Return the cache hit/miss counters"""
+    with _cache_lock:
+        return dict(_cache_stats)
+
+
+# ---------- Helpers ----------
+def empty_frame():
+    """Return an empty events DataFrame with the standard columns"""
+    return pd.DataFrame(columns=COLUMNS)
+
+
+def title_first(df):
+    """Reorder columns to put Title first"""
+    cols = df.columns.tolist()
+    if "Title" in cols:
+        cols.remove("Title")
+        cols = ["Title"] + cols
+        df = df[cols]
+    return df
+
+
+def normalize(df):
+    """Bring a freshly read sheet to the standard columns and dtypes"""
+    # Remove Start Time, End Time, All Day columns if they exist
+    columns_to_drop = ['Start Time', 'End Time', 'All Day']
+    df = df.drop(columns=[col for col in columns_to_drop if col in df.columns], errors='ignore')
+
+    # Add Modified By column if it doesn't exist
+    if 'Modified By' not in df.columns:
+        df['Modified By'] = ''
+
+    # Rows saved before Event IDs get theirs when loaded (see load_data)
+    if ID_COLUMN not in df.columns:
+        df[ID_COLUMN] = np.nan
+
+    # Ensure Date column is datetime
+    if len(df) > 0 and 'Date' in df.columns:
+        df["Date"] = pd.to_datetime(df["Date"])
+
+    # Rows saved before multi-day events (or left blank) last a single day
+    if 'Date' in df.columns:
+        df["End Date"] = event_model.end_dates(df) if len(df) > 0 else df["Date"]
+
+    # Everything else is text: keep it as strings with NaN for empty cells, so
+    # an all-empty column (which would otherwise load as float) still accepts
+    # string values and every read path yields the same frame
+    for col in df.columns:
+        if col not in DATE_COLUMNS:
+            values = df[col].astype(object)
+            df[col] = values.astype(str).where(values.notna(), np.nan).replace('', np.nan)
+
+    return title_first(df)
+
+
+def _read_workbook(path):
+    return normalize(pd.read_excel(path, engine='openpyxl'))
+
+
+# ---------- Columnar sidecar ----------
+# openpyxl reads the workbook cell by cell, which dominates cold starts. The
+# parsed snapshot is kept next to it as Parquet, tagged with the workbook's
+# size and content hash, and read instead whenever that still matches. Any
+# change to the workbook (including one saved from Excel) makes it stale.
+def _sidecar_path(path):
+    return os.path.splitext(path)[0] + ".parquet"
+
+
+def _sidecar_tag(path):
+    """{"size", "hash"} of the workbook the sidecar was written for ({} when there is none)"""
+    try:
+        metadata = pq.read_schema(_sidecar_path(path)).metadata or {}
+    except (OSError, pa.ArrowException):
+        return {}
+    return json.loads(metadata.get(b"eqs_workbook", b"{}"))
+
+
+def _read_sidecar(path, workbook_key):
+    tag = _sidecar_tag(path)
+    if tag.get("size") != workbook_key[1] or tag.get("hash") != workbook_key[2]:
+        return None
+    return normalize(pd.read_parquet(_sidecar_path(path)))
+
+
+def _write_parquet(df, path, workbook_size, workbook_hash):
+    """Write df to path as the sidecar of the workbook with the given size and hash"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tag = json.dumps({"size": workbook_size, "hash": workbook_hash})
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"eqs_workbook": tag.encode()})
+    pq.write_table(table, path)
+
+
+def _write_sidecar(df, path, workbook_key):
+    try:
+        atomic_write(_sidecar_path(path), lambda tmp_path: _write_parquet(df, tmp_path, workbook_key[1], workbook_key[2]))
+    except OSError:
+        pass  # the sidecar is only a cache; the workbook stays authoritative
+
+
+def _load_workbook(path, workbook_key):
+    """Read the workbook through its sidecar, rebuilding the sidecar when stale"""
+    df = _read_sidecar(path, workbook_key)
+    if df is None:
+        df = _read_workbook(path)
+        _write_sidecar(df, path, workbook_key)
+    return df
+
+
+def _write_workbook(df, path):
+    # Streamed row by row: DataFrame.to_excel builds the whole sheet in memory
+    # first, about 680 MB per 100k events
+    df = title_first(df)
+    atomic_write(path, lambda tmp_path: exports.write_xlsx(df, tmp_path))
+
+
+def _as_frame(rows):
+    """Accept a DataFrame, a list of dicts or a list of Series"""
+    if isinstance(rows, pd.DataFrame):
+        return rows
+    return pd.DataFrame(list(rows))
+
+
+# ---------- Excel backend ----------
+# Writes append one delta record per operation to a journal next to the
+# workbook instead of rewriting the sheet. Loads replay the journal over the
+# last compacted snapshot, and compact() folds it back into the workbook.
+#
+# The journal starts with a header naming the snapshot's version and content
+# hash. Every entry carries the version it creates, so a change based on an
+# older version can be checked against the rows touched since.
+#
+# Besides growing past JOURNAL_COMPACT_BYTES, a journal is compacted once no
+# write has come for COMPACT_IDLE_SECONDS (None to never), so the workbook
+# that people may open in Excel is seldom behind the app.
+JOURNAL_COMPACT_BYTES = 256 * 1024
+COMPACT_IDLE_SECONDS = 60
+
+# Parsed snapshot plus the journal replayed so far, per workbook path
+_replay_state = {}
+_replay_guard = threading.Lock()
+_compacting = threading.Lock()
+
+# Pending idle compaction, per workbook path
+_idle_timers = {}
+_idle_guard = threading.Lock()
+
+
+def _json_value(value):
+    """Convert a DataFrame cell to something json can store"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def _record(fields):
+    return {str(k): _json_value(v) for k, v in fields.items()}
+
+
+def _records(frame):
+    """_record() of every row of frame, converting column by column"""
+    columns = []
+    for col in frame.columns:
+        values = frame[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            text = np.datetime_as_string(values.to_numpy(dtype="datetime64[s]"), unit="s")
+            columns.append(np.where(values.isna().to_numpy(), None, text).tolist())
+        else:
+            values = values.astype(object)
+            columns.append(values.where(values.notna(), None).tolist())
+    names = [str(col) for col in frame.columns]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def _apply_entry(df, entry, next_label):
+    """Apply one journal entry to df in place where possible; return (df, next_label)"""
+    # Rows given the same set of fields (e.g. one bulk edit) are assigned column by column
+    groups = {}
+    for idx, fields in entry.get("updates", {}).items():
+        if int(idx) in df.index:
+            groups.setdefault(tuple(fields), {})[int(idx)] = fields
+    for columns, rows in groups.items():
+        changes = pd.DataFrame.from_dict(rows, orient="index", columns=list(columns))
+        for field in columns:
+            values = changes[field]
+            if field in DATE_COLUMNS:
+                values = pd.to_datetime(values)
+            df.loc[changes.index, field] = values
+    deletes = entry.get("deletes", [])
+    if deletes:
+        df = df.drop([int(i) for i in deletes], errors='ignore')
+    inserts = entry.get("inserts", [])
+    if inserts:
+        new_rows = pd.DataFrame(inserts)
+        for col in DATE_COLUMNS:
+            if col in new_rows.columns:
+                new_rows[col] = pd.to_datetime(new_rows[col])
+        new_rows.index = range(next_label, next_label + len(new_rows))
+        next_label += len(new_rows)
+        df = pd.concat([df, new_rows])
+    return df, next_label
+
+
+def _touched_ids(df, labels):
+    """Event IDs of the rows of df under labels (those still there)"""
+    return df.loc[df.index.intersection(labels), ID_COLUMN].dropna().tolist()
+
+
+def _check_base_version(state, base_version, ids, found):
+    """Raise StaleDataError unless a change to the events with Event IDs ids, based on base_version, can be merged.
+
+    state["history"] lists (version, Event IDs touched) for every change after
+    state["oldest"]. Changes to events nobody else has touched since
+    base_version are merged; found holds the IDs still there. History is
+    kept by Event ID, so it still holds after a compaction renumbers the rows.
+    """
+    if base_version is None or base_version == state["version"]:
+        return
+    if base_version < state["oldest"] or base_version > state["version"]:
+        raise StaleDataError("The schedule was reorganised after you loaded it.")
+    touched = set()
+    for version, changed in state["history"]:
+        if version > base_version:
+            touched.update(changed)
+    found = set(found)
+    clashes = len(set(ids) - found) + len(touched & found)
+    if clashes:
+        raise StaleDataError(f"{clashes} of the selected event(s) were changed by someone else after you loaded them.")
+
+
+def _relabel_entry(entry, labels):
+    """entry with the labels it updates and deletes looked up in labels (old -> new, None for gone)"""
+    entry = dict(entry)
+    if "updates" in entry:
+        updates = ((labels(int(idx)), fields) for idx, fields in entry["updates"].items())
+        entry["updates"] = {str(label): fields for label, fields in updates if label is not None}
+    if "deletes" in entry:
+        entry["deletes"] = [label for label in map(labels, map(int, entry["deletes"])) if label is not None]
+    return entry
+
+
+class ExcelBackend:
+    """Events stored in the workbook plus an append-only journal of changes"""
+
+    def __init__(self, path):
+        self.path = path
+        self.journal = os.path.splitext(path)[0] + ".journal.jsonl"
+        self.audit_path = os.path.splitext(path)[0] + ".audit.db"
+
+    def _journal_size(self):
+        try:
+            return os.path.getsize(self.journal)
+        except FileNotFoundError:
+            return 0
+
+    def _journal_lines(self):
+        try:
+            with open(self.journal, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        return [line for line in data[:data.rfind(b"\n") + 1].splitlines() if line.strip()]
+
+    def _start_journal(self, snapshot_version, workbook_hash, entries=()):
+        header = json.dumps({"snapshot_version": snapshot_version, "workbook": workbook_hash})
+        _atomic_write_text(self.journal, "".join([header + "\n"] + [line.decode() + "\n" for line in entries]))
+
+    def identity(self):
+        if not os.path.exists(self.path):
+            self.save(empty_frame())
+        return (_file_identity(self.path), self._journal_size())
+
+    def _orphan_prefix(self):
+        return os.path.splitext(self.journal)[0] + ".orphaned-"
+
+    def orphaned_journals(self):
+        return sorted(glob.glob(glob.escape(self._orphan_prefix()) + "*.jsonl"))
+
+    def _set_aside(self, header, entries):
+        """Move entries written against a workbook since replaced outside the app to an orphaned journal.
+
+        Each entry is given the Event IDs of the rows it updates and deletes
+        ("ids", label -> Event ID), found by replaying the entries over the old
+        snapshot, which the sidecar still holds; reapply_orphaned() looks the
+        rows up by them in the new workbook.
+        """
+        df = None
+        if _sidecar_tag(self.path).get("hash") == header.get("workbook"):
+            df = normalize(pd.read_parquet(_sidecar_path(self.path)))
+        next_label = len(df) if df is not None else 0
+        lines = [json.dumps(header)]
+        for line in entries:
+            entry = json.loads(line)
+            if df is not None:
+                labels = df.index.intersection([int(i) for i in entry.get("updates", {})] +
+                                               [int(i) for i in entry.get("deletes", [])])
+                ids = df.loc[labels, ID_COLUMN].dropna()
+                entry["ids"] = {str(label): event_id for label, event_id in ids.items()}
+                df, next_label = _apply_entry(df, entry, next_label)
+            lines.append(json.dumps(entry))
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        _atomic_write_text(f"{self._orphan_prefix()}{stamp}.jsonl", "".join(line + "\n" for line in lines))
+
+    def _read_snapshot(self, workbook_key):
+        """Read the workbook and make sure the journal belongs to it"""
+        lines = self._journal_lines()
+        header = json.loads(lines[0]) if lines else None
+        replaced = header is not None and "snapshot_version" in header and header.get("workbook") != workbook_key[2]
+        if replaced and lines[1:]:
+            # Before the sidecar is rebuilt for the new workbook
+            self._set_aside(header, lines[1:])
+        snapshot = _load_workbook(self.path, workbook_key)
+        if header is None or "snapshot_version" not in header:
+            # Journal written before versioning (or none yet): adopt it as-is
+            self._start_journal(0, workbook_key[2], lines)
+            version = 0
+        elif replaced:
+            # The workbook was replaced outside the app (e.g. saved from Excel).
+            # Pending entries refer to rows of the old sheet, so they were set
+            # aside for an admin to re-apply or discard.
+            version = header["snapshot_version"] + len(lines)
+            self._start_journal(version, workbook_key[2])
+        else:
+            version = header["snapshot_version"]
+        header_size = len(self._journal_lines()[0]) + 1
+        return {"workbook_key": workbook_key, "journal_ino": os.stat(self.journal).st_ino, "offset": header_size,
+                "df": snapshot, "next_label": len(snapshot), "version": version, "snapshot_version": version,
+                "oldest": version, "history": []}
+
+    def _read_entries(self, state):
+        """Complete journal lines written after state, or None when the journal is not state's any more"""
+        try:
+            with open(self.journal, 'rb') as f:
+                if os.fstat(f.fileno()).st_ino != state["journal_ino"]:
+                    return None
+                f.seek(state["offset"])
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        return data[:data.rfind(b"\n") + 1]
+
+    def _apply(self, state, data):
+        """state with the journal lines in data applied"""
+        if not data:
+            return state
+        df, next_label = state["df"].copy(deep=False), state["next_label"]
+        version, history = state["version"], list(state["history"])
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            version = entry.get("version", version + 1)
+            touched = _touched_ids(df, [int(i) for i in entry.get("deletes", [])])
+            df, next_label = _apply_entry(df, entry, next_label)
+            touched += _touched_ids(df, [int(i) for i in entry.get("updates", {})])
+            history.append((version, touched))
+        return dict(state, offset=state["offset"] + len(data), df=df,
+                    next_label=next_label, version=version, history=history)
+
+    def _replay(self):
+        """Bring the replay state up to date; the caller holds the store lock"""
+        workbook_key = _file_identity(self.path)
+        state = _replay_state.get(self.path)
+        data = None
+        if state is not None and state["workbook_key"] == workbook_key:
+            data = self._read_entries(state)
+        if data is None:
+            state = self._read_snapshot(workbook_key)
+            data = self._read_entries(state)
+        state = self._apply(state, data)
+        with _replay_guard:
+            _replay_state[self.path] = state
+        return state
+
+    def _catch_up(self):
+        """The replay state brought up to date without the store lock.
+
+        The journal is only ever appended to, or replaced whole, so entries
+        past the state's offset in the same file can be read while a writer
+        holds the lock. None when only a locked replay will do (no state yet,
+        or the workbook or journal was replaced since).
+        """
+        state = _replay_state.get(self.path)
+        if state is None or state["workbook_key"] != _file_identity(self.path):
+            return None
+        data = self._read_entries(state)
+        if data is None:
+            return None
+        caught_up = self._apply(state, data)
+        with _replay_guard:
+            # Unless a writer moved the state on meanwhile (e.g. a compaction swapped files in)
+            if _replay_state.get(self.path) is state:
+                _replay_state[self.path] = caught_up
+        return caught_up
+
+    def load(self):
+        state = self._catch_up()
+        if state is None:
+            with _store_lock(self.path):
+                state = self._replay()
+        df = state["df"]
+        df.attrs["version"] = state["version"]
+        return df
+
+    def save(self, df, audit=None):
+        with _store_lock(self.path):
+            if os.path.exists(self.path):
+                state = self._replay()
+                before, version = state["df"], state["version"] + 1
+            else:
+                before, version = empty_frame(), 0
+            df = normalize(title_first(df).reset_index(drop=True))
+            with audit(version, before) if audit is not None else nullcontext():
+                _write_workbook(df, self.path)
+                workbook_key = _file_identity(self.path)
+                _write_sidecar(df, self.path, workbook_key)
+                self._start_journal(version, workbook_key[2])
+                _replay_state.pop(self.path, None)
+
+    def _append(self, entry):
+        with open(self.journal, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def _after_write(self):
+        if self._journal_size() > JOURNAL_COMPACT_BYTES:
+            threading.Thread(target=self.compact, daemon=True).start()
+        else:
+            self._compact_when_idle()
+
+    def write_changes(self, inserts, updates, deletes, base_version=None, audit=None):
+        records = {event_id: _record(fields) for event_id, fields in updates.items()}
+        inserted = _records(inserts) if inserts is not None and len(inserts) > 0 else None
+        with _store_lock(self.path):
+            state = self._replay()
+            # Events are looked up by ID in the rows as they are now, so a
+            # compaction since base_version renumbering them changes nothing
+            ids = list(records) + list(deletes)
+            labels = _state_index(state).label_map(ids)
+            _check_base_version(state, base_version, ids, labels)
+            entry = {}
+            updated = {str(labels[event_id]): fields for event_id, fields in records.items() if event_id in labels}
+            if updated:
+                entry["updates"] = updated
+            deleted = [int(labels[event_id]) for event_id in deletes if event_id in labels]
+            if deleted:
+                entry["deletes"] = deleted
+            if inserted:
+                entry["inserts"] = inserted
+            if not entry:
+                return state["version"]
+            entry["version"] = state["version"] + 1
+            before = state["df"].loc[list(labels.values())]
+            with audit(entry["version"], before) if audit is not None else nullcontext():
+                self._append(entry)
+        self._after_write()
+        return entry["version"]
+
+    def give_ids(self, ids, base_version):
+        """Set Event IDs by row label ({label: Event ID}) unless the store has moved on from base_version.
+
+        Returns whether it did. Used for rows that have no ID to look them up by.
+        """
+        with _store_lock(self.path):
+            state = self._replay()
+            if state["version"] != base_version:
+                return False
+            self._append({"updates": {str(label): {ID_COLUMN: event_id} for label, event_id in ids.items()},
+                          "version": state["version"] + 1})
+        self._after_write()
+        return True
+
+    def _compact_when_idle(self):
+        """Compact COMPACT_IDLE_SECONDS after the last write"""
+        if COMPACT_IDLE_SECONDS is None:
+            return
+        timer = threading.Timer(COMPACT_IDLE_SECONDS, self.compact)
+        timer.daemon = True
+        with _idle_guard:
+            previous = _idle_timers.pop(self.path, None)
+            if previous is not None:
+                previous.cancel()
+            _idle_timers[self.path] = timer
+        timer.start()
+
+    def compact(self, wait=False):
+        """Fold the journal into the workbook; returns False if a compaction is already running.
+
+        With wait, a running compaction is waited for instead. The workbook
+        is written from a snapshot without holding the store, so loads and
+        writes carry on meanwhile; the store is locked only to swap the files
+        in and carry over the entries appended since the snapshot. Row labels
+        are renumbered, so the version moves on.
+        """
+        if not _compacting.acquire(blocking=wait):
+            return False
+        try:
+            with _store_lock(self.path):
+                snapshot = self._replay()
+            if snapshot["version"] == snapshot["snapshot_version"]:
+                return True
+            df = normalize(title_first(snapshot["df"]).reset_index(drop=True))
+            workbook = _write_temp(self.path, lambda tmp_path: exports.write_xlsx(df, tmp_path))
+            sidecar = None
+            try:
+                workbook_hash = _file_identity(workbook)[2]
+                _identities.pop(workbook, None)
+                sidecar = _write_temp(_sidecar_path(self.path),
+                                      lambda tmp_path: _write_parquet(df, tmp_path, os.path.getsize(workbook),
+                                                                      workbook_hash))
+                with _store_lock(self.path):
+                    state = self._replay()
+                    if state["journal_ino"] != snapshot["journal_ino"] or state["offset"] < snapshot["offset"]:
+                        return True  # replaced meanwhile (a save, or another process compacted)
+                    self._swap(snapshot, state, df, workbook, sidecar, workbook_hash)
+            finally:
+                for tmp_path in (workbook, sidecar):
+                    if tmp_path is not None and os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+        finally:
+            _compacting.release()
+            invalidate_cache()
+        return True
+
+    def _swap(self, snapshot, state, df, workbook, sidecar, workbook_hash):
+        """Put the compacted workbook of snapshot in place, keeping the entries written after it"""
+        # Rows of the snapshot move to their position and rows inserted since
+        # follow in order; labels of rows already gone are dropped
+        positions = dict(zip(snapshot["df"].index, range(len(snapshot["df"]))))
+        shift = len(df) - snapshot["next_label"]
+
+        def labels(old):
+            if old in positions:
+                return positions[old]
+            return old + shift if old >= snapshot["next_label"] else None
+
+        pending = [json.loads(line) for line in self._read_entries(snapshot).splitlines() if line.strip()]
+        version = state["version"] + 1
+        entries = []
+        for number, entry in enumerate(pending, start=version + 1):
+            entries.append(json.dumps(dict(_relabel_entry(entry, labels), version=number)).encode())
+        os.replace(workbook, self.path)
+        os.replace(sidecar, _sidecar_path(self.path))
+        workbook_key = _file_identity(self.path)
+        self._start_journal(version, workbook_hash, entries)
+        # The history stays valid, being kept by Event ID; the carried-over
+        # entries are listed again under their new versions
+        with _replay_guard:
+            _replay_state[self.path] = {
+                "workbook_key": workbook_key, "journal_ino": os.stat(self.journal).st_ino,
+                "offset": len(self._journal_lines()[0]) + 1, "df": df, "next_label": len(df),
+                "version": version, "snapshot_version": version, "oldest": state["oldest"],
+                "history": state["history"] + [(version, [])]}
+        self._replay()
+
+
+# ---------- SQLite backend ----------
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_value(column, value):
+    """Convert a DataFrame cell to the value stored in SQLite"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if column in DATE_COLUMNS:
+        return pd.Timestamp(value).strftime("%Y-%m-%d")
+    return str(value)
+
+
+class SqliteBackend:
+    """Events stored one per row in SQLite; writes touch only the affected rows.
+
+    The DataFrame index is the row id, so labels stay stable across saves.
+    Each row records the version that last wrote it, so a stale change is
+    merged when it touches other rows and rejected when it touches the same.
+    """
+
+    def __init__(self, path, seed_workbook=None):
+        self.path = path
+        self.seed_workbook = seed_workbook
+        self.audit_path = os.path.splitext(path)[0] + ".audit.db"
+
+    def _connect(self):
+        exists = os.path.exists(self.path)
+        # Autocommit mode, so transactions are opened explicitly with BEGIN IMMEDIATE;
+        # the timeout bounds how long a writer waits for another one
+        conn = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None)
+        cols = ", ".join(f"{_quote(c)} TEXT" for c in COLUMNS)
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, {cols},
+                                               row_version INTEGER NOT NULL DEFAULT 0);
+            CREATE INDEX IF NOT EXISTS idx_events_date ON events ("Date");
+            CREATE INDEX IF NOT EXISTS idx_events_trainer ON events ("Trainer Calendar");
+            CREATE INDEX IF NOT EXISTS idx_events_event_id ON events ("Event ID");
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+            INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+        """)
+        existing = [row[1] for row in conn.execute("PRAGMA table_info(events)")]
+        if "row_version" not in existing:
+            conn.execute("ALTER TABLE events ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0")
+        for col in COLUMNS:
+            if col not in existing:
+                conn.execute(f"ALTER TABLE events ADD COLUMN {_quote(col)} TEXT")
+        # First run after switching backends: import the existing workbook once
+        if not exists and self.seed_workbook and os.path.exists(self.seed_workbook):
+            with self._transaction(conn):
+                self._insert(conn, _read_workbook(self.seed_workbook), self._bump_version(conn))
+        return conn
+
+    @contextmanager
+    def _transaction(self, conn):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            raise StoreBusyError("The schedule is being saved by someone else. Please try again.") from e
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _version(self, conn):
+        return conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def _bump_version(self, conn):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+        return self._version(conn)
+
+    def _insert(self, conn, df, version):
+        cols = [c for c in COLUMNS if c in df.columns]
+        sql = (f"INSERT INTO events ({', '.join(_quote(c) for c in cols)}, row_version) "
+               f"VALUES ({', '.join('?' for _ in cols)}, ?)")
+        rows = [[_sql_value(c, v) for c, v in zip(cols, values)] + [version]
+                for values in df[cols].itertuples(index=False, name=None)]
+        conn.executemany(sql, rows)
+
+    def _stat_key(self):
+        with open(self.path, 'rb') as f:
+            change_counter = f.read(28)[24:]  # bumped by every commit outside WAL mode
+        return (change_counter,) + tuple(_stat_key(path) for path in (self.path, self.path + "-wal")
+                                         if os.path.exists(path))
+
+    def identity(self):
+        # Every commit changes the database file (or its WAL), so an unchanged
+        # file means an unchanged version and no connection is needed
+        cached = _identities.get(self.path)
+        if cached is not None and os.path.exists(self.path) and cached[0] == self._stat_key():
+            return cached[1]
+        conn = self._connect()
+        try:
+            key = self._stat_key()
+            version = self._version(conn)
+        finally:
+            conn.close()
+        identity = (os.path.abspath(self.path), version)
+        _identities[self.path] = (key, identity)
+        return identity
+
+    def _rows(self, conn, labels=None):
+        """The stored rows with the given ids (all of them when None), as load() returns them"""
+        if labels is None:
+            df = pd.read_sql_query("SELECT * FROM events ORDER BY id", conn, index_col="id")
+        else:
+            labels = [int(i) for i in labels]
+            frames = [pd.read_sql_query("SELECT * FROM events WHERE 0", conn, index_col="id")]
+            for start in range(0, len(labels), 500):
+                chunk = labels[start:start + 500]
+                frames.append(pd.read_sql_query(
+                    f"SELECT * FROM events WHERE id IN ({', '.join('?' for _ in chunk)})",
+                    conn, index_col="id", params=chunk))
+            df = pd.concat(frames)
+        df = df.drop(columns=["row_version"])
+        df.index.name = None
+        if len(df) > 0:
+            df["Date"] = pd.to_datetime(df["Date"])
+            df["End Date"] = event_model.end_dates(df)
+        return title_first(df)
+
+    def load(self):
+        conn = self._connect()
+        try:
+            # One read transaction so the rows and the version agree
+            conn.execute("BEGIN")
+            df = self._rows(conn)
+            version = self._version(conn)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        df.attrs["version"] = version
+        return df
+
+    def save(self, df, audit=None):
+        conn = self._connect()
+        try:
+            # The log's transaction commits after the store's, and rolls back if it fails
+            with ExitStack() as logged, self._transaction(conn):
+                before = self._rows(conn) if audit is not None else None
+                conn.execute("DELETE FROM events")
+                version = self._bump_version(conn)
+                self._insert(conn, df, version)
+                if audit is not None:
+                    logged.enter_context(audit(version, before))
+        finally:
+            conn.close()
+
+    def compact(self, wait=False):
+        """Row-level writes need no compaction"""
+        return True
+
+    def orphaned_journals(self):
+        """Writes go straight to the database, so none are ever set aside"""
+        return []
+
+    def _lookup(self, conn, ids):
+        """{Event ID: (row id, row_version)} of the given IDs still stored"""
+        ids = list(ids)
+        rows = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows.update((event_id, (row_id, row_version)) for event_id, row_id, row_version in conn.execute(
+                f'SELECT "Event ID", id, row_version FROM events WHERE "Event ID" IN ({", ".join("?" for _ in chunk)})',
+                chunk))
+        return rows
+
+    def _check_base_version(self, conn, base_version, ids, rows):
+        current = self._version(conn)
+        if base_version is None or base_version == current:
+            return
+        if base_version > current:
+            raise StaleDataError("The schedule was reorganised after you loaded it.")
+        clashes = [event_id for event_id in ids if event_id not in rows or rows[event_id][1] > base_version]
+        if clashes:
+            raise StaleDataError(f"{len(clashes)} of the selected event(s) were changed by someone else after you loaded them.")
+
+    def write_changes(self, inserts, updates, deletes, base_version=None, audit=None):
+        conn = self._connect()
+        try:
+            with ExitStack() as logged, self._transaction(conn):
+                ids = list(updates) + list(deletes)
+                rows = self._lookup(conn, ids)
+                self._check_base_version(conn, base_version, ids, rows)
+                before = self._rows(conn, [row_id for row_id, _ in rows.values()]) if audit is not None else None
+                version = self._bump_version(conn)
+                # One statement per set of fields, executed for all rows that share it
+                groups = {}
+                for event_id, fields in updates.items():
+                    if event_id in rows:
+                        groups.setdefault(tuple(fields), []).append(
+                            [_sql_value(f, v) for f, v in fields.items()] + [version, rows[event_id][0]])
+                for columns, params in groups.items():
+                    assignments = ", ".join(f"{_quote(f)} = ?" for f in columns)
+                    conn.executemany(f"UPDATE events SET {assignments}, row_version = ? WHERE id = ?", params)
+                deleted = [(rows[event_id][0],) for event_id in deletes if event_id in rows]
+                if deleted:
+                    conn.executemany("DELETE FROM events WHERE id = ?", deleted)
+                if inserts is not None and len(inserts) > 0:
+                    self._insert(conn, inserts, version)
+                if audit is not None:
+                    # The log's transaction commits after the store's (see save)
+                    logged.enter_context(audit(version, before))
+        finally:
+            conn.close()
+        return version
+
+    def give_ids(self, ids, base_version):
+        """Set Event IDs by row id ({row id: Event ID}) unless the store has moved on from base_version"""
+        conn = self._connect()
+        try:
+            with self._transaction(conn):
+                if self._version(conn) != base_version:
+                    return False
+                version = self._bump_version(conn)
+                conn.executemany('UPDATE events SET "Event ID" = ?, row_version = ? WHERE id = ?',
+                                 [(event_id, version, int(row_id)) for row_id, event_id in ids.items()])
+        finally:
+            conn.close()
+        return True
+
+
+def _backend():
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteBackend(SQLITE_FILE, seed_workbook=EXCEL_FILE)
+    return ExcelBackend(EXCEL_FILE)
+
+
+# ---------- Audit log ----------
+# Every write also appends its changes to the audit log beside the store
+# (see audit.py), with the rows as they were before it. Backends call the
+# audit hook while still holding the store and make their write inside the
+# log transaction it opens, so the log is in write order, and a change the
+# log cannot record is not saved.
+def audit_log():
+    """The audit log of the current store"""
+    return audit.AuditLog(_backend().audit_path, timeout=LOCK_TIMEOUT)
+
+
+@contextmanager
+def _recorded(log, entries):
+    """Hold entries in an open log transaction while the write they describe is made"""
+    try:
+        conn = log.begin(entries)
+    except sqlite3.Error as e:
+        raise AuditLogError(f"The change history could not be written ({e}). Nothing was saved.") from e
+    try:
+        try:
+            yield
+        except BaseException:
+            conn.rollback()
+            raise
+        try:
+            conn.commit()
+        except sqlite3.Error as e:
+            raise AuditLogError(f"The change was saved, but its history could not be written ({e}).") from e
+    finally:
+        conn.close()
+
+
+def _audit_hook(log, inserts, updates, deletes, user, action):
+    """Callback for a backend: (version, rows before the write) -> context to make the write in.
+
+    deletes=None stands for a whole-table save, with inserts the new table:
+    events are matched by Event ID, and only those added, removed or
+    changed are logged.
+    """
+    def hook(version, before):
+        at = audit.now()
+        previous = {row[ID_COLUMN]: row for row in _records(before) if row.get(ID_COLUMN)}
+        entries = []
+
+        def deleted(row):
+            entries.append({"at": at, "user": user, "action": action or "Deleted", "change": "delete",
+                            "event_id": row[ID_COLUMN], "title": row.get("Title"), "version": version,
+                            "before": row})
+
+        def updated(row, after):
+            entries.append({"at": at, "user": user or after.get("Modified By"),
+                            "action": action or after.get("Action Type") or "Modified", "change": "update",
+                            "event_id": row[ID_COLUMN], "title": after.get("Title", row.get("Title")),
+                            "version": version, "before": {field: row.get(field) for field in after},
+                            "after": after})
+
+        def inserted(row):
+            entries.append({"at": at, "user": user or row.get("Modified By"),
+                            "action": action or row.get("Action Type") or "Created", "change": "insert",
+                            "event_id": row[ID_COLUMN], "title": row.get("Title"), "version": version,
+                            "after": row})
+
+        if deletes is None:
+            old = dict(previous)
+            for row in _records(inserts):
+                was = old.pop(row[ID_COLUMN], None)
+                if was is None:
+                    inserted(row)
+                else:
+                    changed = {field: value for field, value in row.items() if was.get(field) != value}
+                    if changed:
+                        updated(was, changed)
+            for row in old.values():
+                deleted(row)
+        else:
+            for event_id in deletes:
+                row = previous.get(event_id)
+                if row is not None:
+                    deleted(row)
+            for event_id, fields in updates.items():
+                row = previous.get(event_id)
+                if row is not None:
+                    updated(row, _record(fields))
+            for row in _records(inserts) if inserts is not None else []:
+                inserted(row)
+        return _recorded(log, entries)
+    return hook
+
+
+def _backfill_ids(backend, df):
+    """Save a new Event ID for every stored event without one, or sharing another's (e.g. a
+    row copied in Excel); False if another process got there first"""
+    missing = df.index[(df[ID_COLUMN].isna() | df[ID_COLUMN].duplicated()).to_numpy()]
+    return backend.give_ids(dict(zip(missing, event_model.new_ids(len(missing)))), df.attrs.get("version"))
+
+
+def schedule_as_of(when):
+    """The events as they stood at when, archived years included.
+
+    Rebuilt from today's events by undoing, newest first, the changes the
+    audit log recorded after when; so it is exact back to the log's first
+    entry (audit_log().started()). Rows are numbered from 0.
+    """
+    current = pd.concat([load_archive(), load_data()], ignore_index=True)
+    positions = dict(zip(current[ID_COLUMN], range(len(current))))
+    rows = {}  # Event ID -> row as it was, None for events that did not exist yet
+    for record in reversed(audit_log().since(when)):
+        if record["action"] in audit.MOVES:
+            continue
+        event_id = record["event_id"]
+        if record["change"] == "insert":
+            rows[event_id] = None
+        elif record["change"] == "delete":
+            rows[event_id] = dict(record["before"])
+        else:
+            if event_id not in rows:
+                position = positions.get(event_id)
+                rows[event_id] = None if position is None else current.iloc[position].to_dict()
+            if rows[event_id] is not None:
+                rows[event_id].update(record["before"])
+
+    kept = current[~current[ID_COLUMN].isin(list(rows))]
+    restored = [row for row in rows.values() if row is not None]
+    if restored:
+        restored = pd.DataFrame(restored)
+        for col in DATE_COLUMNS:
+            restored[col] = pd.to_datetime(restored[col].map(lambda value: None if value is None else pd.Timestamp(value)))
+        kept = pd.concat([kept.astype(object), normalize(restored)], ignore_index=True)
+    return event_model.apply_schema(kept.sort_values("Date", kind="stable").reset_index(drop=True))
+
+
+# ---------- Event IDs ----------
+# Index labels belong to one loaded table: the Excel store renumbers its rows
+# when it compacts, and a whole-table save starts again from 0. Anything kept
+# between reruns (a selection, the event being edited) holds Event IDs and
+# looks their current labels up here, in a hash index built once per version.
+_id_indexes = VersionCache()
+
+
+class IdIndex:
+    """Event ID -> index label of the rows of one events table"""
+
+    def __init__(self, df):
+        # Until load_data gives them IDs of their own, rows without one or
+        # sharing another's are not found (the first of a shared ID is)
+        ids = df[ID_COLUMN].astype(object)
+        keep = (ids.notna() & ~ids.duplicated()).to_numpy()
+        self._labels = df.index[keep]
+        self._ids = pd.Index(ids.to_numpy()[keep])
+
+    def labels(self, ids):
+        """Labels of the events with the given IDs, in the same order; IDs no longer there are skipped"""
+        positions = self._ids.get_indexer(list(ids))
+        return self._labels[positions[positions >= 0]]
+
+    def label(self, event_id):
+        """Label of one event, or None when it is gone"""
+        labels = self.labels([event_id])
+        return labels[0] if len(labels) else None
+
+    def label_map(self, ids):
+        """{Event ID: label} of those of ids still there"""
+        ids = list(ids)
+        positions = self._ids.get_indexer(ids)
+        return {event_id: self._labels[position] for event_id, position in zip(ids, positions) if position >= 0}
+
+
+def id_index(df):
+    """The IdIndex of df (from load_data()), reusing the one built for the same data version"""
+    return _id_indexes.get(df.attrs.get("version"), lambda: IdIndex(df))
+
+
+def _state_index(state):
+    """The IdIndex of the Excel store's replay state; its rows are load_data()'s at the same version"""
+    return _id_indexes.get(state["version"], lambda: IdIndex(state["df"]))
+
+
+# ---------- Load / Save ----------
+def store_identity():
+    """A value that changes whenever the store does; cheap when it has not"""
+    return _backend().identity()
+
+
+def _cached(key):
+    with _cache_lock:
+        if _cache["key"] == key:
+            _cache_stats["hits"] += 1
+            return _cache["df"].copy(deep=False)
+    return None
+
+
+def load_data():
+    """Load the events table, re-reading the store only when it has changed.
+
+    The returned DataFrame shares its data with the process-wide snapshot
+    but is a frame of its own, so callers may modify it freely without
+    affecting other sessions. df.attrs["version"] holds the data version
+    to pass back as base_version when saving changes. Columns follow
+    event_model's schema (see event_model.apply_schema).
+    """
+    backend = _backend()
+    key = backend.identity()
+    df = _cached(key)
+    if df is not None:
+        return df
+
+    with _build_lock:
+        df = _cached(key)
+        if df is not None:
+            return df
+        df = backend.load()
+        if df[ID_COLUMN].isna().any() or not df[ID_COLUMN].is_unique:
+            _backfill_ids(backend, df)
+            key = backend.identity()
+            df = backend.load()
+        df = event_model.apply_schema(df)
+        with _cache_lock:
+            _cache_stats["misses"] += 1
+            _cache["key"] = key
+            _cache["df"] = df
+    return df.copy(deep=False)
+
+
+def save_data(df, user=None, action="Replaced"):
+    """Replace the whole events table with df and invalidate the cache.
+
+    The audit log records, under action, the events added, removed and
+    changed, matched by Event ID.
+    """
+    df = normalize(event_model.with_ids(df))
+    backend = _backend()
+    hook = _audit_hook(audit.AuditLog(backend.audit_path, timeout=LOCK_TIMEOUT), df, {}, None, user, action)
+    try:
+        backend.save(df, audit=hook)
+    finally:
+        invalidate_cache()
+
+
+def write_changes(inserts=None, updates=None, deletes=None, base_version=None, user=None, action=None):
+    """Apply row-level changes in one write and return the new data version.
+
+    inserts: new rows (DataFrame, list of dicts or list of Series); rows
+        without an Event ID are given one
+    updates: {Event ID: {column: value}}
+    deletes: Event IDs of the events to remove
+    base_version: the version the caller's data was loaded at
+        (df.attrs["version"]). If other changes have been saved since, the
+        write is merged when it touches different events and raises
+        StaleDataError when it touches the same ones, or ones gone since.
+        None skips the check.
+
+    Events are looked up by Event ID while the store is locked, so a write
+    reaches the events meant however the rows were renumbered meanwhile.
+    user, action: recorded in the audit log; by default each row's
+        Modified By and Action Type ("Deleted" for deletes)
+    """
+    if inserts is not None:
+        inserts = event_model.with_ids(_as_frame(inserts))
+    updates, deletes = updates or {}, list(deletes or [])
+    backend = _backend()
+    hook = _audit_hook(audit.AuditLog(backend.audit_path, timeout=LOCK_TIMEOUT), inserts, updates, deletes, user, action)
+    try:
+        return backend.write_changes(inserts, updates, deletes, base_version, audit=hook)
+    finally:
+        invalidate_cache()
+
+
+def compact(wait=False):
+    """Fold pending journal entries back into the store (waiting for a running compaction with wait)"""
+    return _backend().compact(wait)
+
+
+def orphaned_journals():
+    """Journals of app changes set aside because the workbook was replaced outside the app, oldest first"""
+    return _backend().orphaned_journals()
+
+
+def _entry_fields(fields):
+    return {col: pd.Timestamp(value) if col in DATE_COLUMNS and value is not None else value
+            for col, value in fields.items()}
+
+
+def reapply_orphaned(path, user=None):
+    """Apply the changes of an orphaned journal (see orphaned_journals) to the current data, then remove it.
+
+    Rows are matched by Event ID. Changes to events that are no longer
+    there, and inserts of events that already are, are skipped, so applying
+    the same journal twice changes nothing more. Returns (changes applied,
+    changes skipped).
+    """
+    with open(path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f.read().splitlines()[1:] if line.strip()]
+    applied = skipped = 0
+    for entry in entries:
+        df = load_data()
+        index = id_index(df)
+        ids = entry.get("ids", {})
+        updates, deletes = {}, []
+        for label, fields in entry.get("updates", {}).items():
+            event_id = ids.get(label)
+            if event_id is None or index.label(event_id) is None:
+                skipped += 1
+            else:
+                updates[event_id] = _entry_fields(fields)
+        for label in map(str, entry.get("deletes", [])):
+            event_id = ids.get(label)
+            if event_id is None or index.label(event_id) is None:
+                skipped += 1
+            else:
+                deletes.append(event_id)
+        inserts = [_entry_fields(row) for row in entry.get("inserts", [])
+                   if index.label(row.get(ID_COLUMN)) is None]
+        skipped += len(entry.get("inserts", [])) - len(inserts)
+        if updates or deletes or inserts:
+            write_changes(inserts or None, updates, deletes, user=user, action="Re-applied")
+            applied += len(updates) + len(deletes) + len(inserts)
+    os.remove(path)
+    return applied, skipped
+
+
+def discard_orphaned(path):
+    """Delete an orphaned journal without applying it"""
+    os.remove(path)
+
+
+def coalesce_days():
+    """Merge events saved one row per day into single multi-day rows; returns (rows before, rows after)"""
+    df = load_data()
+    merged = event_model.coalesce_days(df)
+    if len(merged) < len(df):
+        save_data(merged, action="Merged")
+    return len(df), len(merged)
+
+
+# ---------- Year archive ----------
+# Events that ended before the years in view are moved out of the store into
+# one workbook per year under ARCHIVE_DIR, each with its Parquet sidecar, so
+# load_data() only reads the active years. Archived years are read-only and
+# loaded on demand (history searches, exports); restore_year() moves a year
+# back into the store to edit it. An event is archived under its start year.
+_ARCHIVE_NAME = re.compile(r"events_(\d{4})\.xlsx")
+_ARCHIVE_YEARS_CACHED = 4
+_archive_cache_lock = threading.Lock()
+_archive_cache = OrderedDict()  # year -> (workbook identity, DataFrame), most recently used last
+
+
+def _archive_path(year):
+    return os.path.join(ARCHIVE_DIR, f"events_{year}.xlsx")
+
+
+def _archive_lock():
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    return _store_lock(os.path.join(ARCHIVE_DIR, "events"))
+
+
+def archived_years():
+    """Years in the archive, oldest first"""
+    try:
+        names = os.listdir(ARCHIVE_DIR)
+    except FileNotFoundError:
+        return []
+    matches = [_ARCHIVE_NAME.fullmatch(name) for name in names]
+    return sorted(int(match.group(1)) for match in matches if match)
+
+
+def _read_year(year):
+    path = _archive_path(year)
+    key = _file_identity(path)
+    with _archive_cache_lock:
+        cached = _archive_cache.get(year)
+        if cached is not None and cached[0] == key:
+            _archive_cache.move_to_end(year)
+            return cached[1]
+    df = _load_workbook(path, key)
+    with _archive_cache_lock:
+        _archive_cache[year] = (key, df)
+        while len(_archive_cache) > _ARCHIVE_YEARS_CACHED:
+            _archive_cache.popitem(last=False)
+    return df
+
+
+def _write_year(year, df):
+    path = _archive_path(year)
+    df = normalize(title_first(df).reset_index(drop=True))
+    _write_workbook(df, path)
+    _write_sidecar(df, path, _file_identity(path))
+
+
+def _remove_year(year):
+    for path in (_archive_path(year), _sidecar_path(_archive_path(year))):
+        if os.path.exists(path):
+            os.remove(path)
+    with _archive_cache_lock:
+        _archive_cache.pop(year, None)
+
+
+def load_archive(date_from=None, date_to=None):
+    """Archived events of the years that may overlap [date_from, date_to] (None means open-ended).
+
+    Rows are numbered from 0 and their labels mean nothing to load_data()'s
+    frame; filter the result (e.g. with filters.filter_events) for the exact range.
+    df.attrs["archive_key"] identifies the archive files read, for caches.
+    """
+    years = archived_years()
+    if date_from is not None:
+        # An event archived under the previous year may run into this one
+        years = [year for year in years if year >= pd.Timestamp(date_from).year - 1]
+    if date_to is not None:
+        years = [year for year in years if year <= pd.Timestamp(date_to).year]
+    frames = [_read_year(year) for year in years]
+    if not frames:
+        return event_model.apply_schema(empty_frame())
+    df = event_model.apply_schema(pd.concat(frames, ignore_index=True))
+    df.attrs["archive_key"] = tuple((year, _file_identity(_archive_path(year))) for year in years)
+    return df
+
+
+def archive_before(year):
+    """Move the events that ended before 1 January of year into the archive; returns how many moved"""
+    with _archive_lock():
+        df = load_data()
+        old = df[event_model.end_dates(df) < pd.Timestamp(year, 1, 1)]
+        if len(old) == 0:
+            return 0
+        previous = {}
+        try:
+            for start_year, rows in old.groupby(old["Date"].dt.year):
+                start_year = int(start_year)
+                previous[start_year] = _read_year(start_year) if os.path.exists(_archive_path(start_year)) else None
+                _write_year(start_year, rows if previous[start_year] is None else
+                            pd.concat([previous[start_year], rows], ignore_index=True))
+            write_changes(deletes=old[ID_COLUMN].tolist(), base_version=df.attrs.get("version"), action="Archived")
+        except BaseException:
+            # Leave the archive as it was, so no event ends up in both places
+            for start_year, rows in previous.items():
+                if rows is None:
+                    _remove_year(start_year)
+                else:
+                    _write_year(start_year, rows)
+            raise
+    compact(wait=True)
+    return len(old)
+
+
+def restore_year(year):
+    """Move an archived year back into the store; returns how many events were restored"""
+    with _archive_lock():
+        if not os.path.exists(_archive_path(year)):
+            return 0
+        rows = _read_year(year)
+        write_changes(inserts=rows, action="Restored")
+        _remove_year(year)
+    return len(rows)
+
+
+# ---------- Import / Export ----------
+def import_excel(path=EXCEL_FILE):
+    """Replace the events table with the contents of an xlsx.
+
+    Workbooks in the one-row-per-day layout have their consecutive identical
+    days merged into multi-day events.
+    """
+    raw = pd.read_excel(path, engine='openpyxl')
+    df = normalize(raw)
+    if "End Date" not in raw.columns:
+        df = event_model.coalesce_days(df)
+    save_data(df, action="Imported")
+    return len(df)
+
+
+def export_excel(path):
+    """Write the events table to an xlsx in the one-row-per-day layout (Title first, 16 columns)"""
+    df = event_model.expand_days(load_data())
+    for col in DAILY_COLUMNS:
+        if col not in df.columns:
+            df[col] = ''
+    atomic_write(path, lambda tmp_path: exports.write_xlsx(df[DAILY_COLUMNS], tmp_path))
+    return len(df)
+
+
+if __name__ == "__main__":
+    # python event_store.py import|export [file.xlsx] | compact | coalesce | archive|restore YEAR
+    commands = ("import", "export", "compact", "coalesce", "archive", "restore")
+    if len(sys.argv) < 2 or sys.argv[1] not in commands or (sys.argv[1] in ("archive", "restore") and len(sys.argv) < 3):
+        print("Usage: python event_store.py import|export [file.xlsx] | compact | coalesce | archive|restore YEAR")
+        sys.exit(1)
+    if sys.argv[1] == "archive":
+        year = int(sys.argv[2])
+        print(f"Archived {archive_before(year)} events that ended before {year} to {ARCHIVE_DIR}")
+        sys.exit(0)
+    if sys.argv[1] == "restore":
+        year = int(sys.argv[2])
+        print(f"Restored {restore_year(year)} events of {year} ({STORAGE_BACKEND} backend)")
+        sys.exit(0)
+    if sys.argv[1] == "compact":
+        compact()
+        print(f"Compacted the {STORAGE_BACKEND} store")
+        sys.exit(0)
+    if sys.argv[1] == "coalesce":
+        before, after = coalesce_days()
+        print(f"Merged {before} daily rows into {after} events ({STORAGE_BACKEND} backend)")
+        sys.exit(0)
+    target = sys.argv[2] if len(sys.argv) > 2 else EXCEL_FILE
+    if sys.argv[1] == "import":
+        print(f"Imported {import_excel(target)} events from {target} ({STORAGE_BACKEND} backend)")
+    else:
+        print(f"Exported {export_excel(target)} events to {target} ({STORAGE_BACKEND} backend)")
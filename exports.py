@@ -0,0 +1,87 @@
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import Workbook
+
+from event_model import expand_days
+
+# Download formats: {format: (label, MIME type)}
+FORMATS = {
+    "xlsx": ("Excel (.xlsx)", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("CSV (.csv)", "text/csv"),
+    "parquet": ("Parquet (.parquet)", "application/vnd.apache.parquet"),
+}
+
+# Generated files are kept until their total size passes this, least recently
+# used first out
+EXPORT_CACHE_BYTES = 64 * 1024 * 1024
+
+# ---------- Export cache ----------
+# Shared by every session of the process. Keys include the data version, so a
+# saved change never serves an outdated file.
+_export_lock = threading.Lock()
+_exports = OrderedDict()
+_export_bytes = 0
+
+
+def _cell(value):
+    """Convert a DataFrame cell to a value openpyxl can write"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+
+def write_xlsx(df, target):
+    """Write df to an xlsx file or buffer row by row, without building the sheet in memory"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append([str(col) for col in df.columns])
+    for values in df.itertuples(index=False, name=None):
+        ws.append([_cell(v) for v in values])
+    wb.save(target)
+
+
+def render(df, fmt):
+    """Return df serialized as fmt ("xlsx", "csv" or "parquet")"""
+    if fmt == "csv":
+        return df.to_csv(index=False).encode("utf-8")
+    buffer = BytesIO()
+    if fmt == "xlsx":
+        write_xlsx(df, buffer)
+    elif fmt == "parquet":
+        df.to_parquet(buffer, index=False)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return buffer.getvalue()
+
+
+def get_export(events, fmt, key=None, start=None, end=None, columns=None):
+    """Return events as a file in the one-row-per-day layout, limited to [start, end].
+
+    key identifies the contents (data version plus whatever selected the
+    events); files are cached under (key, fmt) and built only on a miss.
+    """
+    if key is not None:
+        with _export_lock:
+            data = _exports.get((key, fmt))
+            if data is not None:
+                _exports.move_to_end((key, fmt))
+                return data
+
+    daily = expand_days(events, start, end)
+    data = render(daily[columns] if columns is not None else daily, fmt)
+
+    if key is not None and len(data) <= EXPORT_CACHE_BYTES:
+        global _export_bytes
+        with _export_lock:
+            if (key, fmt) not in _exports:
+                _exports[(key, fmt)] = data
+                _export_bytes += len(data)
+            while _export_bytes > EXPORT_CACHE_BYTES:
+                _, old = _exports.popitem(last=False)
+                _export_bytes -= len(old)
+    return data
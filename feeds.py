@@ -0,0 +1,177 @@
+"""Write an iCalendar feed per trainer, plus one with every event.
+
+Usage: python feeds.py [output directory]
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import event_model
+import event_store
+import ics
+import watcher
+
+FEEDS_DIR = os.environ.get("EQS_FEEDS_DIR", "feeds")
+ALL_FEED = "all"
+
+# Fingerprints of the feeds last written, kept next to them so a restarted
+# process does not rewrite feeds that are already up to date
+MANIFEST = "feeds.json"
+
+
+# The columns a feed's VEVENT blocks are rendered from; changes to the
+# others leave the feeds as they are
+FEED_COLUMNS = [event_model.ID_COLUMN, "Title", "Date", "End Date", "Date Modified", *ics.TRAINER_FIELDS]
+
+
+def feed_name(trainer):
+    """File name (without .ics) of trainer's feed"""
+    return trainer.lower().replace(" ", "-")
+
+
+# ---------- Feed writer ----------
+# Feeds carry only the fields trainers see in the app (ics.TRAINER_FIELDS).
+# A feed is rewritten only when the hashes of the rows in it differ from the
+# ones it was last written from. Every event's VEVENT block is kept with the
+# hash of the row it was rendered from, so a rewrite re-renders only the
+# events that changed. Both are kept by Event ID, so renumbered rows (e.g.
+# after the store compacts) are not mistaken for changed ones.
+class FeedWriter:
+    """The trainer feeds in one output directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.version = None
+        self._rendered = pd.Series(dtype="uint64")  # Event ID -> hash of the row its block shows
+        self._blocks = pd.Series(dtype=object)      # Event ID -> VEVENT block
+        self._written = self._read_manifest()       # feed name -> fingerprint
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.ics")
+
+    def _has_events(self, name):
+        try:
+            with open(self._path(name), "rb") as f:
+                return b"BEGIN:VEVENT" in f.read()
+        except OSError:
+            return False
+
+    def update(self, df, version=None):
+        """Bring the feeds up to date with df; return the names of the feeds rewritten.
+
+        Without a version, df may be a stand-in for data that failed to load,
+        so a feed that has events is never replaced from it: ValueError is
+        raised before anything is written.
+        """
+        if version is not None and version == self.version:
+            return []
+        ids = df[event_model.ID_COLUMN].to_numpy()
+        # Most of these columns hold a different value in every row, so
+        # factorizing them first (categorize) would only cost time
+        hashes = pd.Series(pd.util.hash_pandas_object(df[FEED_COLUMNS], index=False, categorize=False).to_numpy(),
+                           index=ids)
+        trainers = df["Trainer Calendar"].astype(object).to_numpy()
+        feeds = [(feed_name(trainer), f"EQS Events - {trainer}", trainers == trainer)
+                 for trainer in event_model.TRAINERS]
+        feeds.append((ALL_FEED, "EQS Events", np.ones(len(df), dtype=bool)))
+
+        stale_feeds = []
+        for name, title, mask in feeds:
+            fingerprint = hashlib.blake2b(hashes.to_numpy()[mask].tobytes(), digest_size=16).hexdigest()
+            if self._written.get(name) != fingerprint or not os.path.exists(self._path(name)):
+                stale_feeds.append((name, title, mask, fingerprint))
+
+        if version is None:
+            kept = [name for name, _, _, _ in stale_feeds if self._has_events(name)]
+            if kept:
+                raise ValueError(f"Not overwriting the {', '.join(kept)} feed(s) from data with no version")
+
+        if stale_feeds:
+            needed = np.logical_or.reduce([mask for _, _, mask, _ in stale_feeds])
+            rendered = self._rendered.reindex(hashes.index, fill_value=0)
+            blocks = self._blocks.reindex(hashes.index)
+            changed = needed & (rendered != hashes).to_numpy()
+            stale = hashes.index[changed]
+            if len(stale):
+                by_id = df[changed].set_index(event_model.ID_COLUMN, drop=False)
+                blocks.loc[stale] = ics.vevents(by_id, ics.TRAINER_FIELDS).reindex(stale)
+                rendered.loc[stale] = hashes.loc[stale]
+            self._rendered, self._blocks = rendered, blocks
+
+            os.makedirs(self.directory, exist_ok=True)
+            for name, title, mask, fingerprint in stale_feeds:
+                data = ics.calendar(blocks[mask].dropna(), title)
+                event_store.atomic_write(self._path(name), lambda tmp_path: _dump(data, tmp_path))
+                self._written[name] = fingerprint
+            manifest = json.dumps(self._written, indent=1, sort_keys=True).encode("utf-8")
+            event_store.atomic_write(os.path.join(self.directory, MANIFEST), lambda tmp_path: _dump(manifest, tmp_path))
+
+        self.version = version
+        return [name for name, _, _, _ in stale_feeds]
+
+
+def _dump(data, path):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+_writers_lock = threading.Lock()
+_writers = {}
+
+
+def update_feeds(df, version, directory=FEEDS_DIR):
+    """Rewrite the feeds in directory whose events changed; returns their names"""
+    with _writers_lock:
+        writer = _writers.setdefault(directory, FeedWriter(directory))
+        return writer.update(df, version)
+
+
+# ---------- Background updates ----------
+# Rendering the feeds of a large table takes a second or more, so the app
+# does not do it while rendering a page: the store watcher's thread brings
+# FEEDS_DIR up to date after every change it sees.
+_last_error = None
+
+
+def _update_from_store():
+    global _last_error
+    try:
+        df = event_store.load_data()
+        # Data that failed to load has no version and must not replace the feeds
+        if df.attrs.get("version") is not None:
+            update_feeds(df, df.attrs["version"])
+        _last_error = None
+    except Exception as e:
+        _last_error = e
+
+
+def keep_updated():
+    """Keep the feeds in FEEDS_DIR up to date from a background thread"""
+    watcher.on_change(_update_from_store)
+
+
+def last_error():
+    """The error the last background update failed with, or None"""
+    return _last_error
+
+
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else FEEDS_DIR
+    started = time.perf_counter()
+    df = event_store.load_data()
+    rewritten = update_feeds(df, df.attrs.get("version"), directory)
+    print(f"Wrote {len(rewritten)} feed(s) to {directory} in {time.perf_counter() - started:.2f}s: "
+          f"{', '.join(rewritten) or 'all up to date'}")
@@ -0,0 +1,72 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import event_model
+from version_cache import VersionCache
+
+# ---------- Filter engine ----------
+# Manage Events filters the whole table on every rerun. The columns the
+# filters compare against are prepared once per data version, and the result
+# of each distinct filter combination is remembered, so a rerun that does not
+# change the filters (e.g. ticking a checkbox) is a dictionary lookup.
+_filter_lock = threading.Lock()
+_columns_cache = VersionCache()
+_results = OrderedDict()
+_RESULTS_KEPT = 64
+
+
+class FilterColumns:
+    """The columns of an events table in the form the filters compare against"""
+
+    def __init__(self, df):
+        self.index = df.index
+        self.start = pd.to_datetime(df["Date"], errors="coerce").dt.normalize().to_numpy()
+        self.end = event_model.end_dates(df).dt.normalize().to_numpy()
+        self.trainer = df["Trainer Calendar"]
+        self.status = df["Status"]
+        self.source = df["Source"]
+        self.client = df["Client"].astype(object).fillna("").astype(str).str.lower()
+
+    def select(self, date_from=None, date_to=None, trainer=None, status=None, source=None, client=None):
+        """Index labels of the rows matching every given condition (None means any)"""
+        mask = np.ones(len(self.index), dtype=bool)
+        if date_from is not None:
+            mask &= self.end >= np.datetime64(date_from)
+        if date_to is not None:
+            mask &= self.start <= np.datetime64(date_to)
+        for values, wanted in ((self.trainer, trainer), (self.status, status), (self.source, source)):
+            if wanted is not None:
+                mask &= (values == wanted).to_numpy()
+        if client:
+            mask &= self.client.str.contains(client.lower(), regex=False).to_numpy()
+        return self.index[mask]
+
+
+def _columns(df, version):
+    return _columns_cache.get(version, lambda: FilterColumns(df))
+
+
+def filter_events(df, version, date_from=None, date_to=None, trainer=None, status=None, source=None, client=None):
+    """Index labels of the events in df matching the filters, remembered per (version, filters).
+
+    Events match the date range when any of their days fall inside it; the
+    client search is a case-insensitive substring match. Use df.loc on the
+    result (or part of it) to get the rows.
+    """
+    key = (version, date_from, date_to, trainer, status, source, client)
+    if version is not None:
+        with _filter_lock:
+            labels = _results.get(key)
+            if labels is not None:
+                _results.move_to_end(key)
+                return labels
+    labels = _columns(df, version).select(date_from, date_to, trainer, status, source, client)
+    if version is not None:
+        with _filter_lock:
+            _results[key] = labels
+            while len(_results) > _RESULTS_KEPT:
+                _results.popitem(last=False)
+    return labels
@@ -0,0 +1,204 @@
+import os
+import re
+import zoneinfo
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from event_model import ID_COLUMN, end_dates
+
+# ---------- iCalendar ----------
+# Events are written as all-day VEVENTs (DTEND is the day after the last day,
+# as RFC 5545 requires). By default every field also goes out as an X-EQS-
+# property, so a calendar exported here imports back without losing
+# anything; Notes go in DESCRIPTION. Calendars from elsewhere import with
+# SUMMARY as the course.
+PRODID = "-//EQ Strategist//EQS Event Scheduling//EN"
+
+# Event column -> property carrying it unchanged
+FIELD_PROPERTIES = {
+    "Type": "X-EQS-TYPE",
+    "Status": "X-EQS-STATUS",
+    "Source": "X-EQS-SOURCE",
+    "Client": "X-EQS-CLIENT",
+    "Course/Description": "X-EQS-COURSE",
+    "Trainer Calendar": "X-EQS-TRAINER",
+    "Medium": "X-EQS-MEDIUM",
+    "Location": "X-EQS-LOCATION",
+    "Billing": "X-EQS-BILLING",
+    "Invoiced": "X-EQS-INVOICED",
+}
+
+# Every field a calendar can carry, for to_ics' full round trip
+ALL_FIELDS = tuple(FIELD_PROPERTIES) + ("Notes",)
+
+# The fields of the Trainer View, for calendars trainers subscribe to: no
+# Billing, Invoiced or Notes
+TRAINER_FIELDS = ("Type", "Status", "Source", "Client", "Course/Description", "Trainer Calendar", "Medium",
+                  "Location")
+
+# Event status -> iCalendar STATUS
+STATUSES = {"Offered": "TENTATIVE", "Tentative": "TENTATIVE", "Confirmed": "CONFIRMED", "Blocked": "CONFIRMED"}
+
+
+_ESCAPED = re.compile(r"\\(.)")
+
+
+def _escape(text):
+    # Chained replaces run several times faster than str.translate
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\n", "\\n").replace("\r", ""))
+
+
+def _unescape(text):
+    if "\\" not in text:
+        return text
+    return _ESCAPED.sub(lambda m: "\n" if m.group(1) in ("n", "N") else m.group(1), text)
+
+
+def _fold(line):
+    """Split a content line into 75-octet pieces joined by CRLF + space"""
+    if len(line) <= 75 and line.isascii():
+        return line
+    if len(line.encode("utf-8")) <= 75:
+        return line
+    pieces, piece, size = [], [], 0
+    for char in line:
+        width = len(char.encode("utf-8"))
+        if size + width > (75 if not pieces else 74):
+            pieces.append("".join(piece))
+            piece, size = [], 0
+        piece.append(char)
+        size += width
+    pieces.append("".join(piece))
+    return "\r\n ".join(pieces)
+
+
+def _property(name, values):
+    """The folded "NAME:value" line plus CRLF for each of values, "" where the value is missing.
+
+    Each distinct value is formatted once; event columns repeat a handful
+    of values across many rows.
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = np.asarray(uniques, dtype=object)  # iterating Arrow-backed strings is slow
+    lines = np.array([_fold(f"{name}:{_escape(value)}") + "\r\n" for value in uniques] + [""], dtype=object)
+    return lines[codes]  # code -1 (missing) picks the trailing ""
+
+
+def _dates(name, values):
+    """ "NAME;VALUE=DATE:YYYYMMDD" plus CRLF for each of values (datetimes)"""
+    codes, uniques = pd.factorize(values)
+    return np.array([f"{name};VALUE=DATE:{day:%Y%m%d}\r\n" for day in uniques] + [""], dtype=object)[codes]
+
+
+def _local_zone():
+    """The system time zone, by name where it can be found so DST rules apply"""
+    name = os.environ.get("TZ", "").lstrip(":")
+    if not name and os.path.islink("/etc/localtime"):
+        name = os.path.realpath("/etc/localtime").partition("zoneinfo/")[2]
+    try:
+        return zoneinfo.ZoneInfo(name)
+    except (ValueError, zoneinfo.ZoneInfoNotFoundError):
+        return datetime.now().astimezone().tzinfo  # fixed at today's offset
+
+
+# Date Modified is written with the server's local datetime.now()
+LOCAL_ZONE = _local_zone()
+
+
+def _stamps(local):
+    """ "DTSTAMP:YYYYMMDDTHHMMSSZ" plus CRLF for each of local (naive local datetimes)"""
+    utc = local.dt.tz_localize(LOCAL_ZONE, ambiguous=np.zeros(len(local), dtype=bool),
+                               nonexistent="shift_forward").dt.tz_convert("UTC")
+    digits = np.datetime_as_string(utc.dt.tz_localize(None).to_numpy(dtype="M8[s]"), unit="s")
+    digits = np.char.replace(np.char.replace(digits, "-", ""), ":", "")
+    return np.char.add(np.char.add("DTSTAMP:", digits), "Z\r\n").astype(object)
+
+
+def uid(event_id):
+    """UID of the event with the given Event ID"""
+    return f"event-{event_id}@eqstrategist.com"
+
+
+def vevents(events, fields=ALL_FIELDS):
+    """The VEVENT block of every event with a Date, as a Series indexed like events.
+
+    Blocks end with CRLF. Of the event's fields, only those in fields are
+    written (Notes as DESCRIPTION, the others as X-EQS- properties). DTSTAMP
+    is the event's Date Modified (or its start date), converted from local
+    time to UTC, so an unchanged event always renders the same block.
+    """
+    events = events[events["Date"].notna()]
+    starts = pd.to_datetime(events["Date"]).dt.normalize()
+    ends = end_dates(events).dt.normalize() + pd.Timedelta(days=1)
+    modified = pd.to_datetime(events["Date Modified"], errors="coerce", format="%Y-%m-%d %H:%M").fillna(starts)
+    stamps = _stamps(modified)
+
+    columns = [
+        stamps,
+        np.array([f"UID:{uid(event_id)}\r\n" for event_id in events[ID_COLUMN].to_numpy(dtype=object)],
+                 dtype=object),
+        _dates("DTSTART", starts),
+        _dates("DTEND", ends),
+        _property("SUMMARY", events["Title"]),
+        _property("STATUS", events["Status"].map(STATUSES)),
+        _property("LOCATION", events["Location"]),
+    ]
+    if "Notes" in fields:
+        columns.append(_property("DESCRIPTION", events["Notes"]))
+    columns += [_property(prop, events[col]) for col, prop in FIELD_PROPERTIES.items() if col in fields]
+    blocks = ["BEGIN:VEVENT\r\n" + "".join(lines) + "END:VEVENT\r\n" for lines in zip(*columns)]
+    return pd.Series(blocks, index=events.index, dtype=object)
+
+
+def calendar(blocks, name):
+    """An iCalendar file holding the given VEVENT blocks"""
+    head = "\r\n".join(["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN",
+                         _fold(f"X-WR-CALNAME:{_escape(name)}"), ""])
+    # One join, so a feed of many events is not copied once per concatenation
+    return "".join([head, *blocks, "END:VCALENDAR\r\n"]).encode("utf-8")
+
+
+def to_ics(events, name="EQS Events"):
+    """Return events (rows in the events layout) as an iCalendar file"""
+    return calendar(vevents(events), name)
+
+
+def read_ics(path):
+    """Return the VEVENTs of an iCalendar file as rows in the events layout"""
+    with open(path, encoding="utf-8-sig") as f:
+        text = f.read()
+    # Unfold continuation lines before splitting into properties
+    text = text.replace("\r\n", "\n").replace("\n ", "").replace("\n\t", "")
+
+    events = []
+    for block in re.split(r"^BEGIN:VEVENT$", text, flags=re.M | re.I)[1:]:
+        event = {}
+        for line in block.split("\n"):
+            head, _, value = line.partition(":")
+            name, _, params = head.partition(";")
+            name = name.upper()
+            if name == "END" and value.upper() == "VEVENT":
+                break
+            event[name] = value
+            if name == "DTEND":
+                event["DTEND-PARAMS"] = params.upper()
+        events.append(event)
+    raw = pd.DataFrame(events, columns=["DTSTART", "DTEND", "DTEND-PARAMS", "SUMMARY", "DESCRIPTION",
+                                        *FIELD_PROPERTIES.values()], dtype=object)
+
+    rows = pd.DataFrame(index=raw.index)
+    rows["Date"] = pd.to_datetime(raw["DTSTART"].str[:8], format="%Y%m%d", errors="coerce")
+    end = pd.to_datetime(raw["DTEND"].str[:8], format="%Y%m%d", errors="coerce")
+    # An all-day DTEND is the day after the event
+    all_day = raw["DTEND-PARAMS"].fillna("").str.contains("VALUE=DATE", regex=False) | (raw["DTEND"].str.len() == 8)
+    end = end.where(~all_day, end - pd.Timedelta(days=1))
+    rows["End Date"] = end.where(end >= rows["Date"], rows["Date"])
+    rows["Course/Description"] = raw["SUMMARY"].fillna("").map(_unescape)
+    rows["Notes"] = raw["DESCRIPTION"].map(_unescape, na_action="ignore")
+    for col, name in FIELD_PROPERTIES.items():
+        if raw[name].notna().any():
+            rows[col] = raw[name].map(_unescape, na_action="ignore")
+    return rows
@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Tracing is on unless EQS_PERF=0. When off, span() hands out one shared
+# do-nothing object, so the instrumented code pays a function call and an
+# attribute check per phase.
+ENABLED = os.environ.get("EQS_PERF", "1") != "0"
+
+# Finished reruns are also appended here, one JSON object per line, when set
+PERF_LOG = os.environ.get("EQS_PERF_LOG")
+
+# Reruns kept in memory for the admin panel
+RERUNS_KEPT = 200
+
+# ---------- Spans ----------
+# A rerun is the list of timed phases (spans) of one execution of app.py.
+# The rerun being executed is kept per thread, since Streamlit runs every
+# session's script in its own thread; its record sits in the shared history
+# from the start, so reruns cut short by st.rerun() or st.stop() still show.
+_lock = threading.Lock()
+_history = deque(maxlen=RERUNS_KEPT)
+_current = threading.local()
+
+
+class Span:
+    """One timed phase; set rows and bytes on it to record how much it handled"""
+
+    def __init__(self, name, record):
+        self.name = name
+        self.rows = None
+        self.bytes = None
+        self._record = record
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ended = time.perf_counter()
+        entry = {"name": self.name, "ms": round((ended - self._started) * 1000, 2)}
+        if self.rows is not None:
+            entry["rows"] = int(self.rows)
+        if self.bytes is not None:
+            entry["bytes"] = int(self.bytes)
+        if self._record is None:
+            # Outside a rerun (e.g. a download built on click): a record of its own
+            record = _new_record(None)
+            record["_started"] = self._started
+            _finish(record, [entry])
+        else:
+            self._record["spans"].append(entry)
+            self._record["_ended"] = ended
+        return False
+
+
+class _NullSpan:
+    rows = None
+    bytes = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """Context manager timing one phase of the current rerun"""
+    if not ENABLED:
+        return _NULL_SPAN
+    return Span(name, getattr(_current, "record", None))
+
+
+def _new_record(user):
+    record = {"at": datetime.now().isoformat(timespec="seconds"), "user": user, "ms": None,
+              "complete": False, "spans": [], "_started": time.perf_counter()}
+    with _lock:
+        _history.append(record)
+    return record
+
+
+def _finish(record, spans=(), complete=True):
+    """Close record; an incomplete rerun is timed up to the end of its last span"""
+    started = record.pop("_started")
+    last_span_ended = record.pop("_ended", started)
+    ended = time.perf_counter() if complete else last_span_ended
+    record["spans"].extend(spans)
+    record["complete"] = complete
+    record["ms"] = round((ended - started) * 1000, 2)
+    if PERF_LOG:
+        line = json.dumps(record) + "\n"
+        with _lock:
+            with open(PERF_LOG, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+def start_rerun(state, user=None):
+    """Start recording a rerun; state is the session's state (st.session_state).
+
+    A rerun of the same session that never reached finish_rerun() is closed
+    first, marked incomplete.
+    """
+    if not ENABLED:
+        return
+    previous = state.get("perf_rerun")
+    if previous is not None and "_started" in previous:
+        _finish(previous, complete=False)
+    _current.record = state["perf_rerun"] = _new_record(user)
+
+
+def finish_rerun(state):
+    """Close the session's current rerun"""
+    if not ENABLED:
+        return
+    record = state.get("perf_rerun")
+    if record is not None and "_started" in record:
+        _finish(record)
+    _current.record = None
+
+
+def recent_reruns(count):
+    """The last count finished reruns, newest first"""
+    with _lock:
+        finished = [record for record in _history if record["ms"] is not None]
+    return finished[::-1][:count]
+
+
+def phase_totals(record):
+    """Milliseconds spent in each phase of record, spans of the same name added up"""
+    totals = {}
+    for entry in record["spans"]:
+        totals[entry["name"]] = round(totals.get(entry["name"], 0) + entry["ms"], 2)
+    return totals
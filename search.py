@@ -0,0 +1,168 @@
+import math
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Columns searched by the "Search" box in Manage Events
+SEARCH_COLUMNS = ["Title", "Client", "Course/Description", "Notes", "Billing"]
+
+# Words too common to help rank anything
+STOP_WORDS = {"a", "an", "and", "at", "by", "for", "in", "of", "on", "or", "the", "to", "with"}
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lowercased words of text, without stop words"""
+    return [word for word in _WORD.findall(str(text).lower()) if word not in STOP_WORDS]
+
+
+def _trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+# ---------- Search index ----------
+# An inverted index from words to the rows containing them, plus a trigram
+# index over the vocabulary so a query word also finds longer words that
+# contain it ("lead" -> "leadership"). It is shared by every session and
+# brought up to date by re-indexing only the rows whose text changed.
+class SearchIndex:
+    """Inverted word index over the SEARCH_COLUMNS of an events table"""
+
+    def __init__(self):
+        self.version = None
+        self._postings = defaultdict(dict)   # word -> {label: occurrences}
+        self._doc_words = {}                 # label -> Counter of its words
+        self._by_trigram = defaultdict(set)  # trigram -> words containing it
+        self._weights = {}                   # word -> Series of label -> scaled count, built on demand
+        self._hashes = pd.Series(dtype="uint64")
+
+    def __len__(self):
+        return len(self._doc_words)
+
+    def _add(self, label, text):
+        words = Counter(tokenize(text))
+        self._doc_words[label] = words
+        for word, count in words.items():
+            if word not in self._postings:
+                for trigram in _trigrams(word):
+                    self._by_trigram[trigram].add(word)
+            self._postings[word][label] = count
+            self._weights.pop(word, None)
+
+    def _remove(self, label):
+        for word in self._doc_words.pop(label, ()):
+            postings = self._postings[word]
+            postings.pop(label, None)
+            self._weights.pop(word, None)
+            if not postings:
+                del self._postings[word]
+                for trigram in _trigrams(word):
+                    self._by_trigram[trigram].discard(word)
+
+    def sync(self, df, version):
+        """Re-index the rows of df whose searchable text differs from what is indexed"""
+        cols = [col for col in SEARCH_COLUMNS if col in df.columns]
+        text = df[cols].astype(object).fillna("")
+        hashes = pd.util.hash_pandas_object(text, index=False)
+        hashes.index = df.index
+
+        old = self._hashes
+        gone = old.index.difference(hashes.index)
+        common = hashes.index.intersection(old.index)
+        changed = common[(hashes.loc[common] != old.loc[common]).to_numpy()]
+        new = hashes.index.difference(old.index)
+
+        for label in gone.append(changed):
+            self._remove(label)
+        if len(changed) or len(new):
+            rows = text.loc[changed.append(new)]
+            for label, values in zip(rows.index, rows.itertuples(index=False, name=None)):
+                self._add(label, " ".join(str(v) for v in values))
+        self._hashes = hashes
+        self.version = version
+        return len(gone) + len(changed) + len(new)
+
+    def _matching_words(self, term):
+        """Indexed words containing term, each with a weight (1 for an exact match)"""
+        if len(term) < 3:
+            candidates = [word for word in self._postings if word.startswith(term)]
+        else:
+            sets = [self._by_trigram.get(trigram, set()) for trigram in _trigrams(term)]
+            candidates = [word for word in set.intersection(*sets) if term in word] if sets else []
+        return {word: (1.0 if word == term else 0.5) for word in candidates}
+
+    def _word_weights(self, word):
+        weights = self._weights.get(word)
+        if weights is None:
+            postings = self._postings[word]
+            weights = pd.Series(1 + np.log(np.fromiter(postings.values(), dtype=float, count=len(postings))),
+                                index=list(postings))
+            self._weights[word] = weights
+        return weights
+
+    def search(self, query, limit=None):
+        """Index labels of the rows matching query, best first.
+
+        Rows matching more of the query's words come first; ties are broken
+        by a TF-IDF score, so rare words count for more than common ones.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        total = max(len(self._doc_words), 1)
+        per_term = []
+        for term in terms:
+            parts = [self._word_weights(word) * (weight * math.log(1 + total / len(self._postings[word])))
+                     for word, weight in self._matching_words(term).items()]
+            if parts:
+                scores = pd.concat(parts)
+                per_term.append(scores.groupby(level=0).max() if len(parts) > 1 else scores)
+        if not per_term:
+            return pd.Index([])
+        scores = pd.concat(per_term, axis=1)
+        matched = scores.notna().sum(axis=1).to_numpy()
+        order = np.lexsort((-scores.sum(axis=1).to_numpy(), -matched))
+        ranked = scores.index[order]
+        return ranked[:limit] if limit else ranked
+
+
+_index_lock = threading.Lock()
+_index = SearchIndex()
+
+
+def search_events(df, version, query, limit=None):
+    """Index labels of the events in df matching query, best first (see SearchIndex.search)"""
+    with _index_lock:
+        if version is None or _index.version != version:
+            _index.sync(df, version)
+        return _index.search(query, limit)
+
+
+# ---------- Archive search ----------
+# Archived years never change, so their index is built once per set of
+# archive files (df.attrs["archive_key"], see event_store.load_archive) and
+# kept for the next rerun, apart from the shared index of the live data.
+_ARCHIVE_INDEXES_KEPT = 2
+_archive_lock = threading.Lock()
+_archive_indexes = OrderedDict()  # archive key -> SearchIndex, most recently used last
+
+
+def search_archive(archived, query, limit=None):
+    """Index labels of the archived events (from event_store.load_archive) matching query, best first"""
+    key = archived.attrs.get("archive_key")
+    with _archive_lock:
+        index = _archive_indexes.get(key) if key is not None else None
+        if index is not None:
+            _archive_indexes.move_to_end(key)
+    if index is None:
+        index = SearchIndex()
+        index.sync(archived, None)
+        if key is not None:
+            with _archive_lock:
+                _archive_indexes[key] = index
+                while len(_archive_indexes) > _ARCHIVE_INDEXES_KEPT:
+                    _archive_indexes.popitem(last=False)
+    with _archive_lock:
+        return index.search(query, limit)
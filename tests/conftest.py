@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import event_model  # noqa: E402
+import event_store  # noqa: E402
+from version_cache import VersionCache  # noqa: E402
+
+
+def make_events(count, client="SSIA"):
+    """count single-day events on consecutive days, each with an Event ID"""
+    dates = pd.date_range("2026-03-02", periods=count, freq="D")
+    df = pd.DataFrame({col: [None] * count for col in event_model.COLUMNS})
+    df["Date"] = dates
+    df["End Date"] = dates
+    df["Type"] = "W"
+    df["Status"] = "Confirmed"
+    df["Source"] = "EQS"
+    df["Client"] = client
+    df["Course/Description"] = [f"Course {i}" for i in range(count)]
+    df["Trainer Calendar"] = "Dom"
+    df["Action Type"] = "Created"
+    df["Event ID"] = event_model.new_ids(count)
+    return df
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """An empty Excel store in tmp_path, with idle compaction off and nothing remembered from other tests"""
+    monkeypatch.setattr(event_store, "STORAGE_BACKEND", "excel")
+    monkeypatch.setattr(event_store, "EXCEL_FILE", str(tmp_path / "events.xlsx"))
+    monkeypatch.setattr(event_store, "COMPACT_IDLE_SECONDS", None)
+    # Every test's store starts again from version 0
+    monkeypatch.setattr(event_store, "_id_indexes", VersionCache())
+    event_store.forget_store()
+    yield event_store.ExcelBackend(event_store.EXCEL_FILE)
+    event_store.forget_store()
@@ -0,0 +1,89 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import audit
+import event_store
+from conftest import make_events
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Set the time the audit log records changes at"""
+    def set_time(at):
+        monkeypatch.setattr(audit, "now", lambda: at)
+    return set_time
+
+
+def edit(event_id, **fields):
+    version = event_store.load_data().attrs["version"]
+    event_store.write_changes(updates={event_id: fields}, base_version=version, user="sues@eqstrategist.com")
+
+
+def delete(event_id):
+    event_store.write_changes(deletes=[event_id], base_version=event_store.load_data().attrs["version"])
+
+
+def test_log_refuses_to_change_or_remove_entries(tmp_path):
+    log = audit.AuditLog(str(tmp_path / "audit.db"))
+    log.record([{"at": audit.now(), "action": "Created", "change": "insert", "event_id": "e1", "after": {}}])
+    conn = sqlite3.connect(log.path)
+    try:
+        with pytest.raises(sqlite3.DatabaseError, match="append-only"):
+            conn.execute("UPDATE changes SET user = 'someone'")
+        with pytest.raises(sqlite3.DatabaseError, match="append-only"):
+            conn.execute("DELETE FROM changes")
+    finally:
+        conn.close()
+    assert len(log.changes()) == 1
+
+
+def test_changes_are_queried_by_time_and_by_event(store, clock):
+    events = make_events(2)
+    ids = events["Event ID"].tolist()
+    clock("2026-03-01 09:00:00")
+    event_store.save_data(events, user="doms@eqstrategist.com")
+    clock("2026-03-01 10:00:00")
+    edit(ids[0], Client="NAB")
+    clock("2026-03-01 11:00:00")
+    delete(ids[1])
+
+    log = event_store.audit_log()
+    assert log.started() == "2026-03-01 09:00:00"
+    assert list(log.changes()["Action"]) == ["Deleted", "Modified", "Replaced", "Replaced"]
+    between = log.changes(start="2026-03-01 09:30", end="2026-03-01 10:30")
+    assert list(between["Event ID"]) == [ids[0]]
+    assert list(between["User"]) == ["sues@eqstrategist.com"]
+    assert list(between["Changes"]) == ["Client: SSIA → NAB"]
+    assert list(log.changes(start="2026-03-01 10:30")["Event ID"]) == [ids[1]]
+    assert list(log.history(ids[0])["At"]) == ["2026-03-01 10:00:00", "2026-03-01 09:00:00"]
+
+
+def test_schedule_as_of_rebuilds_a_past_schedule(store, clock, tmp_path, monkeypatch):
+    monkeypatch.setattr(event_store, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    events = make_events(3)
+    ids = events["Event ID"].tolist()
+    clock("2026-03-01 09:00:00")
+    event_store.save_data(events)
+    clock("2026-03-01 10:00:00")
+    edit(ids[0], Client="NAB", Date=pd.Timestamp("2026-04-01"), **{"End Date": pd.Timestamp("2026-04-02")})
+    clock("2026-03-01 11:00:00")
+    delete(ids[1])
+    clock("2026-03-01 12:00:00")
+    event_store.write_changes(inserts=make_events(1, client="ANZ"))
+
+    before_edit = event_store.schedule_as_of("2026-03-01 09:30").set_index("Event ID")
+    assert sorted(before_edit.index) == sorted(ids)
+    assert (before_edit["Client"] == "SSIA").all()
+    assert before_edit.loc[ids[0], "Date"] == pd.Timestamp("2026-03-02")
+    assert before_edit.loc[ids[0], "End Date"] == pd.Timestamp("2026-03-02")
+
+    after_edit = event_store.schedule_as_of("2026-03-01 10:30").set_index("Event ID")
+    assert sorted(after_edit.index) == sorted(ids)
+    assert after_edit.loc[ids[0], "Client"] == "NAB"
+    assert after_edit.loc[ids[0], "End Date"] == pd.Timestamp("2026-04-02")
+
+    now = event_store.schedule_as_of("2026-03-01 12:30")
+    assert sorted(now["Client"].astype(str)) == ["ANZ", "NAB", "SSIA"]
+    assert list(now["Date"]) == sorted(now["Date"])
@@ -0,0 +1,44 @@
+import sys
+
+import pytest
+
+import bulk_io
+import event_store
+
+FIELDS = "X-EQS-TYPE:W\nX-EQS-STATUS:Confirmed\nX-EQS-SOURCE:EQS\nX-EQS-TRAINER:Dom\n" \
+         "X-EQS-MEDIUM:F2F\nX-EQS-LOCATION:Syd\nX-EQS-INVOICED:No\n"
+
+
+def write_ics(path, *events):
+    """An iCalendar file with one all-day VEVENT per (date, summary, extra properties)"""
+    blocks = [f"BEGIN:VEVENT\nDTSTART;VALUE=DATE:{date}\nSUMMARY:{summary}\n{extra}END:VEVENT\n"
+              for date, summary, extra in events]
+    path.write_text("BEGIN:VCALENDAR\nVERSION:2.0\n" + "".join(blocks) + "END:VCALENDAR\n", encoding="utf-8")
+    return str(path)
+
+
+def run_cli(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["bulk_io.py", *args])
+    bulk_io.main()
+
+
+def test_import_rejects_rows_missing_required_fields(store, tmp_path, monkeypatch, capsys):
+    path = write_ics(tmp_path / "plain.ics", ("20260302", "Board offsite", ""), ("20260303", "Workshop", FIELDS))
+    with pytest.raises(SystemExit) as exit_:
+        run_cli(monkeypatch, "import", path, "--user", "doms@eqstrategist.com")
+    assert exit_.value.code == 1
+    err = capsys.readouterr().err
+    assert "1 row(s) of" in err and "Nothing was saved" in err
+    problem, = [line for line in err.splitlines() if "missing" in line]
+    assert problem.startswith("1 ")  # the first VEVENT
+    assert "Type is missing" in problem and "Trainer Calendar is missing" in problem
+    assert len(event_store.load_data()) == 0
+
+
+def test_import_adds_complete_rows(store, tmp_path, monkeypatch, capsys):
+    path = write_ics(tmp_path / "full.ics", ("20260302", "Board offsite", FIELDS))
+    run_cli(monkeypatch, "import", path, "--user", "doms@eqstrategist.com")
+    assert capsys.readouterr().out.startswith("Imported 1 events")
+    df = event_store.load_data()
+    assert list(df["Title"]) == ["Confirmed-EQS- Board offsite (F2F) Dom Syd"]
+    assert list(df["Modified By"]) == ["doms@eqstrategist.com"]
@@ -0,0 +1,46 @@
+import pandas as pd
+
+import conflicts
+import event_model
+from conftest import make_events
+
+
+def stored(count=3):
+    """count firm bookings of Dom on consecutive days, titled"""
+    return event_model.apply_schema(make_events(count).assign(Title=[f"Event {i}" for i in range(count)]))
+
+
+def test_an_insert_on_a_booked_day_clashes():
+    df = stored()
+    inserts = make_events(1).assign(Title="New")
+    clashes = conflicts.find_conflicts(df, None, inserts=inserts)
+    assert list(clashes["Event"]) == ["New"]
+    assert list(clashes["Clashes With"]) == ["Event 0"]
+
+
+def test_provisional_and_other_trainers_bookings_do_not_clash():
+    df = stored()
+    inserts = pd.concat([make_events(1).assign(Status="Tentative"),
+                         make_events(1).assign(**{"Trainer Calendar": "Dale"})])
+    assert conflicts.find_conflicts(df, None, inserts=inserts).empty
+
+
+def test_a_changed_booking_does_not_clash_with_its_old_version():
+    df = stored()
+    updates = {df.at[0, "Event ID"]: {"Status": "Blocked"}}
+    assert conflicts.find_conflicts(df, None, updates=updates).empty
+
+
+def test_a_move_clashes_with_a_row_the_same_change_only_annotates():
+    df = stored()
+    updates = {df.at[0, "Event ID"]: {"Notes": "Room booked"},
+               df.at[1, "Event ID"]: {"Date": df.at[0, "Date"], "End Date": df.at[0, "Date"]}}
+    clashes = conflicts.find_conflicts(df, None, updates=updates)
+    assert list(clashes["Clashes With"]) == ["Event 0"]
+
+
+def test_a_move_onto_a_deleted_booking_does_not_clash():
+    df = stored()
+    updates = {df.at[1, "Event ID"]: {"Date": df.at[0, "Date"], "End Date": df.at[0, "Date"]}}
+    assert conflicts.find_conflicts(df, None, updates=updates, deletes=[df.at[0, "Event ID"]]).empty
+    assert len(conflicts.find_conflicts(df, None, updates=updates)) == 1
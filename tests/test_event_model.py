@@ -0,0 +1,44 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import event_model
+
+# Field values including the awkward ones: blanks, padding, missing cells
+# and a Type outside W/M/C
+CHOICES = {
+    "Type": ["W", "C", "M", "X", np.nan],
+    "Status": ["Offered", "Tentative", "Confirmed", "Blocked", np.nan],
+    "Source": ["EQS", "CCE", "CTD", ""],
+    "Client": ["SSIA", "Joesolve", "  Certitude ", "", np.nan, None],
+    "Course/Description": ["Leadership Workshop", "Customer Care", "", "EQ (Advanced)", np.nan],
+    "Trainer Calendar": ["Dom", "Andrew", "Dale", "Jack", np.nan],
+    "Medium": ["F2F", "Online", np.nan],
+    "Location": ["Syd", "Mel", "Bne", "SG", "Msia", "Global", "", np.nan],
+}
+
+
+def random_rows(rows, seed):
+    rng = random.Random(seed)
+    return pd.DataFrame({column: [rng.choice(values) for _ in range(rows)]
+                         for column, values in CHOICES.items()})
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_generate_titles_matches_generate_title(seed):
+    df = random_rows(2000, seed)
+    expected = df.apply(event_model.generate_title, axis=1)
+    pd.testing.assert_series_equal(event_model.generate_titles(df), expected, check_dtype=False)
+
+
+def test_generate_titles_of_no_rows():
+    assert event_model.generate_titles(random_rows(0, 0)).empty
+
+
+def test_missing_fields_are_left_out_of_titles():
+    df = pd.DataFrame([{"Type": "W", "Status": "Confirmed", "Source": np.nan, "Client": None,
+                        "Course/Description": "Board offsite", "Trainer Calendar": "Dom", "Medium": np.nan,
+                        "Location": np.nan}])
+    assert list(event_model.generate_titles(df)) == ["Confirmed-- Board offsite () Dom"]
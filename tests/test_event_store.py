@@ -0,0 +1,270 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import event_store
+from conftest import make_events
+
+
+def by_id(df):
+    return df.set_index("Event ID")
+
+
+# ---------- Journal replay ----------
+def test_changes_are_journaled_and_replayed(store):
+    events = make_events(3)
+    event_store.save_data(events)
+    ids = events["Event ID"].tolist()
+
+    event_store.write_changes(updates={ids[0]: {"Client": "NAB"}})
+    event_store.write_changes(inserts=make_events(1, client="ANZ"))
+    version = event_store.write_changes(deletes=[ids[2]])
+
+    assert len(store._journal_lines()) == 4  # header and three entries
+    event_store.forget_store()  # as a fresh process would read it
+    df = event_store.load_data()
+    assert df.attrs["version"] == version
+    assert sorted(df["Client"].astype(str)) == ["ANZ", "NAB", "SSIA"]
+    assert ids[2] not in set(df["Event ID"])
+    assert by_id(df).loc[ids[0], "Client"] == "NAB"
+
+
+def test_replay_ignores_a_partly_written_line(store):
+    events = make_events(2)
+    event_store.save_data(events)
+    event_store.write_changes(updates={events["Event ID"][0]: {"Client": "NAB"}})
+    with open(store.journal, "a", encoding="utf-8") as f:
+        f.write('{"updates": {"1": {"Client": "AN')
+    event_store.forget_store()
+    assert list(event_store.load_data()["Client"].astype(str)) == ["NAB", "SSIA"]
+
+
+# ---------- Compaction ----------
+def test_compaction_relabels_entries_written_meanwhile(store, monkeypatch):
+    events = make_events(4)
+    event_store.save_data(events)
+    ids = events["Event ID"].tolist()
+    event_store.write_changes(deletes=[ids[0]])
+    inserted = make_events(1, client="ANZ")
+
+    write_temp = event_store._write_temp
+
+    def write_during_compaction(path, write):
+        # While the workbook is being written, the store is not locked
+        if path == store.path:
+            event_store.write_changes(updates={ids[3]: {"Client": "NAB"}})
+            event_store.write_changes(inserts=inserted)
+        return write_temp(path, write)
+
+    monkeypatch.setattr(event_store, "_write_temp", write_during_compaction)
+    assert event_store.compact(wait=True)
+
+    header = json.loads(store._journal_lines()[0])
+    assert len(store._journal_lines()) == 3  # the two writes carried over
+    df = event_store.load_data()
+    assert df.attrs["version"] > header["snapshot_version"]
+    assert list(df.index) == list(range(4))
+    assert by_id(df).loc[ids[3], "Client"] == "NAB"
+    assert by_id(df).loc[inserted["Event ID"][0], "Client"] == "ANZ"
+    event_store.forget_store()
+    assert by_id(event_store.load_data()).loc[ids[3], "Client"] == "NAB"
+
+
+def test_journal_is_compacted_once_writes_stop(store, monkeypatch):
+    monkeypatch.setattr(event_store, "COMPACT_IDLE_SECONDS", 0.05)
+    events = make_events(2)
+    event_store.save_data(events)
+    event_store.write_changes(updates={events["Event ID"][0]: {"Client": "NAB"}})
+    event_store.write_changes(updates={events["Event ID"][1]: {"Client": "ANZ"}})
+    timer = event_store._idle_timers[store.path]
+    timer.join(10)
+    assert len(store._journal_lines()) == 1
+    assert list(event_store._read_workbook(store.path)["Client"]) == ["NAB", "ANZ"]
+
+
+def test_relabel_entry_drops_rows_that_are_gone():
+    entry = {"updates": {"0": {"Client": "NAB"}, "5": {"Client": "ANZ"}}, "deletes": [1, 6], "version": 3}
+    relabeled = event_store._relabel_entry(entry, {0: None, 1: 0, 5: 3, 6: 4}.get)
+    assert relabeled == {"updates": {"3": {"Client": "ANZ"}}, "deletes": [0, 4], "version": 3}
+
+
+# ---------- Stale versions ----------
+def shown():
+    """The version and Event IDs a page showed"""
+    df = event_store.load_data()
+    return df.attrs["version"], df["Event ID"].tolist()
+
+
+def test_stale_write_to_other_events_is_merged(store):
+    event_store.save_data(make_events(3))
+    version, ids = shown()
+    event_store.write_changes(updates={ids[0]: {"Client": "NAB"}}, base_version=version)
+    event_store.write_changes(updates={ids[1]: {"Client": "ANZ"}}, base_version=version)
+    assert list(event_store.load_data()["Client"].astype(str)) == ["NAB", "ANZ", "SSIA"]
+
+
+def test_stale_write_to_the_same_events_is_rejected(store):
+    event_store.save_data(make_events(3))
+    version, ids = shown()
+    event_store.write_changes(updates={ids[0]: {"Client": "NAB"}}, base_version=version)
+    with pytest.raises(event_store.StaleDataError):
+        event_store.write_changes(deletes=[ids[0]], base_version=version)
+    assert len(event_store.load_data()) == 3
+
+
+def test_stale_write_is_still_checked_after_a_compaction(store):
+    event_store.save_data(make_events(3))
+    version, ids = shown()
+    event_store.write_changes(updates={ids[0]: {"Client": "NAB"}}, base_version=version)
+    event_store.compact(wait=True)
+    with pytest.raises(event_store.StaleDataError):
+        event_store.write_changes(updates={ids[0]: {"Client": "ANZ"}}, base_version=version)
+
+
+def test_write_from_a_page_shown_before_a_compaction_reaches_the_events_chosen(store):
+    # A page shows A-E after B was deleted, leaving a gap in the row labels;
+    # the idle compaction then renumbers the rows before the user clicks
+    event_store.save_data(make_events(5))
+    a, b, c, d, e = event_store.load_data()["Event ID"]
+    event_store.write_changes(deletes=[b])
+    version, _ = shown()
+    event_store.compact(wait=True)
+    current = event_store.load_data()
+    assert event_store.id_index(current).label(d) == 2  # C's label when the page was shown
+
+    event_store.write_changes(deletes=[d], base_version=version)
+    event_store.write_changes(updates={c: {"Client": "EDITED"}}, base_version=version)
+    df = by_id(event_store.load_data())
+    assert sorted(df.index) == sorted([a, c, e])
+    assert df.loc[c, "Client"] == "EDITED"
+    assert event_store.audit_log().history(d)["Action"][0] == "Deleted"
+    with pytest.raises(event_store.StaleDataError):
+        event_store.write_changes(updates={b: {"Client": "ANZ"}}, base_version=version)
+
+
+# ---------- Orphaned journals ----------
+def save_outside_app(store, df):
+    """Replace the workbook as Excel would, leaving journal and sidecar behind"""
+    event_store._write_workbook(df, store.path)
+
+
+def test_external_save_sets_app_changes_aside(store):
+    events = make_events(3)
+    event_store.save_data(events)
+    ids = events["Event ID"].tolist()
+    event_store.write_changes(updates={ids[1]: {"Client": "NAB"}})
+    assert event_store.orphaned_journals() == []
+
+    # Someone edits the workbook from before the app's change, reordering its rows
+    save_outside_app(store, events.iloc[::-1].assign(Notes="edited in Excel"))
+    df = event_store.load_data()
+    assert (df["Notes"] == "edited in Excel").all()
+    assert by_id(df).loc[ids[1], "Client"] == "SSIA"
+    assert len(event_store.orphaned_journals()) == 1
+
+
+def test_reapply_orphaned_matches_rows_by_event_id(store):
+    events = make_events(3)
+    event_store.save_data(events)
+    ids = events["Event ID"].tolist()
+    inserted = make_events(1, client="ANZ")
+    event_store.write_changes(updates={ids[0]: {"Client": "NAB"}})
+    event_store.write_changes(deletes=[ids[2]])
+    event_store.write_changes(inserts=inserted)
+    event_store.write_changes(updates={inserted["Event ID"][0]: {"Notes": "added in the app"}})
+
+    save_outside_app(store, events.iloc[::-1])
+    event_store.load_data()
+    orphaned, = event_store.orphaned_journals()
+    assert event_store.reapply_orphaned(orphaned, user="doms@eqstrategist.com") == (4, 0)
+
+    df = by_id(event_store.load_data())
+    assert df.loc[ids[0], "Client"] == "NAB"
+    assert ids[2] not in df.index
+    assert df.loc[inserted["Event ID"][0], "Notes"] == "added in the app"
+    assert isinstance(df.loc[inserted["Event ID"][0], "Date"], pd.Timestamp)
+    assert event_store.orphaned_journals() == []
+
+
+def test_reapply_orphaned_skips_events_no_longer_there(store):
+    events = make_events(3)
+    event_store.save_data(events)
+    ids = events["Event ID"].tolist()
+    event_store.write_changes(updates={ids[2]: {"Client": "NAB"}})
+
+    save_outside_app(store, events.iloc[:2])
+    event_store.load_data()
+    orphaned, = event_store.orphaned_journals()
+    assert event_store.reapply_orphaned(orphaned) == (0, 1)
+    assert len(event_store.load_data()) == 2
+
+
+def test_discard_orphaned(store):
+    events = make_events(2)
+    event_store.save_data(events)
+    event_store.write_changes(updates={events["Event ID"][0]: {"Client": "NAB"}})
+    save_outside_app(store, make_events(2))
+    event_store.load_data()
+    orphaned, = event_store.orphaned_journals()
+    event_store.discard_orphaned(orphaned)
+    assert event_store.orphaned_journals() == []
+    assert not os.path.exists(orphaned)
+
+
+# ---------- Event IDs ----------
+def test_id_index_looks_labels_up_by_event_id(store):
+    events = make_events(4)
+    event_store.save_data(events)
+    ids = events["Event ID"].tolist()
+    event_store.write_changes(deletes=[ids[1]])
+    df = event_store.load_data()
+
+    index = event_store.id_index(df)
+    assert list(index.labels([ids[3], ids[1], "no-such-id", ids[0]])) == [3, 0]
+    assert index.label(ids[2]) == 2
+    assert index.label(ids[1]) is None
+    assert event_store.id_index(df) is index  # built once per data version
+
+
+def test_events_without_ids_are_given_them_once(store):
+    events = make_events(3).drop(columns=["Event ID"])
+    save_outside_app(store, events)
+    ids = event_store.load_data()["Event ID"]
+    assert ids.notna().all() and ids.is_unique
+
+    event_store.forget_store()  # as a fresh process would read it
+    assert list(event_store.load_data()["Event ID"]) == list(ids)
+
+
+def test_a_copied_event_gets_an_id_of_its_own(store):
+    events = make_events(2)
+    copied = pd.concat([events, events.iloc[[0]]], ignore_index=True)  # a row copied in Excel
+    save_outside_app(store, copied)
+    ids = list(event_store.load_data()["Event ID"])
+    assert ids[:2] == list(events["Event ID"])
+    assert ids[2] not in ids[:2]
+
+
+# ---------- Year archive ----------
+def test_archive_moves_the_events_it_read_despite_a_compaction(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(event_store, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    events = make_events(6)
+    events["Date"] = events["End Date"] = pd.to_datetime(
+        ["2024-05-01", "2024-06-01", "2024-07-01", "2026-05-01", "2026-06-01", "2026-07-01"])
+    event_store.save_data(events)
+    ids = events["Event ID"].tolist()
+    event_store.write_changes(deletes=[ids[3]])
+
+    write_year = event_store._write_year
+
+    def compact_meanwhile(year, rows):
+        # As the idle timer would, while the year workbook is written
+        event_store.compact()
+        return write_year(year, rows)
+
+    monkeypatch.setattr(event_store, "_write_year", compact_meanwhile)
+    assert event_store.archive_before(2025) == 3
+    assert sorted(event_store.load_data()["Event ID"]) == sorted(ids[4:])
+    assert sorted(event_store.load_archive()["Event ID"]) == sorted(ids[:3])
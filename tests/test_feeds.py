@@ -0,0 +1,32 @@
+import feeds
+import ics
+from conftest import make_events
+
+
+def test_feeds_carry_only_what_trainers_see(tmp_path):
+    events = make_events(2)
+    events["Billing"] = "$12,000 + GST"
+    events["Invoiced"] = "No"
+    events["Notes"] = "Internal: chase the PO"
+    events["Title"] = "SSIA | Course"
+    events["Date Modified"] = "2026-03-01 09:00"
+    assert sorted(feeds.FeedWriter(str(tmp_path)).update(events, 1)) == ["all", "andrew", "dale", "dom", "jack"]
+
+    for name in ("dom", "all"):
+        text = (tmp_path / f"{name}.ics").read_text(encoding="utf-8")
+        assert text.count("BEGIN:VEVENT") == 2
+        assert "X-EQS-CLIENT:SSIA" in text
+        assert "X-EQS-BILLING" not in text and "X-EQS-INVOICED" not in text
+        assert "DESCRIPTION" not in text and "chase the PO" not in text
+
+    exported = ics.to_ics(events).decode("utf-8")
+    assert "X-EQS-BILLING:$12\\,000 + GST" in exported
+    assert "DESCRIPTION:Internal: chase the PO" in exported
+
+
+def test_feeds_are_not_rewritten_for_fields_they_do_not_carry(tmp_path):
+    events = make_events(2)
+    writer = feeds.FeedWriter(str(tmp_path))
+    writer.update(events, 1)
+    assert writer.update(events.assign(Billing="$500"), 2) == []
+    assert sorted(writer.update(events.assign(Client="NAB"), 3)) == ["all", "dom"]
@@ -0,0 +1,36 @@
+import threading
+
+# ---------- Per-version caches ----------
+# Indexes and rendered pieces built from the events table are shared by every
+# session and reused until the data changes. They are cached per data version
+# (df.attrs["version"]), keeping only the newest few: the current version and
+# the one sessions that have not rerun since the last save are still showing.
+VERSIONS_KEPT = 2
+
+
+class VersionCache:
+    """Values built from one version of the events table, by data version and key"""
+
+    def __init__(self, versions_kept=VERSIONS_KEPT):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._versions_kept = versions_kept
+
+    def get(self, version, build, key=None):
+        """The value cached for (version, key), calling build() for it the first time.
+
+        build runs outside the lock, so two sessions may both build a missing
+        value; the later one is kept. With version None (data not loaded from
+        the store) nothing is cached.
+        """
+        if version is None:
+            return build()
+        with self._lock:
+            value = self._versions.get(version, {}).get(key)
+        if value is None:
+            value = build()
+            with self._lock:
+                self._versions.setdefault(version, {})[key] = value
+                for old in sorted(self._versions)[:-self._versions_kept]:
+                    del self._versions[old]
+        return value
@@ -0,0 +1,87 @@
+"""Notice changes to the events store so open sessions can refresh themselves.
+
+One background thread per process checks the store's identity (a stat call
+or two, see event_store.store_identity) every POLL_SECONDS and counts the
+changes it sees. A session compares that count with the one it had when it
+loaded its data, which costs it nothing while nothing changes. Work that
+follows every change (see on_change) runs on the same thread, off the
+sessions' reruns.
+"""
+import os
+import threading
+import time
+
+import event_store
+
+POLL_SECONDS = float(os.environ.get("EQS_WATCH_SECONDS", "0.5"))
+
+# How often open sessions look at the change count; 0 turns live updates off
+AUTO_REFRESH_SECONDS = float(os.environ.get("EQS_AUTO_REFRESH", "1"))
+
+
+class StoreWatcher:
+    """Counts the changes to the store seen by a background thread"""
+
+    def __init__(self, interval=POLL_SECONDS):
+        self.interval = interval
+        self.generation = 0
+        self._identity = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._listeners = []
+        self._notify_pending = False
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self.poll()
+                self._thread = threading.Thread(target=self._run, name="store-watcher", daemon=True)
+                self._thread.start()
+
+    def poll(self):
+        """Check the store once; returns True when it changed since the last check"""
+        try:
+            identity = event_store.store_identity()
+        except Exception:
+            return False  # e.g. the file is being replaced; look again next time
+        if identity == self._identity:
+            return False
+        if self._identity is not None:
+            self.generation += 1
+        self._identity = identity
+        return True
+
+    def on_change(self, listener):
+        """Call listener() on the watcher thread once soon and after every change it sees"""
+        with self._start_lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+                self._notify_pending = True
+
+    def _notify(self):
+        self._notify_pending = False
+        for listener in list(self._listeners):
+            try:
+                listener()
+            except Exception:
+                pass  # a failing listener must not stop the watcher; listeners report their own errors
+
+    def _run(self):
+        while True:
+            if self.poll() or self._notify_pending:
+                self._notify()
+            time.sleep(self.interval)
+
+
+_watcher = StoreWatcher()
+
+
+def on_change(listener):
+    """Run listener() on the watcher thread after every change to the store (see StoreWatcher.on_change)"""
+    _watcher.on_change(listener)
+
+
+def generation():
+    """How many changes to the store have been seen so far (starts the watcher on first use)"""
+    _watcher.start()
+    return _watcher.generation